@@ -0,0 +1,90 @@
+"""
+Multi-model comparison in a single pass.
+
+Feeds of every (model, feature_set) pair are pulled with DataFeeder.pullModels, which loads market data
+and indicators once per ticker and aligns the classifier rows of all models on them. The strategy is
+then run for each model on each ticker through run_backtests, and the PnLs are gathered into a
+models x tickers matrix.
+"""
+from app.backtest.ParallelRunner import BacktestJob, run_backtests
+from app.datafeed.StaticDataFeeder import StaticDataFeeder
+from app.instrumentation.Instrumentation import Instrumentation
+from app.strategies.BaseStrategy import BaseStrategy, BaseStrategyParam
+
+import numpy as np
+
+
+class PnLMatrix:
+    """
+    PnL of one strategy for each (model, feature_set) pair (rows) on each ticker (columns).
+    """
+    def __init__(self, strategy_name: str, models: list[tuple[str, str]], tickers: list[str], pnl: np.ndarray, trades: np.ndarray):
+        self.strategy_name = strategy_name
+        self.models = models
+        self.tickers = tickers
+        self.pnl = pnl
+        self.trades = trades # Number of trade log rows of each run
+
+    def total(self) -> np.ndarray:
+        """
+        Total PnL of each model over the tickers.
+        """
+        return self.pnl.sum(axis=1)
+
+    def toRows(self) -> list[dict]:
+        return [
+            {
+                'model': model,
+                'feature_set': feature_set,
+                'ticker': ticker,
+                'strategy': self.strategy_name,
+                'pnl': float(self.pnl[row, column]),
+                'trades': int(self.trades[row, column]),
+            }
+            for row, (model, feature_set) in enumerate(self.models)
+            for column, ticker in enumerate(self.tickers)
+        ]
+
+    def format(self) -> str:
+        width = max(len(model) for model, _ in self.models)
+        lines = [f"{'':{width}} | " + " | ".join(f"{ticker:>10}" for ticker in self.tickers) + f" | {'TOTAL':>12}"]
+        for (model, _), row, total in zip(self.models, self.pnl, self.total()):
+            lines.append(f"{model:{width}} | " + " | ".join(f"{value:10.2f}" for value in row) + f" | {total:12.2f}")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"<PnLMatrix(strategy={self.strategy_name}, models={len(self.models)}, tickers={len(self.tickers)})>"
+
+
+def compare_models(
+    datafeeder,
+    tickers: list[str],
+    models: list[tuple[str, str]],
+    strategy_class: type[BaseStrategy],
+    param: BaseStrategyParam,
+    max_workers: int = None,
+    instrumentation: Instrumentation = None
+) -> PnLMatrix:
+    """
+    Runs strategy_class with param for every (model, feature_set) pair on every ticker.
+
+    :param datafeeder: DataFeeder - Used once, through pullModels.
+    :param models: list[tuple[str, str]] - (model, feature_set) pairs to compare.
+    :param max_workers: int - Passed to run_backtests, 1 runs in the current process.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    models = list(dict.fromkeys(models))
+    feeds = datafeeder.pullModels(tickers, models, strategy_class.required_fields)
+    feeder = StaticDataFeeder(feed for model_feeds in feeds.values() for feed in model_feeds.values())
+
+    jobs = [
+        BacktestJob(strategy_class, param, ticker, model, feature_set)
+        for model, feature_set in models
+        for ticker in tickers
+    ]
+    results = run_backtests(feeder, jobs, max_workers=max_workers, instrumentation=instrumentation)
+
+    shape = (len(models), len(tickers))
+    pnl = np.array([result.pnl for result in results], dtype=np.float64).reshape(shape)
+    trades = np.array([len(result.trades) for result in results], dtype=np.int64).reshape(shape)
+    return PnLMatrix(strategy_class.strategy_name, models, tickers, pnl, trades)
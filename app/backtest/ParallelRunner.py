@@ -0,0 +1,130 @@
+"""
+Process-pool backtest runner.
+
+Feeds are fetched once in the parent with DataFeeder.pullMany. Each worker task receives one feed and
+runs every job on that (ticker, model, feature_set), so a feed is pickled once however many strategies
+use it. Workers build fresh strategy instances around a StaticDataFeeder, so no trade list is shared
+between jobs. Results are returned in job order whatever order the workers finish in.
+
+With an Instrumentation, each worker task times the strategy and calculate_pnl stages of its jobs
+(and profiles them if enabled) in its own instance, which is merged into the caller's on return.
+
+With a ResultCache, jobs whose strategy version, params and feed content were run before are served
+from disk, and only the others are sent to the workers.
+"""
+from app.backtest.ResultCache import ResultCache
+from app.datafeed.StaticDataFeeder import StaticDataFeeder
+from app.instrumentation.Instrumentation import Instrumentation, stage, capture
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+from app.models.TradeLedger import TradeLedger
+from app.pnl.PnLReporting import calculate_pnl
+from app.strategies.BaseStrategy import BaseStrategy, BaseStrategyParam
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+
+@dataclass
+class BacktestJob:
+    strategy_class: type[BaseStrategy]
+    param: BaseStrategyParam
+    ticker: str
+    model: str
+    feature_set: str
+
+
+@dataclass
+class BacktestResult:
+    job: BacktestJob
+    strategy_name: str
+    pnl: float
+    trades: TradeLedger = field(repr=False)
+
+    @property
+    def ticker(self) -> str:
+        return self.job.ticker
+
+
+def run_job(job: BacktestJob, datafeeder, instrumentation: Instrumentation = None) -> BacktestResult:
+    strategy = job.strategy_class(datafeeder, job.param)
+    strategy_name = strategy.strategy_name
+    with capture(instrumentation, strategy_name, job.ticker):
+        with stage(instrumentation, 'strategy', strategy_name, job.ticker) as timing:
+            strategy.reset()
+            strategy.run(ticker=job.ticker, model=job.model, feature_set=job.feature_set)
+            trades = strategy.dump_trade_logs()
+            timing.rows = len(trades)
+        with stage(instrumentation, 'pnl', strategy_name, job.ticker, rows=len(trades)):
+            pnl = calculate_pnl(job.param.initial_capital, trades)
+    return BacktestResult(job=job, strategy_name=strategy_name, pnl=pnl, trades=trades)
+
+
+def run_backtests(datafeeder, jobs: list[BacktestJob], max_workers: int = None, instrumentation: Instrumentation = None, result_cache: ResultCache = None) -> list[BacktestResult]:
+    """
+    Runs every job and returns their results in the same order as jobs.
+
+    :param datafeeder: DataFeeder - Used in the parent process only, through pullMany.
+    :param max_workers: int - Number of worker processes, defaults to the number of CPUs.
+        With 1 the jobs run in the current process.
+    :param instrumentation: Instrumentation - Optional, receives the stage timings and profiles of every job.
+    :param result_cache: ResultCache - Optional, results of runs done before are loaded instead of recomputed.
+    """
+    # Group jobs by feed so each feed is fetched and shipped to a worker once
+    groups: dict[tuple, list[int]] = {}
+    for index, job in enumerate(jobs):
+        groups.setdefault((job.ticker, job.model, job.feature_set), []).append(index)
+
+    feeds: dict[tuple, ColumnarDataFeed] = {}
+    for model, feature_set in dict.fromkeys((job.model, job.feature_set) for job in jobs):
+        tickers = [ticker for ticker, key_model, key_feature_set in groups if (key_model, key_feature_set) == (model, feature_set)]
+        # Pull only the columns read by the strategies run on these feeds
+        fields = {
+            name
+            for job in jobs if (job.model, job.feature_set) == (model, feature_set)
+            for name in job.strategy_class.required_fields
+        }
+        for ticker, feed in datafeeder.pullMany(tickers, model, feature_set, fields).items():
+            feeds[(ticker, model, feature_set)] = feed
+
+    results: list[BacktestResult] = [None] * len(jobs)
+    cache_keys: dict[int, str] = {}
+    if result_cache is not None:
+        for key, indices in groups.items():
+            for index in indices:
+                job = jobs[index]
+                cache_keys[index] = result_cache.key(job.strategy_class, job.param, feeds[key])
+                with stage(instrumentation, 'result_cache_load', job.strategy_class.strategy_name, job.ticker) as timing:
+                    cached = result_cache.load(cache_keys[index])
+                    timing.rows = len(cached[2]) if cached is not None else 0
+                if cached is not None:
+                    strategy_name, pnl, trades = cached
+                    results[index] = BacktestResult(job=job, strategy_name=strategy_name, pnl=pnl, trades=trades)
+        # Only the jobs missing from the cache are run
+        groups = {key: [index for index in indices if results[index] is None] for key, indices in groups.items()}
+        groups = {key: indices for key, indices in groups.items() if indices}
+
+    tasks = [(key, [jobs[index] for index in indices]) for key, indices in groups.items()]
+    task_instrumentation = instrumentation.spawn() if instrumentation is not None else None # Settings only, cheap to pickle
+    if max_workers == 1:
+        group_results = [_run_feed_jobs(feeds[key], feed_jobs, task_instrumentation) for key, feed_jobs in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_run_feed_jobs, feeds[key], feed_jobs, task_instrumentation) for key, feed_jobs in tasks]
+            group_results = [future.result() for future in futures]
+
+    for indices, (feed_results, feed_instrumentation) in zip(groups.values(), group_results):
+        for index, result in zip(indices, feed_results):
+            results[index] = result
+            if result_cache is not None:
+                with stage(instrumentation, 'result_cache_store', result.strategy_name, result.ticker, rows=len(result.trades)):
+                    result_cache.store(cache_keys[index], result.strategy_name, result.pnl, result.trades)
+        if instrumentation is not None:
+            instrumentation.merge(feed_instrumentation)
+    return results
+
+
+def _run_feed_jobs(feed: ColumnarDataFeed, jobs: list[BacktestJob], instrumentation: Instrumentation = None) -> tuple[list[BacktestResult], Instrumentation]:
+    datafeeder = StaticDataFeeder([feed])
+    if instrumentation is not None:
+        instrumentation = instrumentation.spawn() # A fresh instance per task, also when running in-process
+    return [run_job(job, datafeeder, instrumentation) for job in jobs], instrumentation
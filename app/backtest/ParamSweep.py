@@ -0,0 +1,169 @@
+"""
+Parameter sweep runner.
+
+Evaluates every combination of a parameter grid on a list of tickers and compares each run against
+BAHStrategy, whose PnL is computed in closed form. Feeds are fetched once per ticker with
+DataFeeder.pullMany. LongOnly/ShortOnly combinations run on the signal-array engine and share one set
+of label lookups per ticker. RouletteStrategy combinations share one set of signals per ticker and run
+together as rows of the roulette engine. Other strategies are replayed from memory through a
+StaticDataFeeder.
+"""
+from app.datafeed.StaticDataFeeder import StaticDataFeeder
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+from app.models.MarketCondition import MarketCondition
+from app.pnl.Benchmarks import buy_and_hold_pnl
+from app.pnl.PnLReporting import calculate_pnl
+from app.strategies.BaseStrategy import BaseStrategy, BaseStrategyParam
+from app.strategies.BAHStrategy import BAHStrategy, BAHParam
+from app.strategies.LongOnlyStrategy import LongOnlyStrategy, LongOnlyStrategyParam
+from app.strategies.ShortOnlyStrategy import ShortOnlyStrategy, ShortOnlyStrategyParam
+from app.strategies.RouletteStrategy import RouletteStrategy, RouletteStrategyParam, DecisionFactory
+from app.strategies.RouletteBacktest import roulette_signals, run_roulette_backtest
+from app.strategies.SignalBacktest import SignalArrays, run_signal_backtest, LONG, SHORT
+
+from itertools import product
+
+import numpy as np
+
+# Strategies that can be swept on the signal-array engine: (target label, direction)
+SIGNAL_STRATEGIES = {
+    LongOnlyStrategy: (MarketCondition.uptrend, LONG),
+    ShortOnlyStrategy: (MarketCondition.downtrend, SHORT),
+}
+
+PARAM_CLASSES = {
+    LongOnlyStrategy: LongOnlyStrategyParam,
+    ShortOnlyStrategy: ShortOnlyStrategyParam,
+    RouletteStrategy: RouletteStrategyParam,
+    BAHStrategy: BAHParam,
+}
+
+# Fixed arguments some param classes need besides the swept ones
+DEFAULT_PARAMS = {
+    RouletteStrategy: {'decision_factory': DecisionFactory},
+}
+
+
+def expand_grid(param_grid: dict[str, list]) -> list[dict]:
+    """
+    Expands {'holding_period': [10, 20], 'stop_loss_percentage': [-0.05]} into one dict per combination.
+    """
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in product(*(param_grid[name] for name in names))]
+
+
+def benchmark_pnl(feed: ColumnarDataFeed, initial_capital: float = 10000) -> float:
+    close = feed['close']
+    return buy_and_hold_pnl(close[0].item(), close[-1].item(), initial_capital)
+
+
+def sweep_params(
+    datafeeder,
+    tickers: list[str],
+    model: str,
+    feature_set: str,
+    strategy_class: type[BaseStrategy],
+    param_grid: dict[str, list],
+    initial_capital: float = 10000
+) -> list[dict]:
+    """
+    Runs strategy_class for every combination of param_grid on every ticker.
+
+    :param datafeeder: DataFeeder - Used once, through pullMany, to fetch all the feeds.
+    :param param_grid: dict[str, list] - Candidate values of each constructor argument of the strategy param class.
+    :return: list[dict] - One row per (ticker, combination) with the swept params, the strategy and
+        benchmark PnL, their difference, the number of trades and the PASS/FAIL status.
+    """
+    combinations = expand_grid(param_grid)
+    param_class = PARAM_CLASSES[strategy_class]
+    params = [
+        param_class(**{**DEFAULT_PARAMS.get(strategy_class, {}), 'initial_capital': initial_capital, **combination})
+        for combination in combinations
+    ]
+
+    rows = []
+    fields = set(strategy_class.required_fields).union(BAHStrategy.required_fields)
+    feeds = datafeeder.pullMany(tickers, model, feature_set, fields)
+    for ticker, feed in feeds.items():
+        if len(feed) == 0:
+            continue
+        benchmark = benchmark_pnl(feed, initial_capital)
+
+        if strategy_class in SIGNAL_STRATEGIES:
+            results = _sweep_signal_strategy(feed, strategy_class, params)
+        elif strategy_class is RouletteStrategy:
+            results = _sweep_roulette_strategy(feed, params)
+        else:
+            results = _sweep_strategy(feed, model, feature_set, strategy_class, params)
+
+        for combination, (pnl, trade_count) in zip(combinations, results):
+            rows.append({
+                'ticker': ticker,
+                'strategy': strategy_class.strategy_name,
+                **combination,
+                'pnl': pnl,
+                'benchmark_pnl': benchmark,
+                'excess_pnl': pnl - benchmark,
+                'trades': trade_count,
+                'status': "PASS" if pnl > benchmark else "FAIL",
+            })
+    return rows
+
+
+def _sweep_signal_strategy(feed: ColumnarDataFeed, strategy_class: type[BaseStrategy], params: list[BaseStrategyParam]) -> list[tuple[float, int]]:
+    target_label, direction = SIGNAL_STRATEGIES[strategy_class]
+    close = feed['close']
+    signals = SignalArrays(feed['predicted_label'], target_label)
+
+    # Lookups depending on the sell counter threshold are cached in signals, so group runs by threshold
+    order = sorted(range(len(params)), key=lambda index: params[index].sell_counter_threshold)
+    results = [None] * len(params)
+    for index in order:
+        param = params[index]
+        result = run_signal_backtest(
+            close=close,
+            signals=signals,
+            direction=direction,
+            sell_counter_threshold=param.sell_counter_threshold,
+            stop_loss_percentage=param.stop_loss_percentage,
+            holding_period=param.holding_period,
+            initial_capital=param.initial_capital
+        )
+        # Each trade is one buy and one sell in the trade log
+        results[index] = (result.final_capital - param.initial_capital, 2 * len(result))
+    return results
+
+
+def _sweep_roulette_strategy(feed: ColumnarDataFeed, params: list[RouletteStrategyParam]) -> list[tuple[float, int]]:
+    # Signals depend on the decision factory only, every combination sharing one is a row of the same run
+    groups: dict[type, list[int]] = {}
+    for index, param in enumerate(params):
+        groups.setdefault(param.decision_factory, []).append(index)
+
+    results = [None] * len(params)
+    for decision_factory, indices in groups.items():
+        signals = roulette_signals(feed, decision_factory)
+        initial_capital = np.array([params[index].initial_capital for index in indices], dtype=np.float64)
+        result = run_roulette_backtest(
+            close=feed['close'],
+            cell_strategy=signals.cell_strategy,
+            mean_reversion=signals.mean_reversion,
+            roulette_size=np.array([params[index].roulette_size for index in indices]),
+            initial_capital=initial_capital
+        )
+        pnl = (result.final_capital - initial_capital).tolist()
+        for index, run_pnl, trade_count in zip(indices, pnl, result.trade_count.tolist()):
+            results[index] = (run_pnl, trade_count)
+    return results
+
+
+def _sweep_strategy(feed: ColumnarDataFeed, model: str, feature_set: str, strategy_class: type[BaseStrategy], params: list[BaseStrategyParam]) -> list[tuple[float, int]]:
+    datafeeder = StaticDataFeeder([feed])
+    results = []
+    for param in params:
+        strategy = strategy_class(datafeeder, param)
+        strategy.reset()
+        strategy.run(ticker=feed.ticker, model=model, feature_set=feature_set)
+        trades = strategy.dump_trade_logs()
+        results.append((calculate_pnl(param.initial_capital, trades), len(trades)))
+    return results
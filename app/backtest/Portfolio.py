@@ -0,0 +1,371 @@
+"""
+Cross-sectional portfolio backtest on a shared date axis.
+
+Every ticker of the universe is aligned on the union of their report dates, so closes form one
+(dates x tickers) array. A strategy's decisions are turned into positions, each one an interval of bars
+of a ticker with a direction and weights: the shares of the ticker's equity and of its free capital the
+position takes when the ticker is run on its own. The timing of these positions does not depend on
+capital, so they are taken from the per-ticker engines: the signal-array engine for LongOnly/ShortOnly,
+and for Roulette the roulette engine, run once with a row per ticker, each cell's position weighted by
+the capital of the cell.
+
+The portfolio then walks the event dates only. On each of them, positions exiting that day are closed
+first, and the capital freed is shared by the positions entering that day according to an allocation
+rule, all vectorized across tickers. Positions entering and exiting on the same day are closed last.
+Short positions lock their proceeds and an equal margin until they are closed, so shorting never funds
+other entries. The equity curve is rebuilt from the state after each event date in one pass.
+"""
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+from app.models.MarketCondition import MarketCondition
+from app.models.TradeDecision import TradeDecision
+from app.models.TradeLedger import TradeLedger
+from app.strategies.BaseStrategy import BaseStrategy, BaseStrategyParam
+from app.strategies.BAHStrategy import BAHStrategy
+from app.strategies.LongOnlyStrategy import LongOnlyStrategy
+from app.strategies.ShortOnlyStrategy import ShortOnlyStrategy
+from app.strategies.RouletteStrategy import RouletteStrategy, CellStrategy
+from app.strategies.RouletteBacktest import roulette_signals, run_roulette_backtest
+from app.strategies.SignalBacktest import SignalArrays, run_signal_backtest, LONG, SHORT
+
+from collections.abc import Callable, Iterable
+
+import numpy as np
+
+
+class PortfolioFeed:
+    """
+    Closes of a universe of tickers on the union of their report dates.
+    """
+    dates: np.ndarray # (dates,) datetime64[D]
+    tickers: list[str]
+    close: np.ndarray # (dates, tickers) close of each bar, NaN where a ticker has no bar
+    rows: dict[str, np.ndarray] # Date axis row of each bar of a ticker's feed
+
+    def __init__(self, dates: np.ndarray, tickers: list[str], close: np.ndarray, rows: dict[str, np.ndarray]):
+        self.dates = dates
+        self.tickers = tickers
+        self.close = close
+        self.rows = rows
+
+    def marks(self) -> np.ndarray:
+        """
+        Closes carried forward over the dates a ticker has no bar, 0 before its first bar.
+        """
+        # Row of the last bar at or before each date, -1 before the first one
+        last_bar = np.where(np.isnan(self.close), -1, np.arange(len(self.dates))[:, None])
+        last_bar = np.maximum.accumulate(last_bar, axis=0)
+        marks = np.take_along_axis(self.close, np.maximum(last_bar, 0), axis=0)
+        return np.where(last_bar >= 0, marks, 0.0)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __repr__(self):
+        return f"<PortfolioFeed(dates={len(self.dates)}, tickers={len(self.tickers)})>"
+
+
+def align_universe(feeds: Iterable[ColumnarDataFeed]) -> PortfolioFeed:
+    feeds = list(feeds)
+    dates = np.unique(np.concatenate([feed['report_date'] for feed in feeds])) if feeds else np.array([], dtype='datetime64[D]')
+    close = np.full((len(dates), len(feeds)), np.nan, dtype=np.float64)
+    rows = {}
+    for column, feed in enumerate(feeds):
+        feed_rows = np.searchsorted(dates, feed['report_date'])
+        close[feed_rows, column] = feed['close']
+        rows[feed.ticker] = feed_rows
+    return PortfolioFeed(dates, [feed.ticker for feed in feeds], close, rows)
+
+
+class TickerPositions:
+    """
+    Positions a strategy takes on one feed, as bar indices of that feed.
+    """
+    entry: np.ndarray
+    exit: np.ndarray
+    direction: np.ndarray # LONG or SHORT
+    weight: np.ndarray # Share of the ticker's equity each position takes when the ticker is run on its own
+    cash_weight: np.ndarray # Share of the ticker's free capital each position takes when run on its own
+
+    def __init__(self, entry, exit, direction, weight, cash_weight):
+        self.entry = np.asarray(entry, dtype=np.int64)
+        self.exit = np.asarray(exit, dtype=np.int64)
+        self.direction = np.asarray(direction, dtype=np.int8)
+        self.weight = np.asarray(weight, dtype=np.float64)
+        self.cash_weight = np.asarray(cash_weight, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.entry)
+
+
+def signal_positions(feed: ColumnarDataFeed, target_label: int, direction: int, param: BaseStrategyParam) -> TickerPositions:
+    result = run_signal_backtest(
+        close=feed['close'],
+        signals=SignalArrays(feed['predicted_label'], target_label),
+        direction=direction,
+        sell_counter_threshold=param.sell_counter_threshold,
+        stop_loss_percentage=param.stop_loss_percentage,
+        holding_period=param.holding_period,
+        initial_capital=param.initial_capital
+    )
+    size = len(result)
+    return TickerPositions(result.entry_index, result.exit_index, np.full(size, direction), np.ones(size), np.ones(size))
+
+
+def roulette_positions(feeds: list[ColumnarDataFeed], param: BaseStrategyParam) -> list[TickerPositions]:
+    """
+    Positions of the roulette cells on each feed, from one roulette engine run with a row per feed.
+    Each position is weighted by the capital its cell commits at the entry.
+    """
+    if not feeds:
+        return []
+    lengths = np.array([len(feed) for feed in feeds])
+    # Signals padded to the longest feed, each row stops at the end of its own feed
+    close = np.ones((len(feeds), lengths.max()), dtype=np.float64)
+    cell_strategy = np.full(close.shape, CellStrategy.none, dtype=np.int8)
+    mean_reversion = np.full(close.shape, TradeDecision.hold, dtype=np.int8)
+    for row, feed in enumerate(feeds):
+        signals = roulette_signals(feed, param.decision_factory)
+        close[row, :len(feed)] = feed['close']
+        cell_strategy[row, :len(feed)] = signals.cell_strategy
+        mean_reversion[row, :len(feed)] = signals.mean_reversion
+
+    result = run_roulette_backtest(close, cell_strategy, mean_reversion, param.roulette_size, param.initial_capital, ends=lengths, record_positions=True)
+    held = result.positions
+    bounds = np.searchsorted(held.run, np.arange(len(feeds) + 1))
+    return [
+        TickerPositions(
+            held.entry[start:end],
+            held.exit[start:end],
+            held.direction[start:end],
+            held.capital[start:end] / held.equity[start:end],
+            held.capital[start:end] / held.free[start:end]
+        )
+        for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+    ]
+
+
+def bah_positions(feed: ColumnarDataFeed, param: BaseStrategyParam) -> TickerPositions:
+    if len(feed) < 2:
+        return TickerPositions([], [], [], [], [])
+    return TickerPositions([0], [len(feed) - 1], [LONG], [1.0], [1.0])
+
+
+def each_feed(rule: Callable[[ColumnarDataFeed, BaseStrategyParam], TickerPositions]):
+    return lambda feeds, param: [rule(feed, param) for feed in feeds]
+
+
+# Decisions of each strategy as positions on each feed
+POSITION_RULES: dict[type[BaseStrategy], Callable[[list[ColumnarDataFeed], BaseStrategyParam], list[TickerPositions]]] = {
+    LongOnlyStrategy: each_feed(lambda feed, param: signal_positions(feed, MarketCondition.uptrend, LONG, param)),
+    ShortOnlyStrategy: each_feed(lambda feed, param: signal_positions(feed, MarketCondition.downtrend, SHORT, param)),
+    RouletteStrategy: roulette_positions,
+    BAHStrategy: each_feed(bah_positions),
+}
+
+
+def equal_weight(free: float, equity: float, weights: np.ndarray, cash_weights: np.ndarray, sleeves: int) -> np.ndarray:
+    """
+    Each ticker is entitled to an equal share of the current equity, which its positions take by their
+    weights. Budgets are scaled down when the free capital cannot cover every entry.
+    """
+    budget = weights * equity / sleeves
+    needed = budget.sum()
+    if needed > free:
+        budget *= free / needed
+    return budget
+
+
+def split_cash(free: float, equity: float, weights: np.ndarray, cash_weights: np.ndarray, sleeves: int) -> np.ndarray:
+    """
+    The day's entries share the free capital in proportion to their cash weights, a lone full-weight entry takes all of it.
+    """
+    return free * cash_weights / max(cash_weights.sum(), 1.0)
+
+
+ALLOCATION_RULES = {
+    'equal_weight': equal_weight,
+    'split_cash': split_cash,
+}
+
+
+class PortfolioResult:
+    strategy_name: str
+    dates: np.ndarray
+    tickers: list[str]
+    ticker_index: np.ndarray # Ticker column of each position
+    entry: np.ndarray # Date axis row of each position's entry
+    exit: np.ndarray
+    shares: np.ndarray # Negative when short, 0 when no capital was left for the position
+    entry_price: np.ndarray
+    exit_price: np.ndarray
+    cash: np.ndarray # Cash at the close of each date
+    equity: np.ndarray # Mark-to-market capital at the close of each date
+    initial_capital: float
+
+    def __init__(self, strategy_name, dates, tickers, ticker_index, entry, exit, shares, entry_price, exit_price, cash, equity, initial_capital):
+        self.strategy_name = strategy_name
+        self.dates = dates
+        self.tickers = tickers
+        self.ticker_index = ticker_index
+        self.entry = entry
+        self.exit = exit
+        self.shares = shares
+        self.entry_price = entry_price
+        self.exit_price = exit_price
+        self.cash = cash
+        self.equity = equity
+        self.initial_capital = initial_capital
+
+    @property
+    def final_capital(self) -> float:
+        return float(self.equity[-1]) if len(self.equity) else self.initial_capital
+
+    @property
+    def pnl(self) -> float:
+        return self.final_capital - self.initial_capital
+
+    def tickerPnL(self) -> dict[str, float]:
+        """
+        Contribution of each ticker to the portfolio PnL.
+        """
+        pnl = np.bincount(self.ticker_index, weights=self.shares * (self.exit_price - self.entry_price), minlength=len(self.tickers))
+        return dict(zip(self.tickers, pnl.tolist()))
+
+    def toLedger(self) -> TradeLedger:
+        """
+        Trades of the positions that received capital, in date order with exits before entries on a date,
+        except for positions entering and exiting that date which are closed after the entries.
+        """
+        traded = np.flatnonzero(self.shares != 0)
+        rows = np.concatenate([self.exit[traded], self.entry[traded]])
+        round_trip = self.entry[traded] == self.exit[traded]
+        order = np.lexsort((np.concatenate([np.where(round_trip, 2, 0), np.ones(len(traded), dtype=np.int64)]), rows))
+        ledger = TradeLedger()
+        for index in order.tolist():
+            position = traded[index % len(traded)]
+            selling = index < len(traded)
+            ledger.append(
+                report_date=self.dates[self.exit[position] if selling else self.entry[position]].item(),
+                ticker=self.tickers[self.ticker_index[position]],
+                strategy=self.strategy_name,
+                action='SELL' if selling else 'BUY',
+                price=(self.exit_price if selling else self.entry_price)[position].item(),
+                shares=self.shares[position].item(),
+                note="Portfolio exit" if selling else "Portfolio entry"
+            )
+        return ledger
+
+    def __repr__(self):
+        return f"<PortfolioResult(strategy={self.strategy_name}, tickers={len(self.tickers)}, positions={len(self.entry)}, pnl={self.pnl})>"
+
+
+def run_portfolio(
+    feeds: Iterable[ColumnarDataFeed],
+    strategy_class: type[BaseStrategy],
+    param: BaseStrategyParam,
+    allocation: Callable[[float, float, np.ndarray, np.ndarray, int], np.ndarray] = equal_weight,
+    initial_capital: float = None
+) -> PortfolioResult:
+    """
+    Runs strategy_class on every feed with one shared capital pool.
+
+    :param allocation: Callable - Budgets of the positions entering on a date, from the free capital, the equity,
+        the positions' weights and cash weights and the number of tickers. See ALLOCATION_RULES.
+    :param initial_capital: float - Capital of the pool, defaults to param.initial_capital per ticker,
+        the same total as running every ticker on its own.
+    """
+    feeds = [feed for feed in feeds if len(feed)]
+    universe = align_universe(feeds)
+    initial_capital = param.initial_capital * len(feeds) if initial_capital is None else initial_capital
+    # Positions of every ticker, moved onto the shared date axis
+    ticker_index, entry, exit, direction, weight, cash_weight = [], [], [], [], [], []
+    for column, (feed, positions) in enumerate(zip(feeds, POSITION_RULES[strategy_class](feeds, param))):
+        rows = universe.rows[feed.ticker]
+        ticker_index.append(np.full(len(positions), column, dtype=np.int64))
+        entry.append(rows[positions.entry])
+        exit.append(rows[positions.exit])
+        direction.append(positions.direction)
+        weight.append(positions.weight)
+        cash_weight.append(positions.cash_weight)
+    concat = lambda arrays, dtype: np.concatenate(arrays) if arrays else np.array([], dtype=dtype)
+    ticker_index = concat(ticker_index, np.int64)
+    entry = concat(entry, np.int64)
+    exit = concat(exit, np.int64)
+    direction = concat(direction, np.int8)
+    weight = concat(weight, np.float64)
+    cash_weight = concat(cash_weight, np.float64)
+
+    close = universe.close
+    marks = universe.marks()
+    entry_price = close[entry, ticker_index]
+    exit_price = close[exit, ticker_index]
+
+    # Positions grouped by the row they enter and exit on
+    by_entry = np.argsort(entry, kind='stable')
+    by_exit = np.argsort(exit, kind='stable')
+    event_rows = np.union1d(entry, exit)
+    entry_bounds = np.searchsorted(entry[by_entry], event_rows, side='right')
+    exit_bounds = np.searchsorted(exit[by_exit], event_rows, side='right')
+
+    shares = np.zeros(len(entry), dtype=np.float64)
+    locked = np.zeros(len(entry), dtype=np.float64)
+    held = np.zeros(len(feeds), dtype=np.float64) # Shares held per ticker
+    cash = initial_capital
+    locked_total = 0.0
+    # State after each event date, preceded by the initial state
+    cash_after = np.empty(len(event_rows) + 1, dtype=np.float64)
+    held_after = np.empty((len(event_rows) + 1, len(feeds)), dtype=np.float64)
+    cash_after[0] = cash
+    held_after[0] = held
+
+    def settle(closing: np.ndarray):
+        nonlocal cash, locked_total
+        cash += (exit_price[closing] * shares[closing]).sum()
+        locked_total -= locked[closing].sum()
+        np.subtract.at(held, ticker_index[closing], shares[closing])
+
+    entry_start = exit_start = 0
+    for event, row in enumerate(event_rows.tolist()):
+        exiting = by_exit[exit_start:exit_bounds[event]]
+        # Positions entering and exiting on this row are settled after the entries
+        round_trip = entry[exiting] == row
+        closing = exiting[~round_trip]
+        if len(closing):
+            settle(closing)
+
+        opening = by_entry[entry_start:entry_bounds[event]]
+        if len(opening):
+            equity = cash + held @ marks[row]
+            budget = allocation(max(cash - locked_total, 0.0), equity, weight[opening], cash_weight[opening], len(feeds))
+            opened = direction[opening] * budget / entry_price[opening]
+            shares[opening] = opened
+            locked[opening] = np.where(direction[opening] == SHORT, 2 * budget, 0.0)
+            cash -= (entry_price[opening] * opened).sum()
+            locked_total += locked[opening].sum()
+            np.add.at(held, ticker_index[opening], opened)
+        if round_trip.any():
+            settle(exiting[round_trip])
+
+        cash_after[event + 1] = cash
+        held_after[event + 1] = held
+        entry_start, exit_start = entry_bounds[event], exit_bounds[event]
+
+    # State of each date is the one after the last event date at or before it
+    state = np.searchsorted(event_rows, np.arange(len(universe)), side='right')
+    daily_cash = cash_after[state]
+    equity = daily_cash + (held_after[state] * marks).sum(axis=1)
+
+    return PortfolioResult(
+        strategy_name=f"Portfolio{strategy_class.strategy_name}",
+        dates=universe.dates,
+        tickers=universe.tickers,
+        ticker_index=ticker_index,
+        entry=entry,
+        exit=exit,
+        shares=shares,
+        entry_price=entry_price,
+        exit_price=exit_price,
+        cash=daily_cash,
+        equity=equity,
+        initial_capital=initial_capital
+    )
@@ -0,0 +1,166 @@
+"""
+Content-addressed on-disk cache of strategy run results.
+
+A run is identified by the hash of:
+- The strategy class and the source of the modules defining its behaviour: the modules of its class
+  hierarchy, the app.strategies and app.models modules they use (transitively), e.g. the MarketCondition
+  and TradeDecision values labels and votes are compared against, calculate_pnl's module and TradeLedger
+- The fields of its BaseStrategyParam
+- The content of the feed columns it reads
+so editing one strategy only invalidates its own runs, and a feed whose rows changed gets new keys.
+Each entry stores the PnL and the trade log of one run. Entries are evicted least recently used first
+once the cache exceeds its size limit, like FeedCache.
+"""
+from app.datafeed.FeedCache import evict_by_size
+from app.models.ColumnarDataFeed import ColumnarDataFeed, KEY_COLUMNS
+from app.models.TradeLedger import TradeLedger, LEDGER_COLUMNS
+from app.strategies.BaseStrategy import BaseStrategy, BaseStrategyParam
+
+from datetime import date
+from functools import lru_cache
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import types
+
+import numpy as np
+
+RESULT_FILE = 'result.json'
+
+# Packages whose modules used by a strategy are part of its version
+VERSIONED_PACKAGES = ('app.strategies', 'app.models')
+# Modules every cached result depends on: the PnL computation and the trade rows stored in the entries
+RESULT_MODULES = ('app.pnl.PnLReporting', 'app.models.TradeLedger')
+
+
+def strategy_modules(strategy_class: type[BaseStrategy]) -> list[str]:
+    """
+    Names of the modules whose source defines the results of strategy_class.
+    """
+    pending = [klass.__module__ for klass in strategy_class.__mro__ if klass is not object]
+    modules = set(RESULT_MODULES)
+    while pending:
+        name = pending.pop()
+        if name in modules:
+            continue
+        modules.add(name)
+        if not name.startswith(VERSIONED_PACKAGES):
+            continue
+        # Follow the classes, functions and modules the versioned module refers to
+        for value in vars(sys.modules[name]).values():
+            module = value.__name__ if isinstance(value, types.ModuleType) else getattr(value, '__module__', None)
+            if isinstance(module, str) and module.startswith(VERSIONED_PACKAGES):
+                pending.append(module)
+    return sorted(modules)
+
+
+@lru_cache(maxsize=None)
+def strategy_version(strategy_class: type[BaseStrategy]) -> str:
+    digest = hashlib.sha256()
+    for name in strategy_modules(strategy_class):
+        module = sys.modules[name]
+        digest.update(name.encode())
+        source_file = getattr(module, '__file__', None)
+        if source_file is not None:
+            with open(source_file, 'rb') as source:
+                digest.update(source.read())
+    return digest.hexdigest()
+
+
+def _encode_value(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _encode_value(item) for key, item in value.items()}
+    if isinstance(value, type) or callable(value):
+        return f"{value.__module__}.{value.__qualname__}"
+    return repr(value)
+
+
+def encode_param(param: BaseStrategyParam) -> dict:
+    return {
+        'class': _encode_value(type(param)),
+        'fields': {name: _encode_value(value) for name, value in sorted(vars(param).items())},
+    }
+
+
+def feed_fingerprint(feed: ColumnarDataFeed, fields) -> str:
+    """
+    Hash of the feed columns in fields, with their dtypes.
+    """
+    digest = hashlib.sha256(f"{feed.ticker}|{feed.model}|{feed.feature_set}|{len(feed)}".encode())
+    for name in sorted(set(fields).difference(KEY_COLUMNS)):
+        column = np.ascontiguousarray(feed[name])
+        digest.update(f"|{name}|{column.dtype.str}|".encode())
+        digest.update(column.view(np.uint8))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of (PnL, trade log) per run, one directory per run key.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, strategy_class: type[BaseStrategy], param: BaseStrategyParam, feed: ColumnarDataFeed) -> str:
+        identity = {
+            'strategy': _encode_value(strategy_class),
+            'version': strategy_version(strategy_class),
+            'param': encode_param(param),
+            'feed': feed_fingerprint(feed, strategy_class.required_fields),
+        }
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+    def load(self, key: str) -> tuple[str, float, TradeLedger] | None:
+        """
+        Returns the strategy name, PnL and trade log stored under key, or None on a miss.
+        """
+        path = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(path, RESULT_FILE)) as result_file:
+                stored = json.load(result_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        trades = TradeLedger()
+        trades.columns = stored['trades']
+        trades.columns['report_date'] = [
+            date.fromisoformat(report_date) if report_date is not None else None
+            for report_date in trades.columns['report_date']
+        ]
+        os.utime(path) # Mark the entry as recently used for eviction
+        return stored['strategy_name'], stored['pnl'], trades
+
+    def store(self, key: str, strategy_name: str, pnl: float, trades: TradeLedger):
+        columns = {name: list(trades.column(name)) for name in LEDGER_COLUMNS}
+        columns['report_date'] = [
+            report_date.isoformat() if report_date is not None else None
+            for report_date in columns['report_date']
+        ]
+        stored = {'strategy_name': strategy_name, 'pnl': pnl, 'trades': columns}
+
+        # Write into a temporary directory first so a crash never leaves a half written entry behind
+        path = os.path.join(self.cache_dir, key)
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.cache_dir)
+        try:
+            with open(os.path.join(staging, RESULT_FILE), 'w') as result_file:
+                json.dump(stored, result_file)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(staging, path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        evict_by_size(self.cache_dir, self.max_bytes, keep=key)
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
@@ -0,0 +1,294 @@
+"""
+Monte Carlo significance of the PASS/FAIL verdict.
+
+Two sets of synthetic paths are built for each ticker, one row per path in (paths, bars) arrays:
+- Label permutation: the classifier labels are shuffled across bars while closes stay in place, so the
+  strategy trades the same prices on uninformed signals. The p-value is the share of paths doing at
+  least as well as the real labels (the benchmark is the same on every path, so this holds for the
+  PnL and the excess over the benchmark alike).
+- Block bootstrap: blocks of consecutive bars are resampled with their return, classifier label and
+  RSI decision, and closes are rebuilt from the returns. The p-value is the share of paths where the
+  strategy does not beat buy-and-hold.
+
+Strategies are evaluated on all paths at once by kernels stepping through the bars with one array
+operation per rule across every path: the kernel below for LongOnly/ShortOnly, the roulette engine for
+RouletteStrategy. They replay the per-bar rules of the strategies with the same floating point
+expressions, so a path holding the real feed reproduces the strategy's PnL exactly.
+"""
+from app.backtest.ParamSweep import SIGNAL_STRATEGIES
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+from app.pnl.Benchmarks import buy_and_hold_pnl, BENCHMARK_FIELDS
+from app.strategies.BaseStrategy import BaseStrategy, BaseStrategyParam
+from app.strategies.RouletteStrategy import RouletteStrategy
+from app.strategies.RouletteBacktest import roulette_signals, run_roulette_backtest
+
+import numpy as np
+
+DEFAULT_PATHS = 1000
+DEFAULT_BLOCK = 20 # Bars per bootstrap block, long enough to keep the trends the classifier predicts
+DEFAULT_BATCH = 500 # Paths evaluated at once, bounds the memory of the (paths, bars) arrays
+
+
+def signal_paths_pnl(close: np.ndarray, is_target: np.ndarray, direction: int, param: BaseStrategyParam) -> np.ndarray:
+    """
+    PnL of a LongOnly/ShortOnly strategy on each path.
+
+    :param close: np.ndarray - (paths, bars) closes.
+    :param is_target: np.ndarray - (paths, bars) whether the classifier predicts the strategy's target label.
+    """
+    paths, bars = close.shape
+    capital = np.full(paths, float(param.initial_capital))
+    shares = np.zeros(paths)
+    buy_spot = np.ones(paths)
+    bought = np.zeros(paths, dtype=bool)
+    day_counter = np.zeros(paths, dtype=np.int64)
+    non_buy_counter = np.zeros(paths, dtype=np.int64)
+
+    for bar in range(bars):
+        price = close[:, bar]
+        target = is_target[:, bar]
+
+        # Enter on the target label, the entry bar is not checked for exits
+        buying = target & ~bought
+        if buying.any():
+            entered = direction * capital[buying] / price[buying]
+            shares[buying] = entered
+            capital[buying] -= price[buying] * entered
+            buy_spot[buying] = price[buying]
+            day_counter[buying] = 0
+            non_buy_counter[buying] = 0
+        holding = bought
+        bought = bought | buying
+        if not holding.any():
+            continue
+
+        # Counters: target bars reset the sell counter and count towards the holding period
+        held_target = holding & target
+        day_counter[held_target] += 1
+        non_buy_counter[held_target] = 0
+        non_buy_counter[holding & ~target] += 1
+        non_buy_counter[held_target & (day_counter == param.holding_period)] = param.sell_counter_threshold - 1
+
+        # Stop loss first, then the sell counter
+        loss = direction * (price - buy_spot) / buy_spot
+        selling = holding & ((loss <= param.stop_loss_percentage) | (non_buy_counter >= param.sell_counter_threshold))
+        if selling.any():
+            capital[selling] += price[selling] * shares[selling]
+            shares[selling] = 0
+            bought = bought & ~selling
+
+    # Positions still open are closed at the last bar
+    if bars:
+        capital[bought] += close[bought, -1] * shares[bought]
+    return capital - param.initial_capital
+
+
+def roulette_paths_pnl(close: np.ndarray, cell_strategy: np.ndarray, mean_reversion: np.ndarray, param: BaseStrategyParam) -> np.ndarray:
+    """
+    PnL of RouletteStrategy on each path, every path a row of the roulette engine.
+
+    :param cell_strategy: np.ndarray - (paths, bars) CellStrategy set on the current cell at each bar.
+    :param mean_reversion: np.ndarray - (paths, bars) TradeDecision of the RSI vote at each bar.
+    """
+    result = run_roulette_backtest(close, cell_strategy, mean_reversion, param.roulette_size, param.initial_capital)
+    return result.final_capital - param.initial_capital
+
+
+class PathSignals:
+    """
+    Per-bar inputs of the path kernels for one feed, each a (bars,) array.
+    """
+    close: np.ndarray
+    label: np.ndarray # Classifier-driven signal permuted by the label test
+    decision: np.ndarray # Other signal kept aligned with its bar, None if the strategy has none
+
+    def __init__(self, close: np.ndarray, label: np.ndarray, decision: np.ndarray = None):
+        self.close = close
+        self.label = label
+        self.decision = decision
+
+
+def path_signals(feed: ColumnarDataFeed, strategy_class: type[BaseStrategy], param: BaseStrategyParam) -> PathSignals:
+    close = np.asarray(feed['close'], dtype=np.float64)
+    if strategy_class in SIGNAL_STRATEGIES:
+        target_label, _ = SIGNAL_STRATEGIES[strategy_class]
+        return PathSignals(close, np.asarray(feed['predicted_label']) == target_label)
+    if strategy_class is RouletteStrategy:
+        signals = roulette_signals(feed, param.decision_factory)
+        return PathSignals(close, signals.cell_strategy, signals.mean_reversion)
+    raise ValueError(f"No path kernel for {strategy_class.strategy_name}")
+
+
+def paths_pnl(strategy_class: type[BaseStrategy], param: BaseStrategyParam, close: np.ndarray, label: np.ndarray, decision: np.ndarray = None) -> np.ndarray:
+    if strategy_class in SIGNAL_STRATEGIES:
+        _, direction = SIGNAL_STRATEGIES[strategy_class]
+        return signal_paths_pnl(close, label, direction, param)
+    return roulette_paths_pnl(close, label, decision, param)
+
+
+def permuted_rows(paths: int, bars: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    (paths, bars) bar indices, each row an independent permutation.
+    """
+    return rng.permuted(np.broadcast_to(np.arange(bars), (paths, bars)), axis=1)
+
+
+def block_bootstrap_rows(paths: int, bars: int, block: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    (paths, bars) bar indices of circular block bootstrap paths. Bar 0 is kept as the starting point,
+    the other positions are filled with blocks of consecutive bars among 1..bars-1.
+    """
+    rows = np.zeros((paths, bars), dtype=np.int64)
+    if bars < 2:
+        return rows
+    count = bars - 1
+    blocks = -(-count // block)
+    starts = rng.integers(0, count, size=(paths, blocks))
+    offsets = (starts[:, :, None] + np.arange(block)).reshape(paths, -1)[:, :count]
+    rows[:, 1:] = offsets % count + 1
+    return rows
+
+
+def bootstrap_close(close: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Closes rebuilt from the returns of the sampled bars, starting from the first close.
+    """
+    returns = np.ones_like(close)
+    returns[1:] = close[1:] / close[:-1]
+    sampled = returns[rows]
+    sampled[:, 0] = 1.0
+    return close[0] * np.cumprod(sampled, axis=1)
+
+
+class TickerSignificance:
+    ticker: str
+    pnl: float # Strategy PnL on the real feed
+    benchmark_pnl: float
+    permuted_pnl: np.ndarray # Strategy PnL on each label permutation path
+    bootstrap_excess: np.ndarray # Strategy minus buy-and-hold PnL on each bootstrap path
+
+    def __init__(self, ticker: str, pnl: float, benchmark_pnl: float, permuted_pnl: np.ndarray, bootstrap_excess: np.ndarray):
+        self.ticker = ticker
+        self.pnl = pnl
+        self.benchmark_pnl = benchmark_pnl
+        self.permuted_pnl = permuted_pnl
+        self.bootstrap_excess = bootstrap_excess
+
+    @property
+    def passed(self) -> bool:
+        return self.pnl > self.benchmark_pnl
+
+    @property
+    def permutation_p_value(self) -> float:
+        # The real labels count as one of the permutations, so the p-value is never 0
+        return (1 + np.count_nonzero(self.permuted_pnl >= self.pnl)) / (1 + len(self.permuted_pnl))
+
+    @property
+    def bootstrap_p_value(self) -> float:
+        return (1 + np.count_nonzero(self.bootstrap_excess <= 0)) / (1 + len(self.bootstrap_excess))
+
+    def summary(self) -> dict:
+        return {
+            'ticker': self.ticker,
+            'pnl': self.pnl,
+            'benchmark_pnl': self.benchmark_pnl,
+            'status': "PASS" if self.passed else "FAIL",
+            'permutation_p_value': self.permutation_p_value,
+            'bootstrap_p_value': self.bootstrap_p_value,
+            'bootstrap_excess_mean': float(self.bootstrap_excess.mean()),
+        }
+
+    def __repr__(self):
+        return f"<TickerSignificance(ticker={self.ticker}, permutation_p={self.permutation_p_value:.4f}, bootstrap_p={self.bootstrap_p_value:.4f})>"
+
+
+class SignificanceReport:
+    strategy_name: str
+    paths: int
+    tickers: dict[str, TickerSignificance]
+
+    def __init__(self, strategy_name: str, paths: int, tickers: dict[str, TickerSignificance]):
+        self.strategy_name = strategy_name
+        self.paths = paths
+        self.tickers = tickers
+
+    def toRows(self) -> list[dict]:
+        return [{'strategy': self.strategy_name, **result.summary()} for result in self.tickers.values()]
+
+    def format(self) -> str:
+        lines = [f"{'ticker':6} | {'status':6} | {'excess pnl':>12} | {'permutation p':>13} | {'bootstrap p':>11}"]
+        for row in self.toRows():
+            lines.append(
+                f"{row['ticker']:6} | {row['status']:6} | {row['pnl'] - row['benchmark_pnl']:12.2f} | "
+                f"{row['permutation_p_value']:13.4f} | {row['bootstrap_p_value']:11.4f}"
+            )
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"<SignificanceReport(strategy={self.strategy_name}, paths={self.paths}, tickers={len(self.tickers)})>"
+
+
+def ticker_significance(
+    feed: ColumnarDataFeed,
+    strategy_class: type[BaseStrategy],
+    param: BaseStrategyParam,
+    paths: int = DEFAULT_PATHS,
+    block: int = DEFAULT_BLOCK,
+    rng: np.random.Generator = None,
+    batch: int = DEFAULT_BATCH
+) -> TickerSignificance:
+    rng = np.random.default_rng() if rng is None else rng
+    signals = path_signals(feed, strategy_class, param)
+    close = signals.close
+    bars = len(close)
+    in_place = np.arange(bars)
+
+    def evaluate(close_paths: np.ndarray, label_rows: np.ndarray, decision_rows: np.ndarray) -> np.ndarray:
+        decision = signals.decision[decision_rows] if signals.decision is not None else None
+        return paths_pnl(strategy_class, param, close_paths, signals.label[label_rows], decision)
+
+    pnl = evaluate(close[None, :], in_place[None, :], in_place[None, :])[0].item()
+    benchmark = buy_and_hold_pnl(close[0].item(), close[-1].item(), param.initial_capital)
+
+    permuted, excess = [], []
+    for start in range(0, paths, batch):
+        size = min(batch, paths - start)
+        # Labels shuffled across bars, closes and RSI decisions in place
+        kept = np.broadcast_to(in_place, (size, bars))
+        permuted.append(evaluate(np.broadcast_to(close, (size, bars)), permuted_rows(size, bars, rng), kept))
+        # Bars resampled in blocks, with their return, label and decision
+        rows = block_bootstrap_rows(size, bars, block, rng)
+        bootstrap = bootstrap_close(close, rows)
+        excess.append(evaluate(bootstrap, rows, rows) - buy_and_hold_pnl(bootstrap[:, 0], bootstrap[:, -1], param.initial_capital))
+
+    return TickerSignificance(feed.ticker, pnl, benchmark, np.concatenate(permuted), np.concatenate(excess))
+
+
+def run_significance(
+    datafeeder,
+    tickers: list[str],
+    model: str,
+    feature_set: str,
+    strategy_class: type[BaseStrategy],
+    param: BaseStrategyParam,
+    paths: int = DEFAULT_PATHS,
+    block: int = DEFAULT_BLOCK,
+    seed: int = None
+) -> SignificanceReport:
+    """
+    Runs the label permutation and block bootstrap tests of strategy_class against buy-and-hold on every ticker.
+
+    :param datafeeder: DataFeeder - Used once, through pullMany, to fetch all the feeds.
+    :param paths: int - Number of paths of each test per ticker.
+    :param block: int - Number of consecutive bars per bootstrap block.
+    :param seed: int - Seed of the random generator, for reproducible p-values.
+    """
+    rng = np.random.default_rng(seed)
+    fields = set(strategy_class.required_fields).union(BENCHMARK_FIELDS)
+    feeds = datafeeder.pullMany(tickers, model, feature_set, fields)
+    results = {
+        ticker: ticker_significance(feed, strategy_class, param, paths, block, rng)
+        for ticker, feed in feeds.items()
+        if len(feed)
+    }
+    return SignificanceReport(strategy_class.strategy_name, paths, results)
@@ -0,0 +1,218 @@
+"""
+Walk-forward evaluation over rolling windows.
+
+Each ticker's feed is pulled once, then the strategy and BAHStrategy are evaluated on many [start, end)
+windows of its bars:
+- BAHStrategy PnL of every window at once, in closed form from the closes at the window bounds
+- LongOnly/ShortOnly on the signal-array engine, every window sharing one set of label lookups
+- RouletteStrategy on the roulette engine, its signals computed once per feed and every window a row
+  of one batched run
+Strategies without an engine fall back to running the strategy once per window, on a slice of the feed.
+A window run gives the same PnL as running the strategy on a feed holding only the window's bars.
+
+The report gives, per ticker, the share of windows where the strategy beats the benchmark and the
+distribution of the strategy and excess PnL across windows.
+"""
+from app.backtest.ParamSweep import SIGNAL_STRATEGIES
+from app.datafeed.StaticDataFeeder import StaticDataFeeder
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+from app.pnl.Benchmarks import buy_and_hold_pnl
+from app.pnl.PnLReporting import calculate_pnl
+from app.strategies.BaseStrategy import BaseStrategy, BaseStrategyParam
+from app.strategies.BAHStrategy import BAHStrategy
+from app.strategies.RouletteStrategy import RouletteStrategy
+from app.strategies.RouletteBacktest import roulette_signals, run_roulette_backtest
+from app.strategies.SignalBacktest import SignalArrays, run_signal_backtest
+
+import numpy as np
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def rolling_windows(length: int, window: int, step: int, anchored: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Bounds of the [start, end) windows of window bars, every step bars, that fit in length bars.
+
+    :param anchored: bool - Start every window at bar 0 and grow it by step instead (expanding walk-forward).
+    """
+    if window < 1 or step < 1:
+        raise ValueError(f"Walk-forward window and step must be at least 1 bar, got window={window}, step={step}")
+    ends = np.arange(window, length + 1, step, dtype=np.int64)
+    starts = np.zeros_like(ends) if anchored else ends - window
+    return starts, ends
+
+
+def bah_window_pnl(close: np.ndarray, starts: np.ndarray, ends: np.ndarray, initial_capital: float) -> np.ndarray:
+    """
+    BAHStrategy PnL of every window: buy all at the first close, sell all at the last one.
+    """
+    return buy_and_hold_pnl(close[starts], close[ends - 1], initial_capital)
+
+
+def signal_window_pnl(feed: ColumnarDataFeed, strategy_class: type[BaseStrategy], param: BaseStrategyParam, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    target_label, direction = SIGNAL_STRATEGIES[strategy_class]
+    close = feed['close']
+    signals = SignalArrays(feed['predicted_label'], target_label)
+    pnl = np.empty(len(starts), dtype=np.float64)
+    for index, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        result = run_signal_backtest(
+            close=close,
+            signals=signals,
+            direction=direction,
+            sell_counter_threshold=param.sell_counter_threshold,
+            stop_loss_percentage=param.stop_loss_percentage,
+            holding_period=param.holding_period,
+            initial_capital=param.initial_capital,
+            start=start,
+            end=end
+        )
+        pnl[index] = result.final_capital - param.initial_capital
+    return pnl
+
+
+def roulette_window_pnl(feed: ColumnarDataFeed, param: BaseStrategyParam, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    signals = roulette_signals(feed, param.decision_factory)
+    result = run_roulette_backtest(
+        close=feed['close'],
+        cell_strategy=signals.cell_strategy,
+        mean_reversion=signals.mean_reversion,
+        roulette_size=param.roulette_size,
+        initial_capital=param.initial_capital,
+        starts=starts,
+        ends=ends
+    )
+    return result.final_capital - param.initial_capital
+
+
+def replay_window_pnl(feed: ColumnarDataFeed, strategy_class: type[BaseStrategy], param: BaseStrategyParam, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    pnl = np.empty(len(starts), dtype=np.float64)
+    for index, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        strategy = strategy_class(StaticDataFeeder([feed[start:end]]), param)
+        strategy.reset()
+        strategy.run(ticker=feed.ticker, model=feed.model, feature_set=feed.feature_set)
+        pnl[index] = calculate_pnl(param.initial_capital, strategy.dump_trade_logs())
+    return pnl
+
+
+def window_pnl(feed: ColumnarDataFeed, strategy_class: type[BaseStrategy], param: BaseStrategyParam, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    if strategy_class is BAHStrategy:
+        return bah_window_pnl(feed['close'], starts, ends, param.initial_capital)
+    if strategy_class in SIGNAL_STRATEGIES:
+        return signal_window_pnl(feed, strategy_class, param, starts, ends)
+    if strategy_class is RouletteStrategy:
+        return roulette_window_pnl(feed, param, starts, ends)
+    return replay_window_pnl(feed, strategy_class, param, starts, ends)
+
+
+class TickerWindows:
+    """
+    Strategy and benchmark PnL of one ticker on each window.
+    """
+    ticker: str
+    start_date: np.ndarray
+    end_date: np.ndarray # Last bar of each window
+    pnl: np.ndarray
+    benchmark_pnl: np.ndarray
+
+    def __init__(self, ticker: str, start_date: np.ndarray, end_date: np.ndarray, pnl: np.ndarray, benchmark_pnl: np.ndarray):
+        self.ticker = ticker
+        self.start_date = start_date
+        self.end_date = end_date
+        self.pnl = pnl
+        self.benchmark_pnl = benchmark_pnl
+
+    @property
+    def excess_pnl(self) -> np.ndarray:
+        return self.pnl - self.benchmark_pnl
+
+    @property
+    def passed(self) -> np.ndarray:
+        return self.pnl > self.benchmark_pnl
+
+    def summary(self) -> dict:
+        windows = len(self.pnl)
+        summary = {
+            'ticker': self.ticker,
+            'windows': windows,
+            'pass_rate': float(self.passed.mean()) if windows else None,
+        }
+        for name, values in (('pnl', self.pnl), ('excess_pnl', self.excess_pnl)):
+            summary[f"{name}_mean"] = float(values.mean()) if windows else None
+            summary[f"{name}_std"] = float(values.std()) if windows else None
+            for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES).tolist() if windows else [None] * len(PERCENTILES)):
+                summary[f"{name}_p{percentile}"] = value
+        return summary
+
+    def __len__(self) -> int:
+        return len(self.pnl)
+
+    def __repr__(self):
+        return f"<TickerWindows(ticker={self.ticker}, windows={len(self)})>"
+
+
+class WalkForwardReport:
+    strategy_name: str
+    window: int
+    step: int
+    anchored: bool
+    tickers: dict[str, TickerWindows]
+
+    def __init__(self, strategy_name: str, window: int, step: int, anchored: bool, tickers: dict[str, TickerWindows]):
+        self.strategy_name = strategy_name
+        self.window = window
+        self.step = step
+        self.anchored = anchored
+        self.tickers = tickers
+
+    def toRows(self) -> list[dict]:
+        return [{'strategy': self.strategy_name, **windows.summary()} for windows in self.tickers.values()]
+
+    def format(self) -> str:
+        lines = [f"{'ticker':6} | {'windows':>7} | {'pass':>6} | {'median pnl':>12} | {'p5 excess':>12} | {'median excess':>13} | {'p95 excess':>12}"]
+        for row in self.toRows():
+            if not row['windows']:
+                lines.append(f"{row['ticker']:6} | {0:7} | {'-':>6} | {'-':>12} | {'-':>12} | {'-':>13} | {'-':>12}")
+                continue
+            lines.append(
+                f"{row['ticker']:6} | {row['windows']:7} | {row['pass_rate']:6.1%} | {row['pnl_p50']:12.2f} | "
+                f"{row['excess_pnl_p5']:12.2f} | {row['excess_pnl_p50']:13.2f} | {row['excess_pnl_p95']:12.2f}"
+            )
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"<WalkForwardReport(strategy={self.strategy_name}, window={self.window}, step={self.step}, tickers={len(self.tickers)})>"
+
+
+def walk_forward(
+    datafeeder,
+    tickers: list[str],
+    model: str,
+    feature_set: str,
+    strategy_class: type[BaseStrategy],
+    param: BaseStrategyParam,
+    window: int,
+    step: int,
+    anchored: bool = False
+) -> WalkForwardReport:
+    """
+    Evaluates strategy_class against BAHStrategy on rolling windows of every ticker's bars.
+
+    :param datafeeder: DataFeeder - Used once, through pullMany, to fetch all the feeds.
+    :param window: int - Number of bars per window, the first window size when anchored.
+    :param step: int - Number of bars between consecutive window ends.
+    """
+    fields = set(strategy_class.required_fields).union(BAHStrategy.required_fields)
+    feeds = datafeeder.pullMany(tickers, model, feature_set, fields)
+
+    results = {}
+    for ticker, feed in feeds.items():
+        starts, ends = rolling_windows(len(feed), window, step, anchored)
+        report_dates = feed['report_date']
+        results[ticker] = TickerWindows(
+            ticker=ticker,
+            start_date=report_dates[starts],
+            end_date=report_dates[ends - 1],
+            pnl=window_pnl(feed, strategy_class, param, starts, ends),
+            benchmark_pnl=bah_window_pnl(feed['close'], starts, ends, param.initial_capital)
+        )
+    return WalkForwardReport(strategy_class.strategy_name, window, step, anchored, results)
@@ -0,0 +1,173 @@
+"""
+Asyncio data feeder prefetching upcoming tickers.
+
+AsyncDataFeeder runs the same prepared feed queries as DataFeeder through an async session (see
+create_async_db_session). Its event loop lives in a background thread, so a synchronous ticker loop can
+iterate over iterFeeds and run strategies on ticker N while the queries of the next tickers are in flight.
+The prefetch window is bounded, so at most prefetch chunks are requested ahead of the one consumed.
+"""
+from app.datafeed.DataFeeder import feed_query, materialize_feeds, resolve_fields
+from app.instrumentation.Instrumentation import Instrumentation, stage
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+
+from collections import deque
+from contextlib import aclosing
+from collections.abc import AsyncIterator, Iterable, Iterator
+from itertools import islice
+
+import asyncio
+import queue
+import threading
+
+# Seconds between checks for an abandoned consumer while the prefetch queue is full
+_PUT_TIMEOUT = 0.1
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_DONE = object()
+
+
+class AsyncDataFeeder:
+    def __init__(
+        self,
+        session,
+        prefetch: int = 4,
+        concurrency: int = 2,
+        chunk_size: int = 1,
+        use_feed_table: bool = False,
+        instrumentation: Instrumentation = None
+    ):
+        self.session = session # Async session context manager from create_async_db_session
+        self.prefetch = prefetch # Chunks fetched ahead of the one being consumed
+        self.concurrency = concurrency # Queries in flight at once
+        self.chunk_size = chunk_size # Tickers fetched per query
+        self.use_feed_table = use_feed_table
+        self.instrumentation = instrumentation
+        self._loop: asyncio.AbstractEventLoop = None
+
+    async def pullManyAsync(self, tickers: list[str], classifier_model: str, feature_set: str, fields: Iterable[str] = None)->dict[str, ColumnarDataFeed]:
+        tickers = list(dict.fromkeys(tickers))
+        fields = resolve_fields(fields)
+        parameters = {'tickers': tickers, 'classifier_model': classifier_model, 'feature_set': feature_set}
+        async with self.session() as db:
+            with stage(self.instrumentation, 'query'):
+                result = await db.execute(feed_query(fields, self.use_feed_table), parameters)
+            feeds = materialize_feeds(result, classifier_model, feature_set, self.instrumentation)
+        return {
+            ticker: feeds[ticker] if ticker in feeds else ColumnarDataFeed.empty(ticker, classifier_model, feature_set, fields)
+            for ticker in tickers
+        }
+
+    async def prefetchFeeds(self, tickers: list[str], classifier_model: str, feature_set: str, fields: Iterable[str] = None)->AsyncIterator[ColumnarDataFeed]:
+        """
+        Yields the feeds of tickers in order, with up to prefetch chunks requested ahead and at most
+        concurrency queries running at once.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        chunks = (tickers[start:start+self.chunk_size] for start in range(0, len(tickers), self.chunk_size))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(chunk: list[str]) -> dict[str, ColumnarDataFeed]:
+            async with semaphore:
+                return await self.pullManyAsync(chunk, classifier_model, feature_set, fields)
+
+        tasks = deque(asyncio.create_task(fetch(chunk)) for chunk in islice(chunks, self.prefetch + 1))
+        try:
+            while tasks:
+                feeds = await tasks.popleft()
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    tasks.append(asyncio.create_task(fetch(chunk)))
+                for feed in feeds.values():
+                    yield feed
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def iterFeeds(self, tickers: list[str], classifier_model: str, feature_set: str, fields: Iterable[str] = None)->Iterator[ColumnarDataFeed]:
+        """
+        Synchronous iterator over prefetchFeeds. Queries run on the background event loop while the
+        caller works on the current feed; stopping the iteration early cancels the remaining queries.
+        """
+        feeds = queue.Queue(maxsize=1) # Hand-off only, the prefetch window is bounded by prefetchFeeds
+        abandoned = threading.Event()
+
+        def put(item) -> bool:
+            while not abandoned.is_set():
+                try:
+                    feeds.put(item, timeout=_PUT_TIMEOUT)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        async def produce():
+            try:
+                async with aclosing(self.prefetchFeeds(tickers, classifier_model, feature_set, fields)) as prefetched:
+                    async for feed in prefetched:
+                        if not await asyncio.to_thread(put, feed):
+                            return
+                await asyncio.to_thread(put, _DONE)
+            except Exception as e:
+                await asyncio.to_thread(put, _Failure(e))
+
+        producer = asyncio.run_coroutine_threadsafe(produce(), self._eventLoop())
+        try:
+            while True:
+                item = feeds.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            abandoned.set()
+            producer.cancel()
+
+    def pullData(self, ticker: str, classifier_model: str, feature_set: str, fields: Iterable[str] = None)->ColumnarDataFeed:
+        return self.pullMany([ticker], classifier_model, feature_set, fields)[ticker]
+
+    def pullMany(self, tickers: list[str], classifier_model: str, feature_set: str, fields: Iterable[str] = None)->dict[str, ColumnarDataFeed]:
+        """
+        Blocking pull through the background event loop, so the feeder can stand in for a DataFeeder.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.pullManyAsync(tickers, classifier_model, feature_set, fields), self._eventLoop()
+        ).result()
+
+    def close(self):
+        """
+        Disposes the engine's connections and stops the background event loop.
+        """
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+    async def _shutdown(self):
+        # Let queries of abandoned iterations unwind before the loop stops
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        engine = getattr(self.session, 'engine', None)
+        if engine is not None:
+            await engine.dispose()
+
+    def _eventLoop(self) -> asyncio.AbstractEventLoop:
+        # One loop for the feeder's lifetime, as pooled async connections are bound to the loop that opened them
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="AsyncDataFeeder", daemon=True).start()
+        return self._loop
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
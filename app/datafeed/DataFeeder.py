@@ -1,84 +1,396 @@
-from app.models.TradeBotDataFeed import TradeBotDataFeed
+from app.models.ColumnarDataFeed import ColumnarDataFeed, DataFeedRow, DEFAULT_FIELDS
 from app.models.ClassifierResult import ClassifierResult
 from app.models.MarketData import MarketData
 from app.models.EquityIndicators import EquityIndicators
+from app.models.FeedTable import FeedTable, CLASSIFIER_FIELDS, MARKET_FIELDS, INDICATOR_FIELDS, AVAILABLE_FIELDS
+from app.datafeed.FeedCache import FeedCache
+from app.datafeed.FeedMemo import FeedMemo
+from app.instrumentation.Instrumentation import Instrumentation, stage
 
-from sqlalchemy import select, label
+from sqlalchemy import select, label, func, bindparam, tuple_
 from sqlalchemy.orm import aliased
 
+from collections.abc import Iterable, Iterator
+from itertools import groupby
+from operator import attrgetter
+
+import numpy as np
+
+
+def resolve_fields(fields: Iterable[str] = None) -> tuple[str, ...]:
+    """
+    Returns the fields to pull in selection order, always including report_date.
+    Without fields, the columns of TradeBotDataFeed are pulled.
+    """
+    if fields is None:
+        return DEFAULT_FIELDS
+    fields = set(fields)
+    fields.difference_update(('ticker', 'model', 'feature_set')) # Kept as feed attributes, never pulled as columns
+    unknown = fields.difference(AVAILABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown data feed field(s): {', '.join(sorted(unknown))}")
+    fields.add('report_date')
+    return tuple(name for name in AVAILABLE_FIELDS if name in fields)
+
+
+def model_query(kind: str, fields: tuple[str, ...]):
+    """
+    Returns the market ('market') or classifier ('classifier') query used by DataFeeder.pullModels.
+    """
+    query = MODEL_QUERIES.get((kind, fields))
+    if query is None:
+        query = DataFeeder._buildMarketQuery(fields) if kind == 'market' else DataFeeder._buildClassifierQuery(fields)
+        MODEL_QUERIES[(kind, fields)] = query
+    return query
+
+
+def align_feeds(classifier: ColumnarDataFeed, market: ColumnarDataFeed | None, fields: tuple[str, ...]) -> ColumnarDataFeed:
+    """
+    Inner joins a model's classifier columns with the market columns of the same ticker on report_date.
+    Both feeds are sorted by date. When every market bar has a classifier row, the market arrays are shared.
+    """
+    if market is None or len(market) == 0:
+        return ColumnarDataFeed.empty(classifier.ticker, classifier.model, classifier.feature_set, fields)
+
+    market_dates = market['report_date']
+    dates = classifier['report_date']
+    positions = np.searchsorted(market_dates, dates)
+    found = positions < len(market_dates)
+    found[found] = market_dates[positions[found]] == dates[found]
+
+    if found.all() and np.array_equal(positions, np.arange(len(market_dates))):
+        classifier_columns, market_columns = classifier.columns, market.columns
+    else:
+        classifier_columns = {name: column[found] for name, column in classifier.columns.items()}
+        market_columns = {name: column[positions[found]] for name, column in market.columns.items()}
+
+    columns = {
+        name: classifier_columns[name] if name in classifier_columns else market_columns[name]
+        for name in fields
+    }
+    return ColumnarDataFeed(classifier.ticker, classifier.model, classifier.feature_set, columns)
+
+
+def materialize_feeds(result, classifier_model: str, feature_set: str, instrumentation: Instrumentation = None) -> dict[str, ColumnarDataFeed]:
+    """
+    Splits the rows of a feed query, ordered by (ticker, report_date), into one feed per ticker.
+    """
+    feeds = {}
+    names = tuple(result.keys())
+    for ticker, rows in groupby(result, key=attrgetter('ticker')):
+        with stage(instrumentation, 'materialize', ticker=ticker) as timing:
+            feeds[ticker] = ColumnarDataFeed.fromRows(ticker, classifier_model, feature_set, rows, names)
+            timing.rows = len(feeds[ticker])
+    return feeds
+
+
+def feed_query(fields: tuple[str, ...], feed_table: bool = False):
+    """
+    Returns the feed query of resolved fields, built once per projection and source.
+
+    :param feed_table: bool - Read the denormalized feed table (see FeedTableBuilder) instead of joining the source tables.
+    """
+    query = FEED_QUERIES.get((fields, feed_table))
+    if query is None:
+        query = DataFeeder._buildTableQuery(fields) if feed_table else DataFeeder._buildQuery(fields)
+        FEED_QUERIES[(fields, feed_table)] = query
+    return query
+
 
 class DataFeeder:
-    def __init__(self, session):
+    def __init__(self, session, chunk_size: int = 30, cache: FeedCache = None, verify_cache: bool = True, memo: FeedMemo = None, instrumentation: Instrumentation = None, use_feed_table: bool = False):
         self.session=session
+        self.chunk_size = chunk_size # Number of tickers fetched per query in pullMany
+        self.cache = cache # Optional on-disk feed cache
+        self.verify_cache = verify_cache # Check cached entries against the database fingerprint before use
+        self.memo = memo # Optional in-process memo shared by every strategy using this feeder
+        self.instrumentation = instrumentation # Optional per-stage timings of queries, materialization and cache access
+        self.use_feed_table = use_feed_table # Read the prebuilt fyp.trade_bot_feed table instead of joining on every pull
 
-    def pullData(self, ticker: str, classifier_model: str, feature_set: str)->list[TradeBotDataFeed]:
-        with self.session() as db:
-            # Create an alias for the subquery
-            classifier_subq = (
-                select(
-                    ClassifierResult.report_date.label('report_date'),
-                    ClassifierResult.ticker.label('ticker'),
-                    ClassifierResult.model.label('model'),
-                    ClassifierResult.feature_set.label('feature_set'),
-                    ClassifierResult.uptrend_prob.label('uptrend_prob'),
-                    ClassifierResult.side_prob.label('side_prob'),
-                    ClassifierResult.downtrend_prob.label('downtrend_prob'),
-                    ClassifierResult.predicted_label.label('predicted_label')
-                )
-                .where(
-                    (ClassifierResult.ticker == ticker) &
-                    (ClassifierResult.model == classifier_model) &
-                    (ClassifierResult.feature_set == feature_set)
-                )
-                .alias('classifier_subq')
+    @staticmethod
+    def _buildQuery(fields: tuple[str, ...] = DEFAULT_FIELDS):
+        """
+        Builds the feed query selecting the ticker and the given fields (see resolve_fields), with the
+        tickers, model and feature set as bound parameters. Tickers are an expanding parameter, so
+        chunks of any size share the same compiled statement.
+        """
+        # Create an alias for the subquery
+        classifier_subq = (
+            select(*(getattr(ClassifierResult, name).label(name) for name in ('ticker',) + CLASSIFIER_FIELDS))
+            .where(
+                (ClassifierResult.ticker.in_(bindparam('tickers', expanding=True))) &
+                (ClassifierResult.model == bindparam('classifier_model')) &
+                (ClassifierResult.feature_set == bindparam('feature_set'))
             )
+            .alias('classifier_subq')
+        )
+
+        sources = {name: classifier_subq.c[name] for name in CLASSIFIER_FIELDS}
+        sources.update({name: getattr(MarketData, name) for name in MARKET_FIELDS})
+        sources.update({name: getattr(EquityIndicators, name) for name in INDICATOR_FIELDS})
 
-            # Perform the main query with a left join
-            query = (
-                select( 
-                    classifier_subq.c.report_date,
-                    classifier_subq.c.ticker,
-                    classifier_subq.c.model,
-                    classifier_subq.c.feature_set,
-                    classifier_subq.c.uptrend_prob,
-                    classifier_subq.c.side_prob,
-                    classifier_subq.c.downtrend_prob,
-                    classifier_subq.c.predicted_label,
-                    MarketData.open,
-                    MarketData.close,
-                    EquityIndicators.rsi_1,
-                    EquityIndicators.rsi_2,
-                    EquityIndicators.rsi_3,
-                    EquityIndicators.rsi_4,
-                    EquityIndicators.rsi_5,
-                    EquityIndicators.rsi_6,
-                    EquityIndicators.rsi_7,
-                    EquityIndicators.rsi_8,
-                    EquityIndicators.rsi_9,
-                    EquityIndicators.rsi_10,
-                    EquityIndicators.rsi_11,
-                    EquityIndicators.rsi_12,
-                    EquityIndicators.rsi_13,
-                    EquityIndicators.rsi_14,
-                    EquityIndicators.rsi_15,
-                    EquityIndicators.rsi_16,
-                    EquityIndicators.rsi_17,
-                    EquityIndicators.rsi_18,
-                    EquityIndicators.rsi_19,
-                    EquityIndicators.rsi_20,
+        # Perform the main query with inner joins, kept whatever the fields so every projection has the same bars
+        query = (
+            select(classifier_subq.c.ticker, *(sources[name].label(name) for name in fields))
+            .select_from(
+                classifier_subq.join(
+                    MarketData,
+                    (classifier_subq.c.report_date == MarketData.report_date)
+                    & (classifier_subq.c.ticker == MarketData.ticker)
+                ).join(
+                    EquityIndicators,
+                    (classifier_subq.c.report_date == EquityIndicators.report_date)
+                    & (classifier_subq.c.ticker == EquityIndicators.ticker)
                 )
-                .select_from(
-                    classifier_subq.join(
-                        MarketData,
-                        (classifier_subq.c.report_date == MarketData.report_date)
-                        & (classifier_subq.c.ticker == MarketData.ticker)
-                    ).join(
-                        EquityIndicators,
-                        (classifier_subq.c.report_date == EquityIndicators.report_date)
-                        & (classifier_subq.c.ticker == EquityIndicators.ticker)
-                    )
+            )
+        ).order_by(MarketData.ticker, MarketData.report_date)
+        return query
+
+    @staticmethod
+    def _buildTableQuery(fields: tuple[str, ...] = DEFAULT_FIELDS):
+        """
+        Builds the feed query reading the denormalized feed table. Its primary key leads with
+        (model, feature_set, ticker, report_date), so each ticker is read with one ordered range scan.
+        """
+        return (
+            select(FeedTable.c.ticker, *(FeedTable.c[name] for name in fields))
+            .where(
+                (FeedTable.c.model == bindparam('classifier_model')) &
+                (FeedTable.c.feature_set == bindparam('feature_set')) &
+                (FeedTable.c.ticker.in_(bindparam('tickers', expanding=True)))
+            )
+            .order_by(FeedTable.c.ticker, FeedTable.c.report_date)
+        )
+
+    @staticmethod
+    def _buildMarketQuery(fields: tuple[str, ...]):
+        """
+        Builds the query of the market data and indicator fields of the tickers, independent of any model.
+        """
+        sources = {'report_date': MarketData.report_date}
+        sources.update({name: getattr(MarketData, name) for name in MARKET_FIELDS})
+        sources.update({name: getattr(EquityIndicators, name) for name in INDICATOR_FIELDS})
+        return (
+            select(MarketData.ticker, *(sources[name].label(name) for name in fields))
+            .select_from(
+                MarketData.__table__.join(
+                    EquityIndicators,
+                    (MarketData.report_date == EquityIndicators.report_date)
+                    & (MarketData.ticker == EquityIndicators.ticker)
                 )
-            ).order_by(MarketData.report_date)
+            )
+            .where(MarketData.ticker.in_(bindparam('tickers', expanding=True)))
+            .order_by(MarketData.ticker, MarketData.report_date)
+        )
+
+    @staticmethod
+    def _buildClassifierQuery(fields: tuple[str, ...]):
+        """
+        Builds the query of the classifier fields of the tickers for several (model, feature_set) pairs at once.
+        """
+        return (
+            select(
+                ClassifierResult.ticker,
+                ClassifierResult.model,
+                ClassifierResult.feature_set,
+                *(getattr(ClassifierResult, name).label(name) for name in fields)
+            )
+            .where(
+                (ClassifierResult.ticker.in_(bindparam('tickers', expanding=True))) &
+                (tuple_(ClassifierResult.model, ClassifierResult.feature_set).in_(bindparam('models', expanding=True)))
+            )
+            .order_by(ClassifierResult.ticker, ClassifierResult.model, ClassifierResult.feature_set, ClassifierResult.report_date)
+        )
+
+    def pullFingerprints(self, tickers: list[str], classifier_model: str, feature_set: str)->dict[str, tuple]:
+        """
+        Returns the (max report_date, row count) of the classifier rows of each ticker, or of the feed
+        table rows when reading from it.
+        """
+        fingerprints = {ticker: (None, 0) for ticker in tickers}
+        parameters = {'tickers': list(tickers), 'classifier_model': classifier_model, 'feature_set': feature_set}
+        with stage(self.instrumentation, 'fingerprint'), self.session() as db:
+            query = FEED_TABLE_FINGERPRINT_QUERY if self.use_feed_table else FINGERPRINT_QUERY
+            for ticker, max_report_date, row_count in db.execute(query, parameters):
+                fingerprints[ticker] = (max_report_date, row_count)
+        return fingerprints
+
+    def pullData(self, ticker: str, classifier_model: str, feature_set: str, fields: Iterable[str] = None)->ColumnarDataFeed:
+        return self.pullMany([ticker], classifier_model, feature_set, fields)[ticker]
+
+    def pullMany(self, tickers: list[str], classifier_model: str, feature_set: str, fields: Iterable[str] = None)->dict[str, ColumnarDataFeed]:
+        """
+        Pulls the data feeds of several tickers with one set-based query per chunk of tickers.
+
+        Rows are ordered by (ticker, report_date) on the server and partitioned per ticker on the client.
+        Every requested ticker is present in the result, with an empty feed if it has no data.
+        Tickers found in the memo are served from memory, those in the feed cache from disk, and only
+        the others are queried.
+
+        :param fields: Iterable[str] - Columns to pull (see AVAILABLE_FIELDS), e.g. a strategy's required_fields.
+            Only these columns and report_date are selected; memoized and cached feeds holding more are projected.
+        """
+        tickers = list(dict.fromkeys(tickers)) # Drop duplicates while keeping order
+        fields = resolve_fields(fields)
+        feeds = {}
+        if self.memo is not None:
+            for ticker in tickers:
+                memoized = self.memo.get(ticker, classifier_model, feature_set, fields)
+                if memoized is not None:
+                    feeds[ticker] = memoized
+
+        pending = [ticker for ticker in tickers if ticker not in feeds]
+        if pending:
+            loaded = self._loadMany(pending, classifier_model, feature_set, fields)
+            feeds.update(loaded)
+            if self.memo is not None:
+                for ticker, feed in loaded.items():
+                    self.memo.put(ticker, classifier_model, feature_set, feed)
+
+        return {ticker: feeds[ticker] for ticker in tickers}
+
+    def pullModels(self, tickers: list[str], models: list[tuple[str, str]], fields: Iterable[str] = None)->dict[tuple[str, str], dict[str, ColumnarDataFeed]]:
+        """
+        Pulls the data feeds of several (model, feature_set) pairs on the same tickers.
+
+        Market data and indicators are identical across models, so they are fetched once per ticker. The
+        classifier rows of every model are fetched together and aligned on them by date, giving each model
+        the same bars pullMany would return. Models share the market arrays where their dates match exactly.
+        The cache and memo are bypassed.
+
+        :return: dict - {(model, feature_set): {ticker: feed}}, with every requested ticker present.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        models = list(dict.fromkeys(models))
+        fields = resolve_fields(fields)
+        classifier_fields = tuple(name for name in fields if name in CLASSIFIER_FIELDS)
+        market_fields = ('report_date',) + tuple(name for name in fields if name not in CLASSIFIER_FIELDS)
+        classifier_query = model_query('classifier', classifier_fields)
+        market_query = model_query('market', market_fields)
+
+        feeds = {model: {} for model in models}
+        with self.session() as db:
+            for start in range(0, len(tickers), self.chunk_size):
+                chunk = tickers[start:start+self.chunk_size]
+                with stage(self.instrumentation, 'query'):
+                    result = db.execute(market_query, {'tickers': chunk})
+                names = tuple(result.keys())
+                market = {}
+                for ticker, rows in groupby(result, key=attrgetter('ticker')):
+                    with stage(self.instrumentation, 'materialize', ticker=ticker) as timing:
+                        market[ticker] = ColumnarDataFeed.fromRows(ticker, None, None, rows, names)
+                        timing.rows = len(market[ticker])
+
+                with stage(self.instrumentation, 'query'):
+                    result = db.execute(classifier_query, {'tickers': chunk, 'models': models})
+                names = tuple(result.keys())
+                for (ticker, model, feature_set), rows in groupby(result, key=attrgetter('ticker', 'model', 'feature_set')):
+                    with stage(self.instrumentation, 'materialize', ticker=ticker) as timing:
+                        classifier = ColumnarDataFeed.fromRows(ticker, model, feature_set, rows, names)
+                        feeds[(model, feature_set)][ticker] = align_feeds(classifier, market.get(ticker), fields)
+                        timing.rows = len(classifier)
+
+        for model, feature_set in models:
+            model_feeds = feeds[(model, feature_set)]
+            feeds[(model, feature_set)] = {
+                ticker: model_feeds[ticker] if ticker in model_feeds else ColumnarDataFeed.empty(ticker, model, feature_set, fields)
+                for ticker in tickers
+            }
+        return feeds
+
+    def streamData(self, ticker: str, classifier_model: str, feature_set: str, chunk_rows: int = 10000, fields: Iterable[str] = None)->Iterator[ColumnarDataFeed]:
+        """
+        Streams the data feed of a ticker as consecutive column chunks of at most chunk_rows bars.
+
+        Rows are read through a server-side cursor, so peak memory is bounded by the chunk size
+        whatever the length of the history. The cache and memo are bypassed.
+        """
+        with self.session() as db:
+            query = feed_query(resolve_fields(fields), self.use_feed_table).execution_options(yield_per=chunk_rows)
+            result = db.execute(query, {'tickers': [ticker], 'classifier_model': classifier_model, 'feature_set': feature_set})
+            names = tuple(result.keys())
+            for rows in result.partitions():
+                yield ColumnarDataFeed.fromRows(ticker, classifier_model, feature_set, rows, names)
+
+    def streamBars(self, ticker: str, classifier_model: str, feature_set: str, chunk_rows: int = 10000, fields: Iterable[str] = None)->Iterator[DataFeedRow]:
+        """
+        Streams the data feed of a ticker bar by bar, see streamData.
+        """
+        for chunk in self.streamData(ticker, classifier_model, feature_set, chunk_rows, fields):
+            yield from chunk
+
+    def _loadMany(self, tickers: list[str], classifier_model: str, feature_set: str, fields: tuple[str, ...])->dict[str, ColumnarDataFeed]:
+        feeds = {}
+        fingerprints = {}
+        if self.cache is not None:
+            if self.verify_cache:
+                fingerprints = self.pullFingerprints(tickers, classifier_model, feature_set)
+            for ticker in tickers:
+                with stage(self.instrumentation, 'cache_load', ticker=ticker) as timing:
+                    cached = self.cache.load(ticker, classifier_model, feature_set, fingerprints.get(ticker), fields)
+                    timing.rows = len(cached) if cached is not None else 0
+                if cached is not None:
+                    feeds[ticker] = cached
+
+        missing = [ticker for ticker in tickers if ticker not in feeds]
+        if missing:
+            feeds.update(self._queryMany(missing, classifier_model, feature_set, fields))
+            if self.cache is not None:
+                if not self.verify_cache:
+                    fingerprints = self.pullFingerprints(missing, classifier_model, feature_set)
+                for ticker in missing:
+                    with stage(self.instrumentation, 'cache_store', ticker=ticker, rows=len(feeds[ticker])):
+                        self.cache.store(ticker, classifier_model, feature_set, feeds[ticker], fingerprints[ticker])
+
+        return feeds
+
+    def _queryMany(self, tickers: list[str], classifier_model: str, feature_set: str, fields: tuple[str, ...])->dict[str, ColumnarDataFeed]:
+        feeds = {}
+        query = feed_query(fields, self.use_feed_table)
+        with self.session() as db:
+            for start in range(0, len(tickers), self.chunk_size):
+                parameters = {'tickers': tickers[start:start+self.chunk_size], 'classifier_model': classifier_model, 'feature_set': feature_set}
+                # Rows are fetched by execute (client-side cursor), so query covers the round trip and
+                # materialize the conversion of the fetched rows into column arrays
+                with stage(self.instrumentation, 'query'):
+                    result = db.execute(query, parameters)
+                feeds.update(materialize_feeds(result, classifier_model, feature_set, self.instrumentation))
+        for ticker in tickers:
+            if ticker not in feeds:
+                feeds[ticker] = ColumnarDataFeed.empty(ticker, classifier_model, feature_set, fields)
+        return feeds
+
+
+# Built once per projection and reused by every call and every DataFeeder, so SQLAlchemy serves their
+# compiled form from the engine's statement cache and only the parameters change between executions
+FEED_QUERIES: dict[tuple[str, ...], object] = {}
+MODEL_QUERIES: dict[tuple[str, tuple[str, ...]], object] = {}
+FEED_QUERY = feed_query(DEFAULT_FIELDS)
+
+FINGERPRINT_QUERY = (
+    select(
+        ClassifierResult.ticker,
+        func.max(ClassifierResult.report_date),
+        func.count()
+    )
+    .where(
+        (ClassifierResult.ticker.in_(bindparam('tickers', expanding=True))) &
+        (ClassifierResult.model == bindparam('classifier_model')) &
+        (ClassifierResult.feature_set == bindparam('feature_set'))
+    )
+    .group_by(ClassifierResult.ticker)
+)
 
-            query_result = db.execute(query).all()
-            return [TradeBotDataFeed(*result) for result in query_result]
\ No newline at end of file
+FEED_TABLE_FINGERPRINT_QUERY = (
+    select(
+        FeedTable.c.ticker,
+        func.max(FeedTable.c.report_date),
+        func.count()
+    )
+    .where(
+        (FeedTable.c.model == bindparam('classifier_model')) &
+        (FeedTable.c.feature_set == bindparam('feature_set')) &
+        (FeedTable.c.ticker.in_(bindparam('tickers', expanding=True)))
+    )
+    .group_by(FeedTable.c.ticker)
+)
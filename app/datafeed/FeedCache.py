@@ -0,0 +1,152 @@
+from app.models.ColumnarDataFeed import ColumnarDataFeed, KEY_COLUMNS
+
+from collections.abc import Iterable
+from datetime import date
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+META_FILE = 'meta.json'
+
+
+def directory_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+def evict_by_size(cache_dir: str, max_bytes: int, keep: str = None):
+    """
+    Removes the least recently used entries (sub-directories) of cache_dir until it fits in max_bytes.
+
+    :param keep: str - Entry name that must not be evicted (e.g. the one just written).
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path) and not name.startswith('.'):
+            entries.append((os.path.getmtime(path), directory_size(path), path, name))
+
+    total = sum(size for _, size, _, _ in entries)
+    for _, size, path, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        if name == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+class FeedCache:
+    """
+    On-disk cache of pulled data feeds, one directory of memory-mappable .npy column files per
+    (ticker, model, feature_set) key.
+
+    Each entry stores the fingerprint (max report_date, row count) of the classifier rows it was built
+    from, so it can be validated against the database with a cheap aggregate query.
+
+    Feeds pulled with different fields share the entry: storing a feed keeps the columns already cached
+    for the same fingerprint, so the entry grows to the union of every projection pulled.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entryName(self, ticker: str, model: str, feature_set: str) -> str:
+        return hashlib.sha1(f"{ticker}|{model}|{feature_set}".encode()).hexdigest()
+
+    def _entryPath(self, ticker: str, model: str, feature_set: str) -> str:
+        return os.path.join(self.cache_dir, self._entryName(ticker, model, feature_set))
+
+    def _loadMeta(self, path: str) -> dict | None:
+        try:
+            with open(os.path.join(path, META_FILE)) as meta_file:
+                return json.load(meta_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def load(self, ticker: str, model: str, feature_set: str, fingerprint: tuple = None, fields: Iterable[str] = None) -> ColumnarDataFeed | None:
+        """
+        Returns the cached feed, or None on a miss.
+
+        :param fingerprint: tuple - (max report_date, row count) from the database. If None, the entry is
+            trusted without validation, which allows running without any database connection.
+        :param fields: Iterable[str] - Columns needed, only these are mapped. An entry lacking one is a miss.
+        """
+        path = self._entryPath(ticker, model, feature_set)
+        meta = self._loadMeta(path)
+        if meta is None:
+            return None
+
+        if fingerprint is not None and meta['fingerprint'] != _encode_fingerprint(fingerprint):
+            return None
+
+        names = meta['columns']
+        if fields is not None:
+            names = [name for name in fields if name not in KEY_COLUMNS]
+            if not set(names).issubset(meta['columns']):
+                return None
+        columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+            for name in names
+        }
+        os.utime(path) # Mark the entry as recently used for eviction
+        return ColumnarDataFeed(meta['ticker'], meta['model'], meta['feature_set'], columns)
+
+    def store(self, ticker: str, model: str, feature_set: str, feed: ColumnarDataFeed, fingerprint: tuple):
+        path = self._entryPath(ticker, model, feature_set)
+        columns = dict(feed.columns)
+
+        # Keep the columns of other projections cached from the same rows
+        existing = self._loadMeta(path)
+        if existing is not None and existing['fingerprint'] == _encode_fingerprint(fingerprint):
+            for name in existing['columns']:
+                if name not in columns:
+                    column = np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+                    if len(column) == len(feed):
+                        columns[name] = column
+
+        meta = {
+            'ticker': ticker,
+            'model': model,
+            'feature_set': feature_set,
+            'fingerprint': _encode_fingerprint(fingerprint),
+            'columns': list(columns),
+        }
+
+        # Write into a temporary directory first so a crash never leaves a half written entry behind
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.cache_dir)
+        try:
+            for name, column in columns.items():
+                np.save(os.path.join(staging, f"{name}.npy"), column)
+            with open(os.path.join(staging, META_FILE), 'w') as meta_file:
+                json.dump(meta, meta_file)
+
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(staging, path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        evict_by_size(self.cache_dir, self.max_bytes, keep=os.path.basename(path))
+
+    def invalidate(self, ticker: str, model: str, feature_set: str):
+        shutil.rmtree(self._entryPath(ticker, model, feature_set), ignore_errors=True)
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+
+def _encode_fingerprint(fingerprint: tuple) -> list:
+    max_report_date, row_count = fingerprint
+    if isinstance(max_report_date, date):
+        max_report_date = max_report_date.isoformat()
+    return [max_report_date, row_count]
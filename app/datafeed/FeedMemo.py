@@ -0,0 +1,78 @@
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+
+from collections import OrderedDict
+from collections.abc import Iterable
+
+
+class FeedMemo:
+    """
+    In-process LRU memo of pulled data feeds keyed by (ticker, model, feature_set).
+
+    Capacity can be bounded in rows, in bytes, or both; the least recently used feeds are dropped
+    first when either bound is exceeded. A feed larger than the capacity is never memoized.
+    One feed is kept per key; a lookup asking for fields the feed lacks is a miss.
+    """
+    def __init__(self, max_rows: int = None, max_bytes: int = None):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.feeds: OrderedDict[tuple, ColumnarDataFeed] = OrderedDict()
+        self.rows = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ticker: str, model: str, feature_set: str, fields: Iterable[str] = None) -> ColumnarDataFeed | None:
+        """
+        :param fields: Iterable[str] - Columns needed. A memoized feed holding more is returned projected on them.
+        """
+        key = (ticker, model, feature_set)
+        feed = self.feeds.get(key)
+        if feed is None or (fields is not None and not feed.hasColumns(fields)):
+            self.misses += 1
+            return None
+        self.feeds.move_to_end(key)
+        self.hits += 1
+        return feed.project(fields) if fields is not None else feed
+
+    def put(self, ticker: str, model: str, feature_set: str, feed: ColumnarDataFeed):
+        key = (ticker, model, feature_set)
+        self._remove(key)
+        if not self._fits(len(feed), feed.nbytes):
+            return
+        self.feeds[key] = feed
+        self.rows += len(feed)
+        self.bytes += feed.nbytes
+        while not self._fits(self.rows, self.bytes):
+            self._remove(next(iter(self.feeds)))
+
+    def invalidate(self, ticker: str = None, model: str = None, feature_set: str = None):
+        """
+        Drops the memoized feeds matching every given argument; with no arguments the memo is cleared.
+        """
+        for key in list(self.feeds):
+            if all(value is None or value == part for value, part in zip((ticker, model, feature_set), key)):
+                self._remove(key)
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.feeds),
+            'rows': self.rows,
+            'bytes': self.bytes,
+        }
+
+    def _fits(self, rows: int, nbytes: int) -> bool:
+        return (self.max_rows is None or rows <= self.max_rows) and (self.max_bytes is None or nbytes <= self.max_bytes)
+
+    def _remove(self, key: tuple):
+        feed = self.feeds.pop(key, None)
+        if feed is not None:
+            self.rows -= len(feed)
+            self.bytes -= feed.nbytes
+
+    def __len__(self) -> int:
+        return len(self.feeds)
+
+    def __repr__(self):
+        return f"<FeedMemo(entries={len(self.feeds)}, rows={self.rows}, bytes={self.bytes}, hits={self.hits}, misses={self.misses})>"
@@ -0,0 +1,128 @@
+"""
+Builder of the denormalized feed table fyp.trade_bot_feed.
+
+The table holds the join of classifier_result with market_data and equity_indicators for each
+(model, feature_set) that is built, so DataFeeder(use_feed_table=True) reads a feed with a single
+range scan instead of re-running the join on every pull. An on-disk snapshot of the same feeds is
+provided by FeedCache.
+
+Refreshes are incremental: for each ticker only the bars after the last date already in the table
+are inserted, so a nightly refresh only adds the classifier rows that landed since the previous one.
+Rows changed or backfilled before that date need a rebuild.
+
+Usage:
+    python -m app.datafeed.FeedTableBuilder --model MLPv2 --feature-set "processed technical indicators (20 days)"
+"""
+from app.models.ClassifierResult import ClassifierResult
+from app.models.MarketData import MarketData
+from app.models.EquityIndicators import EquityIndicators
+from app.models.FeedTable import FeedTable, FIELD_SOURCES, AVAILABLE_FIELDS
+
+from sqlalchemy import delete, func, insert, literal, select, text
+
+
+def create_feed_table(session):
+    with session() as db:
+        FeedTable.create(db.connection(), checkfirst=True)
+        db.commit()
+
+
+def build_feed_table(
+    session,
+    classifier_model: str,
+    feature_set: str,
+    tickers: list[str] = None,
+    rebuild: bool = False,
+    cluster: bool = False
+) -> int:
+    """
+    Inserts the joined feed rows of (classifier_model, feature_set) missing from the feed table.
+
+    :param tickers: list[str] - Tickers to build, all tickers of the model when None.
+    :param rebuild: bool - Delete the rows already built for these tickers first, for backfills and corrections.
+    :param cluster: bool - Physically reorder the table by its primary key afterwards (PostgreSQL only).
+    :return: int - Number of rows inserted.
+    """
+    ticker_filter = FeedTable.c.ticker.in_(tickers) if tickers is not None else True
+    with session() as db:
+        if rebuild:
+            db.execute(
+                delete(FeedTable)
+                .where(FeedTable.c.model == classifier_model)
+                .where(FeedTable.c.feature_set == feature_set)
+                .where(ticker_filter)
+            )
+
+        # Last date already built per ticker
+        built = (
+            select(FeedTable.c.ticker, func.max(FeedTable.c.report_date).label('built_until'))
+            .where(FeedTable.c.model == classifier_model)
+            .where(FeedTable.c.feature_set == feature_set)
+            .where(ticker_filter)
+            .group_by(FeedTable.c.ticker)
+            .subquery('built')
+        )
+
+        source = (
+            select(
+                literal(classifier_model).label('model'),
+                literal(feature_set).label('feature_set'),
+                ClassifierResult.ticker,
+                *(FIELD_SOURCES[name] for name in AVAILABLE_FIELDS)
+            )
+            .select_from(ClassifierResult)
+            .join(
+                MarketData,
+                (ClassifierResult.report_date == MarketData.report_date)
+                & (ClassifierResult.ticker == MarketData.ticker)
+            )
+            .join(
+                EquityIndicators,
+                (ClassifierResult.report_date == EquityIndicators.report_date)
+                & (ClassifierResult.ticker == EquityIndicators.ticker)
+            )
+            .outerjoin(built, built.c.ticker == ClassifierResult.ticker)
+            .where(ClassifierResult.model == classifier_model)
+            .where(ClassifierResult.feature_set == feature_set)
+            .where(ClassifierResult.ticker.in_(tickers) if tickers is not None else True)
+            .where(built.c.built_until.is_(None) | (ClassifierResult.report_date > built.c.built_until))
+        )
+
+        result = db.execute(insert(FeedTable).from_select(['model', 'feature_set', 'ticker', *AVAILABLE_FIELDS], source))
+        db.commit()
+        inserted = result.rowcount
+
+        if cluster and db.get_bind().dialect.name == 'postgresql':
+            db.execute(text(f"CLUSTER {FeedTable.schema}.{FeedTable.name} USING {FeedTable.primary_key.name}"))
+            db.execute(text(f"ANALYZE {FeedTable.schema}.{FeedTable.name}"))
+            db.commit()
+
+    return inserted
+
+
+if __name__ == "__main__":
+    from app.db.session import create_db_session
+
+    from dotenv import load_dotenv
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Build or refresh the denormalized feed table.")
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--feature-set", required=True)
+    parser.add_argument("--tickers", nargs="*", help="Tickers to build, all when omitted")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the rows already present")
+    parser.add_argument("--cluster", action="store_true", help="CLUSTER the table by its primary key afterwards")
+    args = parser.parse_args()
+
+    load_dotenv()
+    session = create_db_session(
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        database=os.getenv("DB_NAME"),
+        port=os.getenv("DB_PORT")
+    )
+    create_feed_table(session)
+    inserted = build_feed_table(session, args.model, args.feature_set, args.tickers, args.rebuild, args.cluster)
+    print(f"Inserted {inserted} rows into {FeedTable.schema}.{FeedTable.name}")
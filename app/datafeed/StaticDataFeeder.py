@@ -0,0 +1,30 @@
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+
+from collections.abc import Iterable
+
+
+class StaticDataFeeder:
+    """
+    DataFeeder stand-in serving feeds that are already in memory, e.g. fetched once with
+    DataFeeder.pullMany and then replayed through strategies many times.
+    """
+    def __init__(self, feeds: list[ColumnarDataFeed] = ()):
+        self.feeds: dict[tuple, ColumnarDataFeed] = {}
+        for feed in feeds:
+            self.add(feed)
+
+    def add(self, feed: ColumnarDataFeed):
+        self.feeds[(feed.ticker, feed.model, feed.feature_set)] = feed
+
+    def pullData(self, ticker: str, classifier_model: str, feature_set: str, fields: Iterable[str] = None)->ColumnarDataFeed:
+        """
+        :param fields: Iterable[str] - Columns needed, the feed is projected on them like DataFeeder would pull it.
+        """
+        try:
+            feed = self.feeds[(ticker, classifier_model, feature_set)]
+        except KeyError:
+            raise KeyError(f"No data feed loaded for ticker={ticker}, model={classifier_model}, feature_set={feature_set}") from None
+        return feed.project(fields) if fields is not None else feed
+
+    def pullMany(self, tickers: list[str], classifier_model: str, feature_set: str, fields: Iterable[str] = None)->dict[str, ColumnarDataFeed]:
+        return {ticker: self.pullData(ticker, classifier_model, feature_set, fields) for ticker in dict.fromkeys(tickers)}
@@ -1,20 +1,139 @@
-def upload_trade_logs_to_database(session, trade_log_list):
+from app.models.TradeLog import TradeLog
+from app.models.TradeLedger import TradeLedger
+
+from sqlalchemy import insert
+
+import csv
+import io
+import queue
+import threading
+
+# Columns written by the bulk paths, trade_id is left to the database
+TRADE_LOG_COLUMNS = ('report_date', 'ticker', 'strategy', 'action', 'price', 'shares', 'note')
+
+
+def upload_trade_logs_to_database(session, trade_log_list, bulk: bool = False, batch_size: int = 1000, method: str = "executemany"):
     """
     Uploads a list of TradeLog objects into the database.
-    
-    :param trade_log_list: List[TradeLog] - A list of TradeLog objects to be uploaded.
+
+    :param trade_log_list: List[TradeLog] | TradeLedger - A list of TradeLog objects, or a strategy ledger converted to TradeLog objects here.
+    :param bulk: bool - Skip the ORM unit of work and insert the rows in batches, see upload_trade_logs_bulk.
 
     """
+    if bulk:
+        return upload_trade_logs_bulk(session, trade_log_list, batch_size=batch_size, method=method)
+    if isinstance(trade_log_list, TradeLedger):
+        trade_log_list = trade_log_list.toTradeLogs()
     try:
         # Use the session within a context manager to ensure it's properly closed after use
         with session() as session:
             # Add each TradeLog object to the session
             for trade_log in trade_log_list:
                 session.add(trade_log)
-            
+
             # Commit the changes to the database
             session.commit()
     except Exception as e:
         print(f"An error occurred: {e}")
         raise  # Re-raise exception after logging
 
+
+def upload_trade_logs_bulk(session, trade_log_list, batch_size: int = 1000, method: str = "executemany"):
+    """
+    Uploads trade logs in batches within one transaction, bypassing the ORM unit of work.
+
+    :param trade_log_list: List[TradeLog] | TradeLedger - Any objects with the TradeLog attributes, or a ledger read without conversion.
+    :param batch_size: int - Number of rows sent per statement.
+    :param method: str - "executemany" runs a Core insert per batch, "copy" streams each batch with
+        PostgreSQL COPY (psycopg2 only).
+    """
+    if isinstance(trade_log_list, TradeLedger):
+        rows = list(trade_log_list.rows(TRADE_LOG_COLUMNS))
+    else:
+        rows = [tuple(getattr(trade_log, column) for column in TRADE_LOG_COLUMNS) for trade_log in trade_log_list]
+    try:
+        with session() as db:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start+batch_size]
+                match method:
+                    case "executemany":
+                        db.execute(insert(TradeLog.__table__), [dict(zip(TRADE_LOG_COLUMNS, row)) for row in batch])
+                    case "copy":
+                        _copy_rows(db, batch)
+                    case _:
+                        raise ValueError(f"Unknown upload method: {method}")
+            db.commit()
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        raise  # Re-raise exception after logging
+
+
+def _copy_rows(db, rows: list[tuple]):
+    buffer = io.StringIO()
+    # Quote strings so empty notes stay empty strings, unquoted empty fields are NULL in COPY
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+    buffer.seek(0)
+
+    table = TradeLog.__table__
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.schema}.{table.name} ({', '.join(TRADE_LOG_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+class TradeLogWriter:
+    """
+    Background thread uploading trade logs with upload_trade_logs_bulk, so the next backtest can start
+    while the previous logs are flushed.
+
+    Usage:
+        with TradeLogWriter(session) as writer:
+            for ticker in tickers:
+                ...
+                writer.submit(strategy.dump_trade_logs())
+
+    An upload error is re-raised by the next submit or by close.
+    """
+    _STOP = object()
+
+    def __init__(self, session, batch_size: int = 1000, method: str = "executemany", max_pending: int = 8):
+        self.session = session
+        self.batch_size = batch_size
+        self.method = method
+        self.error: Exception = None
+        self._queue = queue.Queue(maxsize=max_pending) # Bounds the memory held by pending uploads
+        self._thread = threading.Thread(target=self._run, name="TradeLogWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, trade_log_list):
+        self._raiseError()
+        self._queue.put(trade_log_list if isinstance(trade_log_list, TradeLedger) else list(trade_log_list))
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        self._raiseError()
+
+    def _run(self):
+        while True:
+            trade_log_list = self._queue.get()
+            if trade_log_list is self._STOP:
+                return
+            if self.error is not None:
+                continue # Drain the queue without uploading once an upload has failed
+            try:
+                upload_trade_logs_bulk(self.session, trade_log_list, batch_size=self.batch_size, method=self.method)
+            except Exception as e:
+                self.error = e
+
+    def _raiseError(self):
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from contextlib import contextmanager
-from typing import ContextManager
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from contextlib import asynccontextmanager, contextmanager, ExitStack
+from typing import AsyncContextManager, ContextManager
 from sqlalchemy.orm import Session
 
 def create_db_session(
@@ -10,29 +11,51 @@ def create_db_session(
     host: str,
     port: str = "5432",
     database: str = "postgres",
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_pre_ping: bool = True,
+    pool_recycle: int = 1800,
+    pool_timeout: int = 30,
+    warm_up: int = 0,
     **kwargs
 ) -> ContextManager[Session]:
     """
     Create and return a database session context manager.
-    
+
     Args:
         user: Database username
         password: Database password
         host: Database host
         port: Database port (default: "5432")
         database: Database name (default: "postgres")
+        pool_size: Connections kept open in the pool (default: 5)
+        max_overflow: Extra connections opened above pool_size under load (default: 10)
+        pool_pre_ping: Test connections on checkout and replace dropped ones (default: True)
+        pool_recycle: Seconds after which a connection is replaced, -1 to disable (default: 1800)
+        pool_timeout: Seconds to wait for a free connection (default: 30)
+        warm_up: Connections opened eagerly, so the first queries skip the connection handshake (default: 0)
         **kwargs: Additional arguments for create_engine
-        
+
     Returns:
-        Context manager that yields database session
+        Context manager that yields database session, with the engine available as its engine attribute
     """
     # Create database URL
     database_url = f"postgresql://{user}:{password}@{host}:{port}/{database}"
-    
+
     # Create SQLAlchemy engine and session
-    engine = create_engine(database_url, **kwargs)
+    engine = create_engine(
+        database_url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle,
+        pool_timeout=pool_timeout,
+        **kwargs
+    )
+    if warm_up:
+        warm_up_pool(engine, warm_up)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    
+
     @contextmanager
     def get_db():
         db = SessionLocal()
@@ -40,5 +63,60 @@ def create_db_session(
             yield db
         finally:
             db.close()
-            
-    return get_db
\ No newline at end of file
+
+    get_db.engine = engine
+    return get_db
+
+def warm_up_pool(engine, connections: int):
+    """
+    Opens connections at once and returns them to the pool, each checked with a trivial query.
+    Connections beyond pool_size are closed again on return, so at most pool_size stay warm.
+    """
+    with ExitStack() as stack:
+        for _ in range(connections):
+            connection = stack.enter_context(engine.connect())
+            connection.execute(text("SELECT 1"))
+
+def create_async_db_session(
+    user: str,
+    password: str,
+    host: str,
+    port: str = "5432",
+    database: str = "postgres",
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_pre_ping: bool = True,
+    pool_recycle: int = 1800,
+    pool_timeout: int = 30,
+    **kwargs
+) -> AsyncContextManager[AsyncSession]:
+    """
+    Create and return an asyncio database session context manager, using the asyncpg driver.
+
+    Args:
+        Same as create_db_session, without warm_up
+        **kwargs: Additional arguments for create_async_engine
+
+    Returns:
+        Async context manager that yields an AsyncSession, with the engine available as its engine attribute
+    """
+    database_url = f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{database}"
+
+    engine = create_async_engine(
+        database_url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle,
+        pool_timeout=pool_timeout,
+        **kwargs
+    )
+    SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    @asynccontextmanager
+    async def get_db():
+        async with SessionLocal() as db:
+            yield db
+
+    get_db.engine = engine
+    return get_db
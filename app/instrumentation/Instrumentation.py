@@ -0,0 +1,223 @@
+"""
+Stage-level instrumentation of backtest runs.
+
+Wall time, call counts and row counts are accumulated per (stage, strategy, ticker), e.g. the feed
+query, row materialization, the strategy loop, calculate_pnl and the upload. Each (strategy, ticker)
+run can optionally be captured with cProfile and tracemalloc. The report is written as JSON and as a
+Prometheus text exposition file.
+
+Usage:
+    instrumentation = Instrumentation(profile=True)
+    with instrumentation.stage("pnl", strategy="LongOnlyStrategy", ticker="AAPL") as timing:
+        pnl = calculate_pnl(10000, trades)
+        timing.rows = len(trades)
+    instrumentation.write("reports/backtest")
+"""
+from contextlib import contextmanager, nullcontext
+
+import cProfile
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+
+METRIC_PREFIX = "tradebot"
+
+
+class StageTiming:
+    """
+    Mutable record yielded by Instrumentation.stage, so the rows handled can be set inside the block.
+    """
+    __slots__ = ('rows',)
+
+    def __init__(self, rows: int = 0):
+        self.rows = rows
+
+
+class Instrumentation:
+    """
+    Collects stage timings and optional profiles. Instances only hold plain data, so a worker process
+    can fill its own instance (see spawn) and send it back to be merged into the parent's.
+
+    Stages can be recorded from several threads, e.g. AsyncDataFeeder's event loop thread while the main
+    thread runs strategies: updates to the accumulators are serialized by a lock.
+    """
+    def __init__(self, profile: bool = False, trace_memory: bool = False, profile_top: int = 25):
+        self.profile = profile # Capture each (strategy, ticker) run with cProfile
+        self.trace_memory = trace_memory # Record the peak traced memory of each (strategy, ticker) run
+        self.profile_top = profile_top # Number of functions kept per profile, by cumulative time
+        self.stages: dict[tuple, list] = {} # (stage, strategy, ticker) -> [calls, seconds, rows]
+        self.captures: list[dict] = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled, the receiving process makes its own
+        state = dict(vars(self))
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self._lock = threading.Lock()
+
+    def spawn(self) -> 'Instrumentation':
+        """
+        Returns an empty instance with the same settings.
+        """
+        return Instrumentation(self.profile, self.trace_memory, self.profile_top)
+
+    @contextmanager
+    def stage(self, stage: str, strategy: str = None, ticker: str = None, rows: int = 0):
+        timing = StageTiming(rows)
+        start = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            self.record(stage, time.perf_counter() - start, timing.rows, strategy, ticker)
+
+    def record(self, stage: str, seconds: float, rows: int = 0, strategy: str = None, ticker: str = None, calls: int = 1):
+        with self._lock:
+            entry = self.stages.setdefault((stage, strategy, ticker), [0, 0.0, 0])
+            entry[0] += calls
+            entry[1] += seconds
+            entry[2] += rows
+
+    def _stageItems(self) -> list[tuple[tuple, tuple]]:
+        # Consistent copy of the accumulators, safe to iterate while other threads record
+        with self._lock:
+            return [(key, tuple(values)) for key, values in self.stages.items()]
+
+    @contextmanager
+    def capture(self, strategy: str, ticker: str):
+        """
+        Profiles the block with cProfile and/or tracemalloc, according to the instance settings.
+        """
+        if not (self.profile or self.trace_memory):
+            yield
+            return
+
+        profiler = cProfile.Profile() if self.profile else None
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            capture = {'strategy': strategy, 'ticker': ticker}
+            if self.trace_memory:
+                capture['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            if profiler is not None:
+                capture['functions'] = self._topFunctions(profiler)
+            with self._lock:
+                self.captures.append(capture)
+
+    def _topFunctions(self, profiler: cProfile.Profile) -> list[dict]:
+        stats = pstats.Stats(profiler).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:self.profile_top]
+        return [
+            {
+                'function': f"{filename}:{line}({name})",
+                'calls': calls,
+                'primitive_calls': primitive_calls,
+                'tottime': tottime,
+                'cumtime': cumtime,
+            }
+            for (filename, line, name), (primitive_calls, calls, tottime, cumtime, _) in ranked
+        ]
+
+    def merge(self, other: 'Instrumentation'):
+        for (stage, strategy, ticker), (calls, seconds, rows) in other._stageItems():
+            self.record(stage, seconds, rows, strategy, ticker, calls)
+        with self._lock:
+            self.captures.extend(other.captures)
+
+    def totals(self) -> dict[str, dict]:
+        totals = {}
+        for (stage, _, _), (calls, seconds, rows) in self._stageItems():
+            total = totals.setdefault(stage, {'calls': 0, 'seconds': 0.0, 'rows': 0})
+            total['calls'] += calls
+            total['seconds'] += seconds
+            total['rows'] += rows
+        return totals
+
+    def report(self) -> dict:
+        return {
+            'stages': [
+                {'stage': stage, 'strategy': strategy, 'ticker': ticker, 'calls': calls, 'seconds': seconds, 'rows': rows}
+                for (stage, strategy, ticker), (calls, seconds, rows) in self._stageItems()
+            ],
+            'totals': self.totals(),
+            'captures': self.captures,
+        }
+
+    def toPrometheus(self) -> str:
+        lines = []
+        stages = self._stageItems()
+        metrics = [
+            ('stage_calls_total', 0, "Number of times each stage ran."),
+            ('stage_seconds_total', 1, "Wall time spent in each stage, in seconds."),
+            ('stage_rows_total', 2, "Rows or trades handled by each stage."),
+        ]
+        for name, position, help_text in metrics:
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+            for (stage, strategy, ticker), values in stages:
+                labels = _labels(stage=stage, strategy=strategy, ticker=ticker)
+                lines.append(f"{METRIC_PREFIX}_{name}{{{labels}}} {values[position]}")
+
+        memory = [capture for capture in self.captures if 'peak_memory_bytes' in capture]
+        if memory:
+            lines.append(f"# HELP {METRIC_PREFIX}_peak_memory_bytes Peak traced memory of each strategy run.")
+            lines.append(f"# TYPE {METRIC_PREFIX}_peak_memory_bytes gauge")
+            for capture in memory:
+                labels = _labels(strategy=capture['strategy'], ticker=capture['ticker'])
+                lines.append(f"{METRIC_PREFIX}_peak_memory_bytes{{{labels}}} {capture['peak_memory_bytes']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path_prefix: str) -> tuple[str, str]:
+        """
+        Writes <path_prefix>.json and <path_prefix>.prom and returns their paths.
+        """
+        json_path, prometheus_path = f"{path_prefix}.json", f"{path_prefix}.prom"
+        with open(json_path, "w") as file:
+            json.dump(self.report(), file, indent=2)
+        with open(prometheus_path, "w") as file:
+            file.write(self.toPrometheus())
+        return json_path, prometheus_path
+
+    def __repr__(self):
+        return f"<Instrumentation(stages={len(self.stages)}, captures={len(self.captures)})>"
+
+
+def stage(instrumentation: Instrumentation | None, stage: str, strategy: str = None, ticker: str = None, rows: int = 0):
+    """
+    Instrumentation.stage, or a no-op context yielding a StageTiming when instrumentation is None.
+    """
+    if instrumentation is None:
+        return nullcontext(StageTiming(rows))
+    return instrumentation.stage(stage, strategy, ticker, rows)
+
+
+def capture(instrumentation: Instrumentation | None, strategy: str, ticker: str):
+    if instrumentation is None:
+        return nullcontext()
+    return instrumentation.capture(strategy, ticker)
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _escape(value) -> str:
+    if value is None:
+        return ""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
@@ -0,0 +1,147 @@
+from app.models.TradeBotDataFeed import TradeBotDataFeed
+from app.models.EquityIndicators import EquityIndicators
+
+from dataclasses import fields
+from collections.abc import Iterable
+
+import numpy as np
+
+# Columns that are constant for a (ticker, model, feature_set) feed, kept as plain attributes
+KEY_COLUMNS = ('ticker', 'model', 'feature_set')
+
+# Storage dtype of each per-bar column, following the database column types (Float(4) -> float32)
+COLUMN_DTYPES = {
+    'report_date': np.dtype('datetime64[D]'),
+    'uptrend_prob': np.dtype(np.float32),
+    'side_prob': np.dtype(np.float32),
+    'downtrend_prob': np.dtype(np.float32),
+    'predicted_label': np.dtype(np.int32),
+    'open': np.dtype(np.float64),
+    'close': np.dtype(np.float64),
+    **{f"rsi_{day}": np.dtype(np.float32) for day in range(1, 21)},
+    # Other indicators a strategy can request. Columns missing here (low, high, volume, obv) are stored
+    # as float64, so NULLs become NaN
+    **{
+        column.name: np.dtype(np.float32)
+        for column in EquityIndicators.__table__.columns
+        if getattr(column.type, 'precision', None) == 4
+    },
+}
+
+# Column order of a full data feed row, matching TradeBotDataFeed
+FEED_COLUMNS = tuple(field.name for field in fields(TradeBotDataFeed))
+
+# Per-bar columns pulled when no fields are requested
+DEFAULT_FIELDS = tuple(name for name in FEED_COLUMNS if name not in KEY_COLUMNS)
+
+
+class DataFeedRow:
+    """
+    Lightweight view of one bar of a ColumnarDataFeed, exposing the same attributes as TradeBotDataFeed.
+    Values are converted to plain Python scalars (date, int, float) on access.
+    """
+    __slots__ = ('_feed', '_index')
+
+    def __init__(self, feed: 'ColumnarDataFeed', index: int):
+        self._feed = feed
+        self._index = index
+
+    def __getattr__(self, name: str):
+        feed = self._feed
+        if name in KEY_COLUMNS:
+            return getattr(feed, name)
+        try:
+            column = feed.columns[name]
+        except KeyError:
+            raise AttributeError(f"{type(self).__name__} has no attribute {name!r}") from None
+        return column[self._index].item()
+
+    def toDataFeed(self) -> TradeBotDataFeed:
+        return TradeBotDataFeed(**{name: getattr(self, name) for name in FEED_COLUMNS})
+
+    def __repr__(self):
+        return f"<DataFeedRow(date={self.report_date}, ticker={self.ticker}, " \
+               f"model={self.model}, feature_set={self.feature_set}, open={self.open}, close={self.close})>"
+
+
+class ColumnarDataFeed:
+    """
+    Data feed of one (ticker, model, feature_set) stored as one NumPy array per column.
+
+    Iterating or indexing with an integer yields DataFeedRow views, so strategies written against
+    list[TradeBotDataFeed] keep working. Indexing with a column name returns the whole column array,
+    and indexing with a slice returns a new feed sharing the underlying arrays.
+    """
+    ticker: str
+    model: str
+    feature_set: str
+    columns: dict[str, np.ndarray]
+
+    def __init__(self, ticker: str, model: str, feature_set: str, columns: dict[str, np.ndarray]):
+        self.ticker = ticker
+        self.model = model
+        self.feature_set = feature_set
+        self.columns = columns
+
+    @classmethod
+    def fromRows(cls, ticker: str, model: str, feature_set: str, rows: Iterable[tuple], names: Iterable[str] = FEED_COLUMNS) -> 'ColumnarDataFeed':
+        """
+        Builds a feed from result rows whose values follow the column order in names.
+        Key columns (ticker, model, feature_set) found in names are dropped.
+        """
+        names = tuple(names)
+        values = list(zip(*rows))
+        if not values:
+            values = [()] * len(names)
+        columns = {
+            name: np.array(column, dtype=COLUMN_DTYPES.get(name, np.float64))
+            for name, column in zip(names, values)
+            if name not in KEY_COLUMNS
+        }
+        return cls(ticker, model, feature_set, columns)
+
+    @classmethod
+    def empty(cls, ticker: str, model: str, feature_set: str, names: Iterable[str] = FEED_COLUMNS) -> 'ColumnarDataFeed':
+        return cls.fromRows(ticker, model, feature_set, [], names)
+
+    def hasColumns(self, names: Iterable[str]) -> bool:
+        return all(name in KEY_COLUMNS or name in self.columns for name in names)
+
+    def project(self, names: Iterable[str]) -> 'ColumnarDataFeed':
+        """
+        Returns a feed with only the given columns, sharing the underlying arrays.
+        """
+        names = [name for name in names if name not in KEY_COLUMNS]
+        missing = [name for name in names if name not in self.columns]
+        if missing:
+            raise KeyError(f"Data feed of {self.ticker} has no column(s) {', '.join(missing)}")
+        return ColumnarDataFeed(self.ticker, self.model, self.feature_set, {name: self.columns[name] for name in names})
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), ()))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield DataFeedRow(self, index)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, slice):
+            return ColumnarDataFeed(self.ticker, self.model, self.feature_set, {name: column[key] for name, column in self.columns.items()})
+        length = len(self)
+        if key < 0:
+            key += length
+        if not 0 <= key < length:
+            raise IndexError("data feed index out of range")
+        return DataFeedRow(self, key)
+
+    def toDataFeed(self) -> list[TradeBotDataFeed]:
+        return [row.toDataFeed() for row in self]
+
+    def __repr__(self):
+        return f"<ColumnarDataFeed(ticker={self.ticker}, model={self.model}, feature_set={self.feature_set}, rows={len(self)})>"
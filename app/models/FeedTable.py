@@ -0,0 +1,34 @@
+from app.models.ClassifierResult import ClassifierResult
+from app.models.MarketData import MarketData
+from app.models.EquityIndicators import EquityIndicators
+
+from sqlalchemy import Column, MetaData, PrimaryKeyConstraint, String, Table
+
+# Per-bar fields a strategy can request, by source table, in the order they are selected
+CLASSIFIER_FIELDS = ('report_date', 'uptrend_prob', 'side_prob', 'downtrend_prob', 'predicted_label')
+MARKET_FIELDS = ('open', 'close', 'low', 'high', 'volume')
+INDICATOR_FIELDS = tuple(column.name for column in EquityIndicators.__table__.columns if column.name not in ('ticker', 'report_date'))
+AVAILABLE_FIELDS = CLASSIFIER_FIELDS + MARKET_FIELDS + INDICATOR_FIELDS
+
+# Source column of each field in the normalized tables
+FIELD_SOURCES = {
+    **{name: ClassifierResult.__table__.c[name] for name in CLASSIFIER_FIELDS},
+    **{name: MarketData.__table__.c[name] for name in MARKET_FIELDS},
+    **{name: EquityIndicators.__table__.c[name] for name in INDICATOR_FIELDS},
+}
+
+metadata = MetaData()
+
+# Denormalized feed: classifier_result joined with market_data and equity_indicators, one row per bar.
+# The primary key index orders rows by (model, feature_set, ticker, report_date), so the feed of a
+# ticker is one range scan.
+FeedTable = Table(
+    'trade_bot_feed',
+    metadata,
+    Column('model', String, nullable=False),
+    Column('feature_set', String, nullable=False),
+    Column('ticker', String, nullable=False),
+    *(Column(name, source.type, nullable=name != 'report_date') for name, source in FIELD_SOURCES.items()),
+    PrimaryKeyConstraint('model', 'feature_set', 'ticker', 'report_date', name='trade_bot_feed_pkey'),
+    schema='fyp'
+)
@@ -0,0 +1,74 @@
+from app.models.TradeLog import TradeLog
+
+from datetime import date
+
+# Trade attributes recorded by the ledger, the same as the TradeLog columns except the database generated trade_id
+LEDGER_COLUMNS = ('report_date', 'ticker', 'strategy', 'action', 'price', 'shares', 'note')
+
+
+class TradeRecord:
+    """
+    One trade of a TradeLedger, with the same attributes as TradeLog but without ORM instrumentation.
+    """
+    __slots__ = LEDGER_COLUMNS
+
+    def __init__(self, report_date: date, ticker: str, strategy: str, action: str, price: float, shares: float, note: str):
+        self.report_date = report_date
+        self.ticker = ticker
+        self.strategy = strategy
+        self.action = action
+        self.price = price
+        self.shares = shares
+        self.note = note
+
+    def toTradeLog(self) -> TradeLog:
+        return TradeLog(**{name: getattr(self, name) for name in LEDGER_COLUMNS})
+
+    def __repr__(self):
+        return f"<TradeRecord(date={self.report_date}, ticker={self.ticker}, strategy={self.strategy})>"
+
+
+class TradeLedger:
+    """
+    Compact append-only trade log written by strategies, stored as one list per column.
+
+    Iterating yields TradeRecord objects, so code written against list[TradeLog] keeps working.
+    TradeLog ORM objects are only built by toTradeLogs, when the trades are actually uploaded.
+    """
+    def __init__(self):
+        self.columns: dict[str, list] = {name: [] for name in LEDGER_COLUMNS}
+
+    def append(self, report_date: date, ticker: str, strategy: str, action: str, price: float, shares: float, note: str):
+        columns = self.columns
+        columns['report_date'].append(report_date)
+        columns['ticker'].append(ticker)
+        columns['strategy'].append(strategy)
+        columns['action'].append(action)
+        columns['price'].append(price)
+        columns['shares'].append(shares)
+        columns['note'].append(note)
+
+    def column(self, name: str) -> list:
+        return self.columns[name]
+
+    def rows(self, names: tuple[str, ...] = LEDGER_COLUMNS):
+        """
+        Iterates over the trades as plain tuples of the given columns.
+        """
+        return zip(*(self.columns[name] for name in names))
+
+    def toTradeLogs(self) -> list[TradeLog]:
+        return [TradeLog(**dict(zip(LEDGER_COLUMNS, row))) for row in self.rows()]
+
+    def __len__(self) -> int:
+        return len(self.columns['action'])
+
+    def __iter__(self):
+        for row in self.rows():
+            yield TradeRecord(*row)
+
+    def __getitem__(self, index: int) -> TradeRecord:
+        return TradeRecord(*(self.columns[name][index] for name in LEDGER_COLUMNS))
+
+    def __repr__(self):
+        return f"<TradeLedger(trades={len(self)})>"
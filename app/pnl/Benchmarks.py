@@ -0,0 +1,98 @@
+"""
+Closed-form benchmark PnL.
+
+Buy-and-hold and sell-and-hold only trade at the first and last bar of a feed, so their PnL follows
+from those two closes. It is computed here for every ticker at once with the same floating point
+expressions as calculate_pnl on the trade log of the equivalent strategy run, without running the
+strategy or building a trade log.
+"""
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+
+from collections.abc import Iterable
+
+import numpy as np
+
+# Data feed columns read by the benchmarks
+BENCHMARK_FIELDS = ('report_date', 'close')
+
+
+def first_last_close(feeds: Iterable[ColumnarDataFeed]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    First and last close of each feed, NaN for empty feeds.
+    """
+    closes = [feed['close'] for feed in feeds]
+    first = np.array([close[0] if len(close) else np.nan for close in closes], dtype=np.float64)
+    last = np.array([close[-1] if len(close) else np.nan for close in closes], dtype=np.float64)
+    return first, last
+
+
+def _hold_pnl(first, last, shares, initial_capital: float):
+    # Buy (or sell short) at the first close and close the position at the last one, as calculate_pnl does
+    return ((initial_capital - first * shares) + shares * last) - initial_capital
+
+
+def buy_and_hold_pnl(first, last, initial_capital: float):
+    """
+    PnL of BAHStrategy, for scalars or arrays of first and last closes.
+    """
+    return _hold_pnl(first, last, initial_capital / first, initial_capital)
+
+
+def sell_and_hold_pnl(first, last, initial_capital: float):
+    """
+    PnL of shorting the whole capital at the first close and covering at the last one.
+    """
+    return _hold_pnl(first, last, -initial_capital / first, initial_capital)
+
+
+def equal_weight_pnl(first: np.ndarray, last: np.ndarray, initial_capital: float) -> float:
+    """
+    PnL of splitting initial_capital equally across the tickers with data and holding each one over its feed.
+    """
+    present = ~np.isnan(first)
+    count = np.count_nonzero(present)
+    if not count:
+        return 0.0
+    return float(buy_and_hold_pnl(first[present], last[present], initial_capital / count).sum())
+
+
+class BenchmarkPnL:
+    """
+    Benchmark PnL of each ticker (NaN for tickers without data) and of an equal-weight basket of them.
+    """
+    tickers: list[str]
+    buy_and_hold: np.ndarray
+    sell_and_hold: np.ndarray
+    equal_weight: float
+    initial_capital: float
+
+    def __init__(self, tickers: list[str], buy_and_hold: np.ndarray, sell_and_hold: np.ndarray, equal_weight: float, initial_capital: float):
+        self.tickers = tickers
+        self.buy_and_hold = buy_and_hold
+        self.sell_and_hold = sell_and_hold
+        self.equal_weight = equal_weight
+        self.initial_capital = initial_capital
+
+    def toRows(self) -> list[dict]:
+        return [
+            {'ticker': ticker, 'buy_and_hold': buy, 'sell_and_hold': sell}
+            for ticker, buy, sell in zip(self.tickers, self.buy_and_hold.tolist(), self.sell_and_hold.tolist())
+        ]
+
+    def __repr__(self):
+        return f"<BenchmarkPnL(tickers={len(self.tickers)}, equal_weight={self.equal_weight})>"
+
+
+def compute_benchmarks(feeds: Iterable[ColumnarDataFeed], initial_capital: float = 10000) -> BenchmarkPnL:
+    """
+    :param initial_capital: float - Capital of each ticker, the equal-weight basket gets as much per ticker with data.
+    """
+    feeds = list(feeds)
+    first, last = first_last_close(feeds)
+    return BenchmarkPnL(
+        tickers=[feed.ticker for feed in feeds],
+        buy_and_hold=buy_and_hold_pnl(first, last, initial_capital),
+        sell_and_hold=sell_and_hold_pnl(first, last, initial_capital),
+        equal_weight=equal_weight_pnl(first, last, initial_capital * np.count_nonzero(~np.isnan(first))),
+        initial_capital=initial_capital
+    )
@@ -0,0 +1,136 @@
+"""
+Vectorized mark-to-market PnL engine.
+
+Turns a trade log and the feed it was run on into a per-day equity curve (cash plus the value of
+open long and short positions at the close), then derives risk metrics from one or many curves at once.
+"""
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+from app.models.TradeLog import TradeLog
+from app.models.TradeLedger import TradeLedger
+
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class EquityCurve:
+    report_date: np.ndarray
+    close: np.ndarray
+    cash: np.ndarray # Cash at the close of each day
+    position: np.ndarray # Shares held at the close of each day, negative when short
+    traded_value: np.ndarray # Absolute value traded on each day
+    equity: np.ndarray # cash + position * close
+    initial_capital: float
+
+    def __init__(self, report_date, close, cash, position, traded_value, initial_capital):
+        self.report_date = report_date
+        self.close = close
+        self.cash = cash
+        self.position = position
+        self.traded_value = traded_value
+        self.equity = cash + position * close
+        self.initial_capital = initial_capital
+
+    @property
+    def exposure_value(self) -> np.ndarray:
+        return np.abs(self.position * self.close)
+
+    def __len__(self) -> int:
+        return len(self.equity)
+
+    def __repr__(self):
+        return f"<EquityCurve(days={len(self)}, final_equity={self.equity[-1] if len(self) else self.initial_capital})>"
+
+
+class RiskMetrics:
+    """
+    Metrics of one equity curve (scalars) or of a stack of curves (arrays over the leading axes).
+    """
+    def __init__(self, pnl, total_return, max_drawdown, sharpe, turnover, exposure):
+        self.pnl = pnl
+        self.total_return = total_return
+        self.max_drawdown = max_drawdown # Deepest peak-to-trough fall, as a negative fraction
+        self.sharpe = sharpe # Annualized Sharpe ratio of daily returns, with a zero risk-free rate
+        self.turnover = turnover # Total traded value over average equity
+        self.exposure = exposure # Average fraction of equity held in open positions
+
+    def toDict(self) -> dict:
+        return dict(vars(self))
+
+    def __repr__(self):
+        return "<RiskMetrics(" + ", ".join(f"{name}={value}" for name, value in vars(self).items()) + ")>"
+
+
+def build_equity_curve(initial_capital: float, trade_logs: list[TradeLog] | TradeLedger, feed: ColumnarDataFeed) -> EquityCurve:
+    """
+    Builds the daily equity curve of a trade log run on feed. Trades of other tickers are ignored.
+    """
+    dates = np.asarray(feed['report_date'])
+    close = np.asarray(feed['close'], dtype=np.float64)
+
+    names = ('ticker', 'report_date', 'price', 'shares', 'action')
+    if isinstance(trade_logs, TradeLedger):
+        rows = trade_logs.rows(names)
+    else:
+        rows = (tuple(getattr(trade, name) for name in names) for trade in trade_logs)
+    trades = [row[1:] for row in rows if row[0] == feed.ticker]
+    trade_dates = np.array([trade[0] for trade in trades], dtype='datetime64[D]')
+    prices = np.array([trade[1] for trade in trades], dtype=np.float64)
+    shares = np.array([trade[2] for trade in trades], dtype=np.float64)
+    side = np.array([1.0 if trade[3] == 'BUY' else -1.0 for trade in trades])
+
+    days = np.searchsorted(dates, trade_dates)
+    if np.any(days >= len(dates)) or np.any(dates[np.minimum(days, len(dates) - 1)] != trade_dates):
+        raise ValueError(f"Trade log of {feed.ticker} has trades on dates missing from its data feed")
+
+    value = prices * shares
+    cash = initial_capital - np.cumsum(np.bincount(days, weights=side * value, minlength=len(dates)))
+    position = np.cumsum(np.bincount(days, weights=side * shares, minlength=len(dates)))
+    traded_value = np.bincount(days, weights=np.abs(value), minlength=len(dates))
+    return EquityCurve(dates, close, cash, position, traded_value, initial_capital)
+
+
+def compute_risk_metrics(
+    equity: np.ndarray,
+    initial_capital: float,
+    traded_value: np.ndarray = None,
+    exposure_value: np.ndarray = None,
+    periods_per_year: int = TRADING_DAYS_PER_YEAR
+) -> RiskMetrics:
+    """
+    Computes the risk metrics of equity curves along the last axis, so a (backtests, days) matrix is
+    ranked in one call without Python-level loops.
+
+    :param traded_value: np.ndarray - Absolute value traded per day, same shape as equity. Turnover is NaN without it.
+    :param exposure_value: np.ndarray - Absolute value of open positions per day, same shape as equity. Exposure is NaN without it.
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    if equity.shape[-1] == 0:
+        # Curves without days have no final equity to measure
+        undefined = np.full(equity.shape[:-1], np.nan)[()]
+        return RiskMetrics(undefined, undefined, undefined, undefined, undefined, undefined)
+
+    pnl = equity[..., -1] - initial_capital
+    total_return = pnl / initial_capital
+
+    # Equity can reach 0 (e.g. a short squeezed to the full margin), giving infinite or NaN returns
+    with np.errstate(divide='ignore', invalid='ignore'):
+        running_peak = np.maximum.accumulate(equity, axis=-1)
+        max_drawdown = np.min(equity / running_peak - 1, axis=-1)
+
+        if equity.shape[-1] > 1:
+            returns = np.diff(equity, axis=-1) / equity[..., :-1]
+            volatility = np.std(returns, axis=-1)
+            sharpe = np.where(volatility > 0, np.mean(returns, axis=-1) / volatility * np.sqrt(periods_per_year), np.nan)
+        else:
+            sharpe = np.full_like(pnl, np.nan)
+
+        average_equity = np.mean(equity, axis=-1)
+        turnover = np.sum(traded_value, axis=-1) / average_equity if traded_value is not None else np.full_like(pnl, np.nan)
+        exposure = np.mean(exposure_value / equity, axis=-1) if exposure_value is not None else np.full_like(pnl, np.nan)
+
+    return RiskMetrics(pnl, total_return, max_drawdown, sharpe, turnover, exposure)
+
+
+def equity_curve_metrics(curve: EquityCurve, periods_per_year: int = TRADING_DAYS_PER_YEAR) -> RiskMetrics:
+    return compute_risk_metrics(curve.equity, curve.initial_capital, curve.traded_value, curve.exposure_value, periods_per_year)
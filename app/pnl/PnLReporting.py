@@ -1,30 +1,49 @@
 from app.models.TradeLog import TradeLog
+from app.models.TradeLedger import TradeLedger
+
+import logging
+
+logger = logging.getLogger(__name__)
 
 # TODO: use shares instead of sharess
-def calculate_pnl(initial_capital: float, trade_logs: list[TradeLog]) -> float:
+def calculate_pnl(initial_capital: float, trade_logs: list[TradeLog] | TradeLedger) -> float:
     current_capital = initial_capital
     holdings = {}  # Dictionary to track holdings per ticker
+    unheld_sells = {} # Number of sells skipped per ticker without holdings
+    unexpected_actions = {} # Number of trades per unknown action
+
+    # A ledger is read column-wise, without building a record per trade
+    if isinstance(trade_logs, TradeLedger):
+        trades = trade_logs.rows(('action', 'ticker', 'price', 'shares'))
+    else:
+        trades = ((trade.action, trade.ticker, trade.price, trade.shares) for trade in trade_logs)
 
-    for trade in trade_logs:
-        if trade.action == 'BUY':
-            current_capital -= trade.price * trade.shares
+    for action, ticker, price, shares in trades:
+        if action == 'BUY':
+            current_capital -= price * shares
 
-            if trade.ticker in holdings:
-                holdings[trade.ticker] += trade.shares
+            if ticker in holdings:
+                holdings[ticker] += shares
             else:
-                holdings[trade.ticker] = trade.shares
+                holdings[ticker] = shares
 
-        elif trade.action == 'SELL':
-            if trade.ticker in holdings:
-                sell_amount = trade.shares * trade.price
-                holdings[trade.ticker] -= trade.shares
+        elif action == 'SELL':
+            if ticker in holdings:
+                sell_amount = shares * price
+                holdings[ticker] -= shares
                 current_capital += sell_amount
             else:
-                print(f"No sufficient holdings found for {trade.ticker} to sell")
+                unheld_sells[ticker] = unheld_sells.get(ticker, 0) + 1
 
         else:
-            print(f"Unexpected action type: {trade.action}")
-    
+            unexpected_actions[action] = unexpected_actions.get(action, 0) + 1
+
+    # Skipped trades are reported once, after the loop
+    for ticker, count in unheld_sells.items():
+        logger.warning("No sufficient holdings found for %s to sell (%d trades skipped)", ticker, count)
+    for action, count in unexpected_actions.items():
+        logger.warning("Unexpected action type: %s (%d trades skipped)", action, count)
+
     pnl = current_capital - initial_capital
     return pnl
        
\ No newline at end of file
@@ -1,4 +1,4 @@
-from app.models.TradeLog import TradeLog
+from app.models.TradeLedger import TradeLedger
 from app.strategies.BaseStrategy import BaseStrategy, BaseStrategyParam
 from app.datafeed.DataFeeder import DataFeeder
 
@@ -11,13 +11,14 @@ class BAHParam(BaseStrategyParam):
 
 class BAHStrategy(BaseStrategy):
     strategy_name: str = "BuyAndHoldStrategy"
-    trades: list[TradeLog] = []
+    required_fields: tuple[str, ...] = ('report_date', 'close')
+    trades: TradeLedger
 
     def __init__(self, datafeeder: DataFeeder, param: BAHParam):
         super().__init__(datafeeder, param)
 
     def run(self, ticker: str, model: str, feature_set: str):
-        datafeed = self.datafeeder.pullData(ticker=ticker, classifier_model=model, feature_set=feature_set)
+        datafeed = self.datafeeder.pullData(ticker=ticker, classifier_model=model, feature_set=feature_set, fields=self.required_fields)
         shares = 0
 
         for idx, daily_data in enumerate([datafeed[0], datafeed[-1]]):
@@ -28,7 +29,7 @@ class BAHStrategy(BaseStrategy):
             if idx == 1:
                 self._handle_sell(ticker, daily_data.report_date, daily_data.close, self.shares, "End of trading period")
 
-    def dump_trade_logs(self) -> list[TradeLog]:
+    def dump_trade_logs(self) -> TradeLedger:
         return self.trades
 
     
\ No newline at end of file
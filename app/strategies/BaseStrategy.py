@@ -1,5 +1,6 @@
 from app.datafeed.DataFeeder import DataFeeder
-from app.models.TradeLog import TradeLog
+from app.models.TradeLedger import TradeLedger
+from app.models.ColumnarDataFeed import DEFAULT_FIELDS
 
 from datetime import date
 
@@ -11,44 +12,42 @@ class BaseStrategyParam:
 
 class BaseStrategy:
     strategy_name: str
-    trades: list[TradeLog] = []
+    required_fields: tuple[str, ...] = DEFAULT_FIELDS # Data feed columns read by run, only these are pulled
+    trades: TradeLedger
 
     def _handle_buy(self, ticker: str, date: date, price: float, shares: float, reason: str=""):
         self.trades.append(
-            TradeLog(
-                report_date=date,
-                ticker=ticker,
-                strategy=self.strategy_name,
-                action='BUY',
-                price=price,
-                shares=shares,
-                note=reason
-            )
+            report_date=date,
+            ticker=ticker,
+            strategy=self.strategy_name,
+            action='BUY',
+            price=price,
+            shares=shares,
+            note=reason
         )
     
     def _handle_sell(self, ticker: str, date: date, price: float, shares: float, reason: str):
         self.trades.append(
-            TradeLog(
-                report_date=date,
-                ticker=ticker,
-                strategy=self.strategy_name,
-                action='SELL',
-                price=price,
-                shares=shares,
-                note=reason
-            )
+            report_date=date,
+            ticker=ticker,
+            strategy=self.strategy_name,
+            action='SELL',
+            price=price,
+            shares=shares,
+            note=reason
         )
     
     def __init__(self, datafeeder: DataFeeder, param: BaseStrategyParam):
         self.datafeeder = datafeeder
         self.param = param
+        self.trades = TradeLedger() # Per instance, so strategies never share a trade log
 
     def run(self):
         pass
 
     def reset(self):
-        self.trades = []
+        self.trades = TradeLedger()
         self.__init__(self.datafeeder, self.param)
 
-    def dump_trade_logs(self)->list[TradeLog]:
+    def dump_trade_logs(self)->TradeLedger:
         pass
\ No newline at end of file
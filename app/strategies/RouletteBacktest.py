@@ -0,0 +1,250 @@
+"""
+Batched backtest engine for RouletteStrategy.
+
+The roulette only reads two per-bar signals, shared by every cell: the strategy set on the current cell
+(from the roulette label) and the MeanReversion decision. They are computed once per feed, then many
+runs step through the bars together, one row per run:
+- Windows of one feed, each row with its own [start, end) bounds
+- Roulette sizes and initial capitals of a parameter sweep
+- Synthetic paths or several feeds, each row with its own signal arrays
+Each step applies a rule of the strategy to every row and cell at once, with (runs, cells) arrays.
+
+Cell capital follows the same floating point expressions as RouletteStrategy, and the capital of each
+run is updated trade by trade in the order calculate_pnl reads the strategy's trade log, so the final
+capital of a row is exactly the one of the strategy run on the same bars.
+"""
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+from app.models.TradeDecision import TradeDecision
+from app.strategies.RouletteStrategy import DecisionFactory, CellStrategy, CELL_STRATEGIES
+from app.strategies.Signals import precompute_signals
+from app.strategies.SignalBacktest import LONG, SHORT
+
+import numpy as np
+
+
+class RouletteSignals:
+    """
+    Per-bar inputs of the roulette engine, computed once per feed and shared by every run over it.
+    """
+    cell_strategy: np.ndarray # (bars,) CellStrategy set on the current cell at each bar
+    mean_reversion: np.ndarray # (bars,) TradeDecision of the RSI vote at each bar
+
+    def __init__(self, cell_strategy: np.ndarray, mean_reversion: np.ndarray):
+        self.cell_strategy = cell_strategy
+        self.mean_reversion = mean_reversion
+
+    def __len__(self) -> int:
+        return len(self.cell_strategy)
+
+    def __repr__(self):
+        return f"<RouletteSignals(bars={len(self)})>"
+
+
+def roulette_signals(feed: ColumnarDataFeed, decision_factory: DecisionFactory) -> RouletteSignals:
+    signals = precompute_signals(feed)
+    label_strategies = np.array(
+        [CELL_STRATEGIES.get(decision_factory.getDecision(label), CellStrategy.none) for label in range(3)],
+        dtype=np.int8
+    )
+    return RouletteSignals(label_strategies[signals.roulette_label], signals.mean_reversion)
+
+
+class RoulettePositions:
+    """
+    Positions held overnight by the cells, one entry per (run, cell) opening. Cells opened and closed
+    on the same bar are left out.
+    """
+    run: np.ndarray # Row of the run holding each position
+    cell: np.ndarray
+    entry: np.ndarray # Bar of the opening trade
+    exit: np.ndarray # Bar of the closing trade
+    direction: np.ndarray # LONG or SHORT
+    capital: np.ndarray # Cell capital committed at the entry
+    equity: np.ndarray # Capital of the run, cells and positions at the close, on the entry bar
+    free: np.ndarray # Capital of the run not held in positions before the entry bar's openings
+
+    def __init__(self, run, cell, entry, exit, direction, capital, equity, free):
+        self.run = run
+        self.cell = cell
+        self.entry = entry
+        self.exit = exit
+        self.direction = direction
+        self.capital = capital
+        self.equity = equity
+        self.free = free
+
+    def __len__(self) -> int:
+        return len(self.entry)
+
+    def __repr__(self):
+        return f"<RoulettePositions(positions={len(self)})>"
+
+
+class RouletteBacktestResult:
+    final_capital: np.ndarray # (runs,) capital after every trade, as calculate_pnl computes it
+    trade_count: np.ndarray # (runs,) number of trades in each run's trade log
+    positions: RoulettePositions # None unless recorded
+
+    def __init__(self, final_capital: np.ndarray, trade_count: np.ndarray, positions: RoulettePositions = None):
+        self.final_capital = final_capital
+        self.trade_count = trade_count
+        self.positions = positions
+
+    def __len__(self) -> int:
+        return len(self.final_capital)
+
+    def __repr__(self):
+        return f"<RouletteBacktestResult(runs={len(self)})>"
+
+
+def run_roulette_backtest(
+    close: np.ndarray,
+    cell_strategy: np.ndarray,
+    mean_reversion: np.ndarray,
+    roulette_size,
+    initial_capital,
+    starts=None,
+    ends=None,
+    record_positions: bool = False
+) -> RouletteBacktestResult:
+    """
+    Backtests RouletteStrategy runs, one per row.
+
+    :param close: np.ndarray - (bars,) closes shared by every run, or (runs, bars) closes of each run.
+        cell_strategy and mean_reversion have the same shape, see RouletteSignals.
+    :param roulette_size: int | np.ndarray - Number of cells, for every run or per run.
+    :param initial_capital: float | np.ndarray - For every run or per run.
+    :param starts: np.ndarray - First bar of each run, 0 by default.
+    :param ends: np.ndarray - Bar after the last one of each run, the number of bars by default.
+    :param record_positions: bool - Also return the positions held by the cells.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    bars = close.shape[-1]
+    starts = 0 if starts is None else np.asarray(starts, dtype=np.int64)
+    ends = bars if ends is None else np.asarray(ends, dtype=np.int64)
+    shape = np.broadcast_shapes(close.shape[:-1], np.shape(roulette_size), np.shape(initial_capital), np.shape(starts), np.shape(ends)) or (1,)
+    sizes = np.broadcast_to(np.asarray(roulette_size, dtype=np.int64), shape)
+    capitals = np.broadcast_to(np.asarray(initial_capital, dtype=np.float64), shape)
+    starts = np.broadcast_to(starts, shape)
+    ends = np.broadcast_to(ends, shape)
+    runs = shape[0]
+    lengths = np.maximum(ends - starts, 0)
+
+    rows = np.arange(runs)
+    cells = np.arange(sizes.max() if runs else 0)
+    cash = capitals.copy() # Capital of each run as calculate_pnl updates it
+    trade_count = np.zeros(runs, dtype=np.int64)
+    capital = np.where(cells < sizes[:, None], capitals[:, None] / sizes[:, None], 0.0)
+    shares = np.zeros(capital.shape)
+    active = np.zeros(capital.shape, dtype=bool)
+    strategy = np.full(capital.shape, CellStrategy.none, dtype=np.int8)
+
+    last_bar = np.clip(ends - 1, 0, max(bars - 1, 0))
+    if close.ndim == 1:
+        at = lambda values, bar: values[bar]
+    else:
+        at = lambda values, bar: values[rows, bar]
+
+    if record_positions:
+        entry_step = np.zeros(capital.shape, dtype=np.int64)
+        entry_capital = np.zeros(capital.shape)
+        entry_equity = np.zeros(capital.shape)
+        entry_free = np.zeros(capital.shape)
+        entered = [] # Cells opened on the current bar
+        recorded = []
+
+    # Cells are traded through (run, cell) index pairs in row-major order, so the trades of a run are in
+    # cell order. add.at applies them one at a time in that order, like calculate_pnl on the trade log
+    def open_cells(run: np.ndarray, cell: np.ndarray, price: np.ndarray, step: int):
+        cell_price = price[run]
+        opened = np.where(strategy[run, cell] == CellStrategy.sell_and_hold, -1, 1) * capital[run, cell] / cell_price
+        spent = cell_price * opened
+        if record_positions:
+            entry_step[run, cell] = step
+            entry_capital[run, cell] = capital[run, cell]
+            entered.append((run, cell))
+        shares[run, cell] = opened
+        capital[run, cell] -= spent
+        active[run, cell] = True
+        np.add.at(cash, run, -spent)
+        np.add.at(trade_count, run, 1)
+
+    def close_cells(run: np.ndarray, cell: np.ndarray, price: np.ndarray, step):
+        cell_price = price[run]
+        received = cell_price * shares[run, cell]
+        if record_positions:
+            exit_step = np.broadcast_to(step, run.shape) if np.ndim(step) == 0 else step[run]
+            held = entry_step[run, cell] < exit_step
+            held_run, held_cell = run[held], cell[held]
+            recorded.append((
+                held_run, held_cell, starts[held_run] + entry_step[held_run, held_cell], starts[held_run] + exit_step[held],
+                np.where(shares[held_run, held_cell] < 0, SHORT, LONG), entry_capital[held_run, held_cell],
+                entry_equity[held_run, held_cell], entry_free[held_run, held_cell]
+            ))
+        capital[run, cell] += received
+        shares[run, cell] = 0
+        active[run, cell] = False
+        np.add.at(cash, run, received)
+        np.add.at(trade_count, run, 1)
+
+    for step in range(lengths.max() if runs else 0):
+        live = step < lengths
+        bar = np.minimum(starts + step, last_bar)
+        price = at(close, bar)
+        decision = at(mean_reversion, bar)
+        buy_vote = decision == TradeDecision.buy
+
+        # Refresh: idle cells before the first active one reopen their hold strategy, or mean reversion on a buy vote
+        has_active = active.any(axis=1)
+        first_active = np.where(has_active, active.argmax(axis=1), sizes)
+        opening = (cells < np.where(live, first_active, 0)[:, None]) & (
+            (strategy == CellStrategy.buy_and_hold)
+            | (strategy == CellStrategy.sell_and_hold)
+            | ((strategy == CellStrategy.mean_reversion) & buy_vote[:, None])
+        )
+        if opening.any():
+            open_cells(*np.nonzero(opening), price, step)
+        # A mean reversion first active cell is closed on a sell vote
+        first_strategy = strategy[rows, np.minimum(first_active, len(cells) - 1)]
+        closing = np.flatnonzero(live & has_active & (decision == TradeDecision.sell) & (first_strategy == CellStrategy.mean_reversion))
+        if len(closing):
+            close_cells(closing, first_active[closing], price, step)
+
+        # The current cell is cleaned up and set to the strategy of the bar's label
+        current = step % sizes
+        cleaning = np.flatnonzero(live & active[rows, current])
+        if len(cleaning):
+            close_cells(cleaning, current[cleaning], price, step)
+        new_strategy = at(cell_strategy, bar)
+        strategy[rows[live], current[live]] = new_strategy[live]
+        setting = np.flatnonzero(live & (
+            (new_strategy == CellStrategy.buy_and_hold)
+            | (new_strategy == CellStrategy.sell_and_hold)
+            | ((new_strategy == CellStrategy.mean_reversion) & buy_vote)
+        ))
+        if len(setting):
+            open_cells(setting, current[setting], price, step)
+
+        if record_positions and entered:
+            # Capital of the run at the entry of the positions opened on this bar and still held
+            run, cell = (np.concatenate(pairs) for pairs in zip(*entered))
+            entered.clear()
+            held = active[run, cell]
+            run, cell = run[held], cell[held]
+            opened_now = active[run] & (entry_step[run] == step)
+            entry_equity[run, cell] = capital[run].sum(axis=1) + (shares[run] * price[run, None]).sum(axis=1)
+            entry_free[run, cell] = (capital[run] * ~active[run]).sum(axis=1) + (entry_capital[run] * opened_now).sum(axis=1)
+
+    # Cells still active are closed at the last bar of their run
+    if active.any():
+        close_cells(*np.nonzero(active), at(close, last_bar), lengths - 1)
+
+    positions = None
+    if record_positions:
+        if recorded:
+            fields = [np.concatenate(field) for field in zip(*recorded)]
+        else:
+            fields = [np.array([], dtype=np.int64)] * 5 + [np.array([], dtype=np.float64)] * 3
+        order = np.lexsort((fields[1], fields[2], fields[0]))
+        positions = RoulettePositions(*(field[order] for field in fields))
+    return RouletteBacktestResult(cash, trade_count, positions)
@@ -1,12 +1,13 @@
 from app.strategies.BaseStrategy import BaseStrategy, BaseStrategyParam
+from app.strategies.Signals import precompute_signals, SIGNAL_FIELDS
 from app.datafeed.DataFeeder import DataFeeder
 
 from app.models.TradeBotDataFeed import TradeBotDataFeed
 from app.models.MarketCondition import MarketCondition
 from app.models.TradeDecision import TradeDecision
-from app.models.TradeLog import TradeLog
+from app.models.TradeLedger import TradeLedger
 
-from collections.abc import Callable
+from datetime import date
 import numpy as np
 
 class DecisionFactory:
@@ -49,30 +50,57 @@ class DecisionFactory:
             case _: return DecisionFactory.BuyAndHold
 
 
-class RouletteCell:
-    id: int # Cell ID
-    capital: float # Percentage of capital to allocate to each cell
-    active: bool # Whether the cell has been active
-    shares: float # Number of shares allocated to the cell
-    decision_function: Callable # Function to determine whether to buy or sell
-
-    def __init__(self, id: int, allocation: float):
-        self.id = id
-        self.capital = allocation
-        self.active = False # Whether the cell has been active
-        self.shares = 0 # Number of shares allocated to the cell 
-        self.decision_function = None # Function to determine whether to buy or sell 
-    def __repr__(self):
-        return f"<RouletteCell(id={self.id}, capital={self.capital}, active={self.active}, shares={self.shares}, decision_function={self.decision_function})>"
+class CellStrategy:
+    none = -1
+    buy_and_hold = 0
+    mean_reversion = 1
+    sell_and_hold = 2
+
+# Strategy of a cell for each decision function of the factory, unknown functions leave the cell idle
+CELL_STRATEGIES = {
+    DecisionFactory.BuyAndHold: CellStrategy.buy_and_hold,
+    DecisionFactory.MeanReversion: CellStrategy.mean_reversion,
+    DecisionFactory.SellAndHold: CellStrategy.sell_and_hold,
+}
+
+# Trade notes of the cells opened by a refresh and by setting a new strategy
+REFRESH_NOTES = {
+    CellStrategy.buy_and_hold: "BAH Refresh",
+    CellStrategy.mean_reversion: "MR Refresh Buy",
+    CellStrategy.sell_and_hold: "SAH Refresh",
+}
+SET_STRATEGY_NOTES = {
+    CellStrategy.buy_and_hold: "BAH Set Strategy",
+    CellStrategy.mean_reversion: "MR Set Strategy",
+    CellStrategy.sell_and_hold: "SAH Set Strategy",
+}
 
 class Roulette:
-    cells: list[RouletteCell] # List of RouletteCell objects
+    """
+    Struct-of-arrays roulette: the state of cell i is held at index i of each array.
+    """
+    capital: np.ndarray # Capital left in each cell
+    shares: np.ndarray # Number of shares held by each cell, negative when short
+    active: np.ndarray # Whether each cell holds a position
+    strategy: np.ndarray # CellStrategy of each cell
     decision_factory: DecisionFactory
 
     def __init__(self, initial_capital: float, num_cells: int, decision_factory: DecisionFactory): # Initialize with the number of cells
-        self.cells = [RouletteCell(id=idx, allocation=initial_capital/num_cells) for idx in range(num_cells)] # Create a list of RouletteCell objects with the specified number of cells
+        self.capital = np.full(num_cells, initial_capital/num_cells, dtype=np.float64)
+        self.shares = np.zeros(num_cells, dtype=np.float64)
+        self.active = np.zeros(num_cells, dtype=bool)
+        self.strategy = np.full(num_cells, CellStrategy.none, dtype=np.int8)
         self.decision_factory = decision_factory
 
+    def strategyFor(self, predicted_condition: int) -> int:
+        return CELL_STRATEGIES.get(self.decision_factory.getDecision(predicted_condition), CellStrategy.none)
+
+    def __len__(self) -> int:
+        return len(self.capital)
+
+    def __repr__(self):
+        return f"<Roulette(cells={len(self)}, active={int(np.count_nonzero(self.active))}, capital={self.capital.sum()})>"
+
 class RouletteStrategyParam(BaseStrategyParam):
     roulette_size: int
     decision_factory: DecisionFactory
@@ -83,114 +111,108 @@ class RouletteStrategyParam(BaseStrategyParam):
 
 class RouletteStrategy(BaseStrategy):
     strategy_name: str = "RouletteStrategy"
-    trades: list[TradeLog] = []
+    required_fields: tuple[str, ...] = ('report_date', 'close') + SIGNAL_FIELDS
+    trades: TradeLedger
 
     def __init__(self, datafeeder: DataFeeder, param: RouletteStrategyParam):
         super().__init__(datafeeder, param)
         self.roulette = Roulette(param.initial_capital, param.roulette_size, param.decision_factory)
         pass
-    
-    def _refreshRoulette(self, data: TradeBotDataFeed):
-        for cell in self.roulette.cells:
-            match cell.decision_function:
-                case DecisionFactory.BuyAndHold:
-                    if cell.active:
-                        return
-                    cell.active = True
-                    cell.shares = cell.capital / data.close
-                    self._handle_buy(data.ticker, data.report_date, data.close, cell.shares, f"Cell {cell.id} | BAH Refresh")
-
-                    cell.capital -= data.close * cell.shares
-                    pass
-                case DecisionFactory.SellAndHold:
-                    """
-                        at 34, shares = 294.11, capital = 0
-                        at 24, shares = 0, capital = 7058.82352942
-
-                        at 34, shares = -294.11, capital = 20000
-                        at 24, shares = 0, capital = 12941.36
-                    """
-                    if cell.active:
-                        return
-                    cell.active = True
-                    cell.shares = -1 * cell.capital / data.close
-                    self._handle_buy(data.ticker, data.report_date, data.close, cell.shares, f"Cell {cell.id} | SAH Refresh")
-
-                    cell.capital -= data.close * cell.shares
-                    pass
-                case DecisionFactory.MeanReversion:
-                    decision = cell.decision_function(data)
-                    if cell.active:
-                        if decision == TradeDecision.sell:
-                            cell.active = False
-                            self._handle_sell(data.ticker, data.report_date, data.close, cell.shares, f"Cell {cell.id} | MR Refresh Sell")
-
-                            cell.capital += data.close * cell.shares
-                            cell.shares = 0
-                        return
-                    if decision == TradeDecision.buy:
-                        cell.active = True
-                        cell.shares = cell.capital / data.close
-                        self._handle_buy(data.ticker, data.report_date, data.close, cell.shares, f"Cell {cell.id} | MR Refresh Buy")
-
-                        cell.capital -= data.close * cell.shares               
-                case _:
-                    pass
-    
-    def _cleanUpCell(self, data: TradeBotDataFeed, cell: RouletteCell):
-        if cell.active:
-            self._handle_sell(data.ticker, data.report_date, data.close, cell.shares, f"Cell {cell.id} | Lockup expired / End of Strategy")
-            cell.active = False
-            cell.capital += data.close * cell.shares
-            cell.shares = 0
-        return cell
-
-    def _setStrategy(self, data: TradeBotDataFeed, cell: RouletteCell):
-        predicted_label = np.argmax([data.uptrend_prob, max(data.side_prob, 0.5), data.downtrend_prob])
-        cell.decision_function = self.param.decision_factory.getDecision(predicted_label)
-        match cell.decision_function:
-            case DecisionFactory.BuyAndHold:
-                cell.active = True
-                cell.shares = cell.capital / data.close
-                self._handle_buy(data.ticker, data.report_date, data.close, cell.shares, f"Cell {cell.id} | BAH Set Strategy")
-
-                cell.capital -= data.close * cell.shares
-                pass
-            case DecisionFactory.SellAndHold:
-                cell.active = True
-                cell.shares = -1 * cell.capital / data.close
-                self._handle_buy(data.ticker, data.report_date, data.close, cell.shares, f"Cell {cell.id} | SAH Set Strategy")
 
-                cell.capital -= data.close * cell.shares
-                pass
-            case DecisionFactory.MeanReversion:
-                decision = cell.decision_function(data)
+    def _openCell(self, ticker: str, date: date, price: float, cell: int, notes: dict[int, str]):
+        roulette = self.roulette
+        strategy = roulette.strategy[cell].item()
+        shares = (-1 if strategy == CellStrategy.sell_and_hold else 1) * roulette.capital[cell].item() / price
+        roulette.active[cell] = True
+        roulette.shares[cell] = shares
+        roulette.capital[cell] -= price * shares
+        self._handle_buy(ticker, date, price, shares, f"Cell {cell} | {notes[strategy]}")
+
+    def _closeCell(self, ticker: str, date: date, price: float, cell: int, note: str):
+        roulette = self.roulette
+        shares = roulette.shares[cell].item()
+        self._handle_sell(ticker, date, price, shares, f"Cell {cell} | {note}")
+        roulette.active[cell] = False
+        roulette.capital[cell] += price * shares
+        roulette.shares[cell] = 0
+
+    def _openCells(self, ticker: str, date: date, price: float, cells: np.ndarray, notes: dict[int, str]):
+        roulette = self.roulette
+        strategy = roulette.strategy[cells]
+        shares = np.where(strategy == CellStrategy.sell_and_hold, -1, 1) * roulette.capital[cells] / price
+        roulette.active[cells] = True
+        roulette.shares[cells] = shares
+        roulette.capital[cells] -= price * shares
+
+        for cell, cell_strategy, cell_shares in zip(cells.tolist(), strategy.tolist(), shares.tolist()):
+            self._handle_buy(ticker, date, price, cell_shares, f"Cell {cell} | {notes[cell_strategy]}")
+
+    def _closeCells(self, ticker: str, date: date, price: float, cells: np.ndarray, note: str):
+        roulette = self.roulette
+        shares = roulette.shares[cells]
+        for cell, cell_shares in zip(cells.tolist(), shares.tolist()):
+            self._handle_sell(ticker, date, price, cell_shares, f"Cell {cell} | {note}")
+
+        roulette.active[cells] = False
+        roulette.capital[cells] += price * shares
+        roulette.shares[cells] = 0
+
+    def _refreshRoulette(self, ticker: str, date: date, price: float, decision: int):
+        roulette = self.roulette
+
+        # Cells are refreshed in order until the first active one. Idle cells before it reopen their hold
+        # strategy, or their mean reversion strategy on a buy vote
+        first_active = roulette.active.argmax().item() if roulette.active.any() else len(roulette)
+        if first_active:
+            strategy = roulette.strategy[:first_active]
+            opening = (strategy == CellStrategy.buy_and_hold) | (strategy == CellStrategy.sell_and_hold)
+            if decision == TradeDecision.buy:
+                opening |= strategy == CellStrategy.mean_reversion
+            cells = np.flatnonzero(opening)
+            if len(cells):
+                self._openCells(ticker, date, price, cells, REFRESH_NOTES)
+
+        # The first active cell ends the refresh, a mean reversion one is closed on a sell vote first
+        if decision == TradeDecision.sell and first_active < len(roulette) and roulette.strategy[first_active] == CellStrategy.mean_reversion:
+            self._closeCell(ticker, date, price, first_active, "MR Refresh Sell")
+
+    def _cleanUpCell(self, ticker: str, date: date, price: float, cell: int):
+        if self.roulette.active[cell]:
+            self._closeCell(ticker, date, price, cell, "Lockup expired / End of Strategy")
+
+    def _setStrategy(self, ticker: str, date: date, price: float, cell: int, strategy: int, decision: int):
+        self.roulette.strategy[cell] = strategy
+        match strategy:
+            case CellStrategy.buy_and_hold | CellStrategy.sell_and_hold:
+                self._openCell(ticker, date, price, cell, SET_STRATEGY_NOTES)
+            case CellStrategy.mean_reversion:
                 if decision == TradeDecision.buy:
-                    cell.active = True
-                    cell.shares = cell.capital / data.close
-                    self._handle_buy(data.ticker, data.report_date, data.close, cell.shares, f"Cell {cell.id} | MR Set Strategy")
-
-                    cell.capital -= data.close * cell.shares
-                    pass                
+                    self._openCell(ticker, date, price, cell, SET_STRATEGY_NOTES)
             case _:
                 pass
-        return cell
-    
+
     def run(self, ticker: str, model: str, feature_set: str):
-        datafeed = self.datafeeder.pullData(ticker=ticker, classifier_model=model, feature_set=feature_set)
+        datafeed = self.datafeeder.pullData(ticker=ticker, classifier_model=model, feature_set=feature_set, fields=self.required_fields)
         current_index = 0
 
-        for daily_data in datafeed:
-            self._refreshRoulette(daily_data)
+        # Mean reversion decisions and roulette labels are shared by every cell, so compute them once per bar
+        signals = precompute_signals(datafeed)
+        mean_reversion = signals.mean_reversion.tolist()
+        label_strategies = np.array([self.roulette.strategyFor(label) for label in range(3)], dtype=np.int8)
+        cell_strategy = label_strategies[signals.roulette_label].tolist()
+        report_dates = datafeed['report_date'].tolist()
+        close = datafeed['close'].tolist()
 
-            current_cell = self.roulette.cells[current_index]
-            current_cell = self._cleanUpCell(daily_data, current_cell)
-            current_cell = self._setStrategy(daily_data, current_cell)
+        for bar in range(len(datafeed)):
+            self._refreshRoulette(ticker, report_dates[bar], close[bar], mean_reversion[bar])
+
+            self._cleanUpCell(ticker, report_dates[bar], close[bar], current_index)
+            self._setStrategy(ticker, report_dates[bar], close[bar], current_index, cell_strategy[bar], mean_reversion[bar])
 
             current_index = (current_index + 1) % self.param.roulette_size
-        
-        for cell in self.roulette.cells:
-            cell = self._cleanUpCell(daily_data, cell)
-    
-    def dump_trade_logs(self) -> list[TradeLog]:
+
+        if len(datafeed):
+            self._closeCells(ticker, report_dates[-1], close[-1], np.flatnonzero(self.roulette.active), "Lockup expired / End of Strategy")
+
+    def dump_trade_logs(self) -> TradeLedger:
         return self.trades
\ No newline at end of file
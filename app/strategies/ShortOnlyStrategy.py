@@ -1,7 +1,8 @@
 from app.models.MarketCondition import MarketCondition
-from app.models.TradeLog import TradeLog
+from app.models.TradeLedger import TradeLedger
 
 from app.strategies.BaseStrategy import BaseStrategy, BaseStrategyParam
+from app.strategies.SignalBacktest import SignalArrays, run_signal_backtest, exit_note, SHORT
 from app.datafeed.DataFeeder import DataFeeder
 
 from datetime import date
@@ -22,6 +23,7 @@ class ShortOnlyStrategyParam(BaseStrategyParam):
 
 class ShortOnlyStrategy(BaseStrategy):
     strategy_name: str = "ShortOnlyStrategy"
+    required_fields: tuple[str, ...] = ('report_date', 'predicted_label', 'close')
 
     buy_spot: float
     sell_spot: float
@@ -29,7 +31,7 @@ class ShortOnlyStrategy(BaseStrategy):
     bought: bool
     day_counter: int
     non_buy_counter: int
-    trades: list[TradeLog] = []
+    trades: TradeLedger
 
     def __init__(self, datafeeder: DataFeeder, param: ShortOnlyStrategyParam):
         super().__init__(datafeeder, param)
@@ -57,64 +59,29 @@ class ShortOnlyStrategy(BaseStrategy):
         super()._handle_sell(ticker, date, price, shares, reason)
 
     def run(self, ticker: str, model: str, feature_set: str):
-        datafeed = self.datafeeder.pullData(ticker=ticker, classifier_model=model, feature_set=feature_set)
-        current_capital = self.param.initial_capital
-
-        for daily_data in datafeed:
-            # Buy MarketCondition
-            if not self.bought and daily_data.predicted_label == MarketCondition.downtrend:
-                self.shares = -1 * current_capital / daily_data.close
-                self._handle_buy(
-                    ticker, 
-                    daily_data.report_date, 
-                    daily_data.close, 
-                    self.shares
-                )
-                
-                current_capital -= daily_data.close * self.shares
-                continue
-
-            # Update counters
-            if daily_data.predicted_label == MarketCondition.downtrend:
-                self.non_buy_counter = 0
-                self.day_counter += 1
-                if self.day_counter == self.param.holding_period:
-                    self.non_buy_counter = self.param.sell_counter_threshold - 1
-            else:
-                self.non_buy_counter += 1
-
-            # Check stop loss
-            if self.bought:
-                current_loss_percentage = -1 * (daily_data.close - self.buy_spot) / self.buy_spot
-                if current_loss_percentage <= self.param.stop_loss_percentage:
-                    self._handle_sell(
-                        ticker,
-                        daily_data.report_date, 
-                        daily_data.close,
-                        self.shares,
-                        f"Stop loss triggered at {current_loss_percentage:.2%}"
-                    )
-
-                    current_capital += daily_data.close * self.shares
-                    self.shares = 0
-                    continue
-
-            # Check sell counter threshold
-            if self.bought and self.non_buy_counter >= self.param.sell_counter_threshold:
-                self._handle_sell(
-                    ticker,
-                    daily_data.report_date,
-                    daily_data.close,
-                    self.shares,
-                    "Sell counter threshold reached"
-                )
-
-                current_capital += daily_data.close * self.shares
-                self.shares = 0
-                continue
-        
-        if self.bought:
-            self._handle_sell(ticker, daily_data.report_date, daily_data.close, self.shares, "End of trading period")
-
-    def dump_trade_logs(self) -> list[TradeLog]:
+        datafeed = self.datafeeder.pullData(ticker=ticker, classifier_model=model, feature_set=feature_set, fields=self.required_fields)
+        result = run_signal_backtest(
+            close=datafeed['close'],
+            signals=SignalArrays(datafeed['predicted_label'], MarketCondition.downtrend),
+            direction=SHORT,
+            sell_counter_threshold=self.param.sell_counter_threshold,
+            stop_loss_percentage=self.param.stop_loss_percentage,
+            holding_period=self.param.holding_period,
+            initial_capital=self.param.initial_capital
+        )
+
+        report_dates = datafeed['report_date'].tolist()
+        close = datafeed['close'].tolist()
+        for entry, exit, shares, reason, loss in zip(
+            result.entry_index.tolist(),
+            result.exit_index.tolist(),
+            result.shares.tolist(),
+            result.exit_reason.tolist(),
+            result.exit_loss.tolist()
+        ):
+            self.shares = shares
+            self._handle_buy(ticker, report_dates[entry], close[entry], self.shares)
+            self._handle_sell(ticker, report_dates[exit], close[exit], self.shares, exit_note(reason, loss))
+
+    def dump_trade_logs(self) -> TradeLedger:
         return self.trades
\ No newline at end of file
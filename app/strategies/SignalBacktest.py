@@ -0,0 +1,251 @@
+"""
+Signal-array backtest engine for the LongOnly/ShortOnly family of strategies.
+
+Instead of walking every bar with a state machine, the engine jumps from event to event:
+- The next entry is looked up in a precomputed "next target bar" array
+- The sell counter exit is looked up in a precomputed "next bar whose non-target run reaches the threshold" array
+- The holding period exit is found from the rank of the entry among the target bars
+- The stop loss exit is found by scanning the closes between entry and the counter exit, bar by bar
+  for short holdings and in vectorized chunks for long ones
+so idle bars cost nothing and the Python-level work is dominated by the number of trades.
+
+Every comparison and capital update uses the same floating point expressions as the per-bar strategies,
+so the trades are identical to theirs.
+"""
+import numpy as np
+
+LONG = 1
+SHORT = -1
+
+STOP_LOSS_SCAN_CHUNK = 256 # Initial number of bars scanned at once when looking for a stop loss
+
+
+class ExitReason:
+    stop_loss = 0
+    sell_counter = 1
+    end_of_period = 2
+
+
+def exit_note(reason: int, loss: float) -> str:
+    match reason:
+        case ExitReason.stop_loss: return f"Stop loss triggered at {loss:.2%}"
+        case ExitReason.sell_counter: return "Sell counter threshold reached"
+        case _: return "End of trading period"
+
+
+class SignalArrays:
+    """
+    Label-dependent lookup arrays, computed once per (labels, target_label) and shared by every
+    parameter combination and every window run over the same feed.
+    """
+    def __init__(self, labels: np.ndarray, target_label: int):
+        self.is_target = np.asarray(labels) == target_label
+        self.length = len(self.is_target)
+        positions = np.arange(self.length + 1)
+
+        # Index of the first target bar at or after each bar (length when there is none)
+        self.next_target = _next_index(self.is_target, positions)
+        # Index of every target bar and the rank of each target bar among them
+        self.target_positions = np.flatnonzero(self.is_target)
+        self.target_rank = np.cumsum(self.is_target) - 1
+        # Number of consecutive non-target bars ending at each bar
+        last_target = np.maximum.accumulate(np.where(self.is_target, positions[:-1], -1))
+        self.non_target_run = positions[:-1] - last_target
+        self.non_target_run[last_target < 0] = positions[:-1][last_target < 0] + 1
+
+        self._counter_exits: dict[int, list[int]] = {}
+        self._lookups = None
+
+    def nextCounterExit(self, sell_counter_threshold: int) -> list[int]:
+        """
+        Index of the first bar at or after each bar whose non-target run reaches the threshold.
+        """
+        exits = self._counter_exits.get(sell_counter_threshold)
+        if exits is None:
+            exits = _next_index(self.non_target_run >= sell_counter_threshold, np.arange(self.length + 1)).tolist()
+            self._counter_exits[sell_counter_threshold] = exits
+        return exits
+
+    def lookups(self) -> '_Lookups':
+        if self._lookups is None:
+            self._lookups = _Lookups(self)
+        return self._lookups
+
+
+class _Lookups:
+    """
+    Plain list copies of the lookup arrays: the kernel indexes them one element at a time,
+    which is much cheaper on lists than on NumPy arrays.
+    """
+    def __init__(self, signals: SignalArrays):
+        self.length = signals.length
+        self.is_target = signals.is_target.tolist()
+        self.next_target = signals.next_target.tolist()
+        self.target_positions = signals.target_positions.tolist()
+        self.target_rank = signals.target_rank.tolist()
+        self._close_source = None
+        self._close_list = None
+
+    def close(self, close: np.ndarray) -> list[float]:
+        if close is not self._close_source:
+            self._close_source = close
+            self._close_list = close.tolist()
+        return self._close_list
+
+
+class SignalBacktestResult:
+    entry_index: np.ndarray
+    exit_index: np.ndarray
+    shares: np.ndarray
+    exit_reason: np.ndarray # ExitReason of each trade
+    exit_loss: np.ndarray # Loss percentage at exit, as computed by the stop loss check
+    equity: np.ndarray # Mark-to-market capital at the close of each bar
+    final_capital: float
+
+    def __init__(self, entry_index, exit_index, shares, exit_reason, exit_loss, equity, final_capital):
+        self.entry_index = np.asarray(entry_index, dtype=np.int64)
+        self.exit_index = np.asarray(exit_index, dtype=np.int64)
+        self.shares = np.asarray(shares, dtype=np.float64)
+        self.exit_reason = np.asarray(exit_reason, dtype=np.int8)
+        self.exit_loss = np.asarray(exit_loss, dtype=np.float64)
+        self.equity = equity
+        self.final_capital = final_capital
+
+    def __len__(self) -> int:
+        return len(self.entry_index)
+
+    def __repr__(self):
+        return f"<SignalBacktestResult(trades={len(self)}, final_capital={self.final_capital})>"
+
+
+def run_signal_backtest(
+    close: np.ndarray,
+    signals: SignalArrays,
+    direction: int,
+    sell_counter_threshold: int,
+    stop_loss_percentage: float,
+    holding_period: int,
+    initial_capital: float,
+    start: int = 0,
+    end: int = None
+) -> SignalBacktestResult:
+    """
+    Backtests one parameter combination over bars [start, end) of a feed.
+
+    :param direction: int - LONG buys on the target label, SHORT sells short on it.
+    """
+    end = signals.length if end is None else end
+    lookups = signals.lookups()
+    next_target = lookups.next_target
+    counter_exits = signals.nextCounterExit(sell_counter_threshold)
+    close_list = lookups.close(close)
+
+    entries, exits, trade_shares, reasons, losses, cash = [], [], [], [], [], []
+    capital = initial_capital
+    entry = next_target[start] if start < end else end
+    while entry < end:
+        buy_spot = close_list[entry]
+        shares = direction * capital / buy_spot
+        capital -= buy_spot * shares
+        cash.append(capital)
+
+        counter_exit = _counter_exit(lookups, counter_exits, entry, holding_period)
+        scan_end = min(counter_exit, end - 1)
+        stop_exit = _stop_loss_exit(close, close_list, entry, scan_end, buy_spot, direction, stop_loss_percentage)
+
+        if stop_exit <= scan_end:
+            exit, reason = stop_exit, ExitReason.stop_loss
+        elif counter_exit < end:
+            exit, reason = counter_exit, ExitReason.sell_counter
+        else:
+            exit, reason = end - 1, ExitReason.end_of_period
+
+        sell_spot = close_list[exit]
+        capital += sell_spot * shares
+
+        entries.append(entry)
+        exits.append(exit)
+        trade_shares.append(shares)
+        reasons.append(reason)
+        losses.append(direction * (sell_spot - buy_spot) / buy_spot)
+
+        entry = next_target[exit + 1] if exit + 1 < end else end
+
+    equity = _equity_path(close, start, end, initial_capital, entries, exits, trade_shares, cash)
+    return SignalBacktestResult(entries, exits, trade_shares, reasons, losses, equity, capital)
+
+
+def _next_index(mask: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    # Reverse running minimum of the flagged positions, with a sentinel at the end
+    flagged = np.where(mask, positions[:-1], positions[-1])
+    return np.append(np.minimum.accumulate(flagged[::-1])[::-1], positions[-1])
+
+
+def _counter_exit(lookups: '_Lookups', counter_exits: list[int], entry: int, holding_period: int) -> int:
+    exit = counter_exits[entry + 1]
+    if holding_period < 1:
+        return exit
+
+    # Reaching the holding period primes the sell counter one step short of the threshold:
+    # that bar itself never exits, and the next bar exits unless it is a target bar
+    rank = lookups.target_rank[entry] + holding_period
+    if rank < len(lookups.target_positions):
+        holding_end = lookups.target_positions[rank]
+        if exit == holding_end:
+            exit = counter_exits[holding_end + 1]
+        if holding_end + 1 < lookups.length and not lookups.is_target[holding_end + 1]:
+            exit = min(exit, holding_end + 1)
+    return exit
+
+
+def _stop_loss_exit(close: np.ndarray, close_list: list[float], entry: int, scan_end: int, buy_spot: float, direction: int, stop_loss_percentage: float) -> int:
+    # Short holdings are scanned bar by bar, long ones in growing vectorized chunks
+    first = entry + 1
+    for bar in range(first, min(first + STOP_LOSS_SCAN_CHUNK, scan_end + 1)):
+        if direction * (close_list[bar] - buy_spot) / buy_spot <= stop_loss_percentage:
+            return bar
+    first += STOP_LOSS_SCAN_CHUNK
+    chunk = STOP_LOSS_SCAN_CHUNK
+    while first <= scan_end:
+        last = min(first + chunk, scan_end + 1)
+        loss = direction * (close[first:last] - buy_spot) / buy_spot
+        hits = np.flatnonzero(loss <= stop_loss_percentage)
+        if len(hits):
+            return first + int(hits[0])
+        first = last
+        chunk *= 2
+    return scan_end + 1
+
+
+def _equity_path(close: np.ndarray, start: int, end: int, initial_capital: float, entries: list[int], exits: list[int], shares: list[float], cash: list[float]) -> np.ndarray:
+    """
+    Mark-to-market capital at the close of each bar in [start, end): idle cash between trades, and cash
+    left after the entry plus the value of the position while holding. The exit bar is valued after the sale.
+    """
+    length = max(end - start, 0)
+    if not entries:
+        return np.full(length, initial_capital, dtype=np.float64)
+
+    entries = np.asarray(entries)
+    exits = np.asarray(exits)
+    cash = np.asarray(cash)
+    shares = np.asarray(shares)
+    # Cash after each exit, i.e. the idle capital until the next entry
+    idle = cash + close[exits] * shares
+
+    # Segments alternate idle / holding: [start, entry_0), [entry_0, exit_0), [exit_0, entry_1), ...
+    bounds = np.empty(2 * len(entries) + 2, dtype=np.int64)
+    bounds[0] = start
+    bounds[1:-1:2] = entries
+    bounds[2:-1:2] = exits
+    bounds[-1] = end
+    base = np.empty(len(bounds) - 1)
+    base[0] = initial_capital
+    base[1::2] = cash
+    base[2::2] = idle
+    held = np.zeros(len(bounds) - 1)
+    held[1::2] = shares
+
+    sizes = np.diff(bounds)
+    equity = np.repeat(base, sizes) + np.repeat(held, sizes) * close[start:end]
+    return equity
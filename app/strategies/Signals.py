@@ -0,0 +1,75 @@
+"""
+Per-bar signal precompute stage.
+
+Computes, for a whole feed in one vectorized pass, the signals that strategies would otherwise
+re-evaluate bar by bar (and cell by cell in RouletteStrategy):
+- The RSI vote matrix behind DecisionFactory.MeanReversion
+- The MeanReversion decision itself
+- The roulette label picked by RouletteStrategy._setStrategy
+"""
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+from app.models.TradeDecision import TradeDecision
+
+import numpy as np
+
+RSI_VOTER_COUNT = 20
+RSI_BUY_LEVEL = 30 # RSI at or below this level votes buy
+RSI_SELL_LEVEL = 70 # RSI at or above this level votes sell
+SIDEWAY_PROB_FLOOR = 0.5 # Minimum sideway probability used when picking the roulette label
+
+
+class FeedSignals:
+    rsi_votes: np.ndarray # (bars, 3) number of RSI votes per TradeDecision
+    mean_reversion: np.ndarray # (bars,) TradeDecision of DecisionFactory.MeanReversion
+    roulette_label: np.ndarray # (bars,) MarketCondition used to set a roulette cell strategy
+
+    def __init__(self, rsi_votes: np.ndarray, mean_reversion: np.ndarray, roulette_label: np.ndarray):
+        self.rsi_votes = rsi_votes
+        self.mean_reversion = mean_reversion
+        self.roulette_label = roulette_label
+
+    def __len__(self) -> int:
+        return len(self.mean_reversion)
+
+    def __repr__(self):
+        return f"<FeedSignals(bars={len(self)})>"
+
+
+# Data feed columns read by precompute_signals
+SIGNAL_FIELDS = ('uptrend_prob', 'side_prob', 'downtrend_prob') + tuple(f"rsi_{day}" for day in range(1, RSI_VOTER_COUNT+1))
+
+
+def compute_rsi_votes(feed: ColumnarDataFeed) -> np.ndarray:
+    rsi = np.stack([feed[f"rsi_{day}"] for day in range(1, RSI_VOTER_COUNT+1)], axis=1)
+    votes = np.empty((len(feed), 3), dtype=np.int8)
+    votes[:, TradeDecision.buy] = np.count_nonzero(rsi <= RSI_BUY_LEVEL, axis=1)
+    votes[:, TradeDecision.sell] = np.count_nonzero(rsi >= RSI_SELL_LEVEL, axis=1)
+    votes[:, TradeDecision.hold] = RSI_VOTER_COUNT - votes[:, TradeDecision.buy] - votes[:, TradeDecision.sell]
+    return votes
+
+
+def compute_mean_reversion(rsi_votes: np.ndarray) -> np.ndarray:
+    # A decision needs a strict majority of the voters, otherwise hold
+    majority = rsi_votes > RSI_VOTER_COUNT // 2
+    return np.where(
+        majority[:, TradeDecision.buy], TradeDecision.buy,
+        np.where(majority[:, TradeDecision.sell], TradeDecision.sell, TradeDecision.hold)
+    ).astype(np.int8)
+
+
+def compute_roulette_label(feed: ColumnarDataFeed) -> np.ndarray:
+    probs = np.stack([
+        feed['uptrend_prob'],
+        np.maximum(feed['side_prob'], SIDEWAY_PROB_FLOOR),
+        feed['downtrend_prob']
+    ], axis=1)
+    return np.argmax(probs, axis=1).astype(np.int8)
+
+
+def precompute_signals(feed: ColumnarDataFeed) -> FeedSignals:
+    rsi_votes = compute_rsi_votes(feed)
+    return FeedSignals(
+        rsi_votes=rsi_votes,
+        mean_reversion=compute_mean_reversion(rsi_votes),
+        roulette_label=compute_roulette_label(feed)
+    )
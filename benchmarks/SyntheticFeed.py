@@ -0,0 +1,50 @@
+"""
+Synthetic data feeds for benchmarking without a database.
+
+Prices follow a geometric random walk, classifier probabilities are random and the predicted label is
+the most probable class, so every strategy sees a realistic mix of uptrend, sideway and downtrend bars.
+"""
+from app.models.ColumnarDataFeed import ColumnarDataFeed, COLUMN_DTYPES
+from app.models.TradeBotDataFeed import TradeBotDataFeed
+
+import numpy as np
+
+START_DATE = np.datetime64('2010-01-04', 'D')
+
+
+def generate_feed(ticker: str, model: str, feature_set: str, length: int, seed: int = 0, volatility: float = 0.02) -> ColumnarDataFeed:
+    """
+    Generates length business days of data feed for one ticker. The same seed gives the same feed.
+    """
+    rng = np.random.default_rng(seed)
+
+    close = 100.0 * np.cumprod(1 + rng.normal(0, volatility, length))
+    open = close * (1 + rng.normal(0, volatility / 2, length))
+    probs = rng.dirichlet(np.ones(3), length)
+
+    columns = {
+        'report_date': np.busday_offset(START_DATE, np.arange(length), roll='forward'),
+        'uptrend_prob': probs[:, 0],
+        'side_prob': probs[:, 1],
+        'downtrend_prob': probs[:, 2],
+        'predicted_label': np.argmax(probs, axis=1),
+        'open': open,
+        'close': close,
+        **{f"rsi_{day}": rng.uniform(0, 100, length) for day in range(1, 21)},
+    }
+    columns = {name: column.astype(COLUMN_DTYPES[name]) for name, column in columns.items()}
+    return ColumnarDataFeed(ticker, model, feature_set, columns)
+
+
+def generate_feeds(tickers: int, model: str, feature_set: str, length: int, seed: int = 0) -> list[ColumnarDataFeed]:
+    """
+    Generates one feed per synthetic ticker, named SYN000, SYN001, ...
+    """
+    return [generate_feed(f"SYN{index:03d}", model, feature_set, length, seed + index) for index in range(tickers)]
+
+
+def generate_data_feed(ticker: str, model: str, feature_set: str, length: int, seed: int = 0) -> list[TradeBotDataFeed]:
+    """
+    Same history as generate_feed, as the row objects returned by the database query.
+    """
+    return generate_feed(ticker, model, feature_set, length, seed).toDataFeed()
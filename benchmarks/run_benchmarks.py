@@ -0,0 +1,197 @@
+"""
+Benchmark suite running on synthetic feeds, without a PostgreSQL database.
+
+Strategies read the feeds through a StaticDataFeeder, and trade logs are uploaded to an in-memory
+SQLite database with an attached fyp schema. Results are saved to JSON so runs of different commits
+can be compared:
+
+    python -m benchmarks.run_benchmarks --tickers 5 --length 2500 --output before.json
+    python -m benchmarks.run_benchmarks --tickers 5 --length 2500 --output after.json --baseline before.json
+"""
+from app.backtest.Portfolio import run_portfolio
+from app.datafeed.StaticDataFeeder import StaticDataFeeder
+from app.db.TradeLogUpload import upload_trade_logs_to_database
+from app.models.TradeLedger import TradeLedger
+from app.models.TradeLog import TradeLog
+from app.pnl.PnLReporting import calculate_pnl
+from app.strategies.BAHStrategy import BAHStrategy, BAHParam
+from app.strategies.LongOnlyStrategy import LongOnlyStrategy, LongOnlyStrategyParam
+from app.strategies.ShortOnlyStrategy import ShortOnlyStrategy, ShortOnlyStrategyParam
+from app.strategies.RouletteStrategy import RouletteStrategy, RouletteStrategyParam, DecisionFactory
+from benchmarks.SyntheticFeed import generate_feeds
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import sqlalchemy
+
+MODEL = "SYNTHETIC"
+FEATURE_SET = "synthetic"
+
+STRATEGIES = {
+    'LongOnlyStrategy': (LongOnlyStrategy, lambda: LongOnlyStrategyParam(sell_counter_threshold=3, stop_loss_percentage=-0.05, holding_period=20, initial_capital=10000)),
+    'ShortOnlyStrategy': (ShortOnlyStrategy, lambda: ShortOnlyStrategyParam(sell_counter_threshold=3, stop_loss_percentage=-0.05, holding_period=20, initial_capital=10000)),
+    'RouletteStrategy': (RouletteStrategy, lambda: RouletteStrategyParam(initial_capital=10000, roulette_size=20, decision_factory=DecisionFactory)),
+    'BAHStrategy': (BAHStrategy, lambda: BAHParam(initial_capital=10000)),
+}
+
+
+def create_benchmark_session():
+    """
+    Session context manager over an in-memory SQLite database holding the fyp.trade_log table.
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", lambda connection, record: connection.execute("ATTACH DATABASE ':memory:' AS fyp"))
+    TradeLog.metadata.create_all(engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    @contextmanager
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    return get_db
+
+
+def time_call(fn, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings: list[float], items: int) -> dict:
+    """
+    :param items: int - Number of bars or trades processed by one call, used for the throughput.
+    """
+    best = min(timings)
+    return {
+        'min': best,
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'runs': len(timings),
+        'items': items,
+        'items_per_second': items / best if best > 0 else None,
+    }
+
+
+def run_strategy(strategy_class, param, datafeeder, tickers: list[str]) -> list[TradeLedger]:
+    ledgers = []
+    for ticker in tickers:
+        strategy = strategy_class(datafeeder, param)
+        strategy.reset()
+        strategy.run(ticker=ticker, model=MODEL, feature_set=FEATURE_SET)
+        ledgers.append(strategy.dump_trade_logs())
+    return ledgers
+
+
+def run_benchmarks(tickers: int, length: int, repeat: int, seed: int = 0) -> dict:
+    feeds = generate_feeds(tickers, MODEL, FEATURE_SET, length, seed)
+    datafeeder = StaticDataFeeder(feeds)
+    ticker_names = [feed.ticker for feed in feeds]
+    bars = tickers * length
+
+    results = {}
+    ledgers = {}
+    for name, (strategy_class, make_param) in STRATEGIES.items():
+        param = make_param()
+        timings = time_call(lambda: run_strategy(strategy_class, param, datafeeder, ticker_names), repeat)
+        results[name] = summarize(timings, bars)
+        ledgers[name] = run_strategy(strategy_class, param, datafeeder, ticker_names)
+        # The same strategy on every ticker at once, with a shared capital pool
+        timings = time_call(lambda: run_portfolio(feeds, strategy_class, param), repeat)
+        results[f"portfolio_{name}"] = summarize(timings, bars)
+
+    all_ledgers = [ledger for strategy_ledgers in ledgers.values() for ledger in strategy_ledgers]
+    trade_count = sum(len(ledger) for ledger in all_ledgers)
+
+    timings = time_call(lambda: [calculate_pnl(10000, ledger) for ledger in all_ledgers], repeat)
+    results['calculate_pnl'] = summarize(timings, trade_count)
+
+    # The roulette strategy trades the most, so its trade logs stand for a typical upload
+    upload_ledgers = ledgers['RouletteStrategy']
+    upload_count = sum(len(ledger) for ledger in upload_ledgers)
+    for name, kwargs in [('upload_orm', {}), ('upload_bulk', {'bulk': True})]:
+        session = create_benchmark_session()
+        timings = time_call(lambda: [upload_trade_logs_to_database(session, ledger, **kwargs) for ledger in upload_ledgers], repeat)
+        with session() as db:
+            uploaded = db.execute(select(func.count()).select_from(TradeLog)).scalar_one()
+        if uploaded != upload_count * repeat:
+            raise RuntimeError(f"{name} uploaded {uploaded} trade logs, expected {upload_count * repeat}")
+        results[name] = summarize(timings, upload_count)
+
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sqlalchemy': sqlalchemy.__version__,
+        'platform': platform.platform(),
+    }
+
+
+def compare(results: dict, baseline: dict):
+    print(f"{'benchmark':20} {'baseline':>10} {'current':>10} {'speedup':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['min'], result['min']
+        print(f"{name:20} {before:10.4f} {after:10.4f} {before / after:7.2f}x")
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Time the strategies, PnL calculation and trade log upload on synthetic feeds.")
+    parser.add_argument("--tickers", type=int, default=5, help="Number of synthetic tickers")
+    parser.add_argument("--length", type=int, default=2500, help="Number of bars per ticker")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark, the minimum is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file the results are written to")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.tickers, args.length, args.repeat, args.seed)
+    report = {
+        'environment': environment(),
+        'config': {'tickers': args.tickers, 'length': args.length, 'repeat': args.repeat, 'seed': args.seed},
+        'results': results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    for name, result in results.items():
+        print(f"{name:20} min {result['min']:.4f}s | median {result['median']:.4f}s | {result['items']} items")
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get('config') != report['config']:
+            print("Warning: baseline was run with a different config", file=sys.stderr)
+        compare(results, baseline['results'])
+
+
+if __name__ == "__main__":
+    main()
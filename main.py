@@ -1,80 +1,153 @@
-from app.db.session import create_db_session
+from app.db.session import create_db_session, create_async_db_session
 from app.db.TradeLogUpload import upload_trade_logs_to_database
 from app.strategies.LongOnlyStrategy import LongOnlyStrategy, LongOnlyStrategyParam
 from app.strategies.BAHStrategy import BAHStrategy, BAHParam
 from app.strategies.ShortOnlyStrategy import ShortOnlyStrategy, ShortOnlyStrategyParam
 from app.strategies.RouletteStrategy import RouletteStrategy, RouletteStrategyParam, DecisionFactory
-from app.pnl.PnLReporting import calculate_pnl
+from app.backtest.ParallelRunner import BacktestJob, run_backtests, run_job
+from app.backtest.ResultCache import ResultCache
+from app.backtest.ModelComparison import compare_models
+from app.backtest.Portfolio import run_portfolio, ALLOCATION_RULES
+from app.backtest.WalkForward import walk_forward
+from app.backtest.Significance import run_significance
+from app.pnl.Benchmarks import buy_and_hold_pnl, compute_benchmarks, BENCHMARK_FIELDS
 from app.datafeed.DataFeeder import DataFeeder
+from app.datafeed.AsyncDataFeeder import AsyncDataFeeder
+from app.datafeed.StaticDataFeeder import StaticDataFeeder
+from app.instrumentation.Instrumentation import Instrumentation
 
 from dotenv import load_dotenv
 import os
 
 model = "MLPv2"
 feature_set = "processed technical indicators (20 days)"
+tickers = ["AAPL", "AXP", "BA", "CAT", "CSCO", "CVX", "DD", "DIS", "GE", "HD", "IBM", "INTC", "JNJ", "JPM", "KO", "MCD", "MMM", "MRK", "MSFT", "NKE", "PFE", "PG", "TRV", "UNH", "UTX", "VZ", "WMT", "XOM"]
 
-load_dotenv()
-session = create_db_session(
-    user=os.getenv("DB_USER"),
-    password=os.getenv("DB_PASSWORD"),
-    host=os.getenv("DB_HOST"),
-    database=os.getenv("DB_NAME"),
-    port=os.getenv("DB_PORT")
-)
-
-feeder = DataFeeder(session)
-
-# params_target = ShortOnlyStrategyParam(
-#     sell_counter_threshold=3,
-#     stop_loss_percentage=-0.05,
-#     holding_period=20,
-#     initial_capital=10000
-# )
-# strategy_target = ShortOnlyStrategy(feeder, params_target)
-
-params_target = RouletteStrategyParam(
-    initial_capital=10000,
-    roulette_size=20,
-    decision_factory=DecisionFactory
-)
-strategy_target = RouletteStrategy(feeder, params_target)
-
-# params_target = LongOnlyStrategyParam(
-#     sell_counter_threshold=3,
-#     stop_loss_percentage=-0.05,
-#     holding_period=20,
-#     initial_capital=10000
-# )
-# strategy_target = LongOnlyStrategy(feeder, params_target)
-
-params_benchmark = BAHParam(
-    initial_capital=10000
-)
-strategy_benchmark = BAHStrategy(feeder, params_benchmark)
-
-for ticker in ["AAPL", "AXP", "BA", "CAT", "CSCO", "CVX", "DD", "DIS", "GE", "HD", "IBM", "INTC", "JNJ", "JPM", "KO", "MCD", "MMM", "MRK", "MSFT", "NKE", "PFE", "PG", "TRV", "UNH", "UTX", "VZ", "WMT", "XOM"]:
-    pnl_stats = {}
-    for strategy in [strategy_target, strategy_benchmark]:
-        # Reset states
-        strategy.reset()
-
-        # Run strategy
-        strategy.run(
-            ticker=ticker,
-            model=model,
-            feature_set=feature_set
-        )
+if __name__ == "__main__":
+    load_dotenv()
+    session = create_db_session(
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        database=os.getenv("DB_NAME"),
+        port=os.getenv("DB_PORT")
+    )
+
+    # Stage timings are always collected, INSTRUMENT_PROFILE / INSTRUMENT_MEMORY add cProfile / tracemalloc captures
+    instrumentation = Instrumentation(
+        profile=os.getenv("INSTRUMENT_PROFILE") == "1",
+        trace_memory=os.getenv("INSTRUMENT_MEMORY") == "1"
+    )
+    # USE_FEED_TABLE=1 reads the prebuilt fyp.trade_bot_feed table, see app/datafeed/FeedTableBuilder.py
+    feeder = DataFeeder(session, instrumentation=instrumentation, use_feed_table=os.getenv("USE_FEED_TABLE") == "1")
+
+    # params_target = ShortOnlyStrategyParam(
+    #     sell_counter_threshold=3,
+    #     stop_loss_percentage=-0.05,
+    #     holding_period=20,
+    #     initial_capital=10000
+    # )
+    # strategy_target = ShortOnlyStrategy
+
+    params_target = RouletteStrategyParam(
+        initial_capital=10000,
+        roulette_size=20,
+        decision_factory=DecisionFactory
+    )
+    strategy_target = RouletteStrategy
 
-        # Get results
-        results = strategy.dump_trade_logs()
+    # params_target = LongOnlyStrategyParam(
+    #     sell_counter_threshold=3,
+    #     stop_loss_percentage=-0.05,
+    #     holding_period=20,
+    #     initial_capital=10000
+    # )
+    # strategy_target = LongOnlyStrategy
 
-        # Calculate PnL
-        pnl = calculate_pnl(10000, results)
-        pnl_stats[strategy.strategy_name] = pnl
+    params_benchmark = BAHParam(
+        initial_capital=10000
+    )
+    strategy_benchmark = BAHStrategy
 
+    # Run the target strategy on every ticker on a process pool, BACKTEST_WORKERS defaults to the number of CPUs.
+    # The buy-and-hold benchmark is computed in closed form from the first and last closes
+    workers = os.getenv("BACKTEST_WORKERS")
+    jobs = [BacktestJob(strategy_target, params_target, ticker, model, feature_set) for ticker in tickers]
+    if os.getenv("ASYNC_PREFETCH") == "1":
+        # Run the tickers in this process, prefetching the next feeds while the current one is backtested
+        async_session = create_async_db_session(
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            host=os.getenv("DB_HOST"),
+            database=os.getenv("DB_NAME"),
+            port=os.getenv("DB_PORT")
+        )
+        fields = set(strategy_target.required_fields).union(BENCHMARK_FIELDS)
+        results, benchmark_pnls = [], []
+        with AsyncDataFeeder(async_session, instrumentation=instrumentation) as prefetcher:
+            for feed, job in zip(prefetcher.iterFeeds(tickers, model, feature_set, fields), jobs):
+                results.append(run_job(job, StaticDataFeeder([feed]), instrumentation))
+                close = feed['close']
+                benchmark_pnls.append(buy_and_hold_pnl(close[0].item(), close[-1].item(), params_benchmark.initial_capital) if len(close) else float('nan'))
+    else:
+        # One pull serves both the strategy runs and the benchmark
+        feeds = feeder.pullMany(tickers, model, feature_set, set(strategy_target.required_fields).union(BENCHMARK_FIELDS))
+        # RESULT_CACHE_DIR serves the runs whose strategy source, params and feed did not change from disk
+        result_cache = ResultCache(os.getenv("RESULT_CACHE_DIR")) if os.getenv("RESULT_CACHE_DIR") else None
+        results = run_backtests(StaticDataFeeder(feeds.values()), jobs, max_workers=int(workers) if workers else None, instrumentation=instrumentation, result_cache=result_cache)
+        benchmark_pnls = compute_benchmarks(feeds.values(), params_benchmark.initial_capital).buy_and_hold.tolist()
+
+    for ticker, target, benchmark_pnl in zip(tickers, results, benchmark_pnls):
         # Upload results to database
-        # upload_trade_logs_to_database(session, results)
-        
-    result_status = "PASS" if pnl_stats[strategy_target.strategy_name] > pnl_stats[strategy_benchmark.strategy_name] else "FAIL"
-    
-    print(f"\033[{'92m' if result_status == 'PASS' else '91m'}[{result_status}]\033[0m {ticker:6} | BAH: {pnl_stats[strategy_benchmark.strategy_name]:12.2f} | TARGET: {pnl_stats[strategy_target.strategy_name]:12.2f}")
+        # with instrumentation.stage("upload", target.strategy_name, ticker, rows=len(target.trades)):
+        #     upload_trade_logs_to_database(session, target.trades, bulk=True)
+
+        result_status = "PASS" if target.pnl > benchmark_pnl else "FAIL"
+
+        print(f"\033[{'92m' if result_status == 'PASS' else '91m'}[{result_status}]\033[0m {ticker:6} | BAH: {benchmark_pnl:12.2f} | TARGET: {target.pnl:12.2f}")
+
+    # COMPARE_MODELS="MLPv2,OtherModel" also runs the target strategy for each listed model in one pass
+    compared_models = os.getenv("COMPARE_MODELS")
+    if compared_models:
+        matrix = compare_models(
+            feeder,
+            tickers,
+            [(name.strip(), feature_set) for name in compared_models.split(",")],
+            strategy_target,
+            params_target,
+            max_workers=int(workers) if workers else None,
+            instrumentation=instrumentation
+        )
+        print(matrix.format())
+
+    # PORTFOLIO=1 also runs both strategies on all tickers with one shared capital pool,
+    # PORTFOLIO_ALLOCATION picks the allocation rule (equal_weight or split_cash)
+    if os.getenv("PORTFOLIO") == "1":
+        allocation = ALLOCATION_RULES[os.getenv("PORTFOLIO_ALLOCATION", "equal_weight")]
+        fields = set(strategy_target.required_fields).union(strategy_benchmark.required_fields)
+        feeds = feeder.pullMany(tickers, model, feature_set, fields)
+        target = run_portfolio(feeds.values(), strategy_target, params_target, allocation)
+        benchmark = run_portfolio(feeds.values(), strategy_benchmark, params_benchmark, allocation)
+        print(f"PORTFOLIO ({allocation.__name__}) | BAH: {benchmark.pnl:12.2f} | TARGET: {target.pnl:12.2f}")
+
+    # WALK_FORWARD="252,21" also evaluates the target strategy against BAH on 252-bar windows every 21 bars
+    walk_forward_windows = os.getenv("WALK_FORWARD")
+    if walk_forward_windows:
+        window, step = (int(value) for value in walk_forward_windows.split(","))
+        report = walk_forward(feeder, tickers, model, feature_set, strategy_target, params_target, window, step)
+        print(report.format())
+
+    # MONTE_CARLO_PATHS=1000 also reports label permutation and bootstrap p-values of the PASS/FAIL verdicts
+    monte_carlo_paths = os.getenv("MONTE_CARLO_PATHS")
+    if monte_carlo_paths:
+        seed = os.getenv("MONTE_CARLO_SEED")
+        significance = run_significance(
+            feeder, tickers, model, feature_set, strategy_target, params_target,
+            paths=int(monte_carlo_paths),
+            seed=int(seed) if seed else None
+        )
+        print(significance.format())
+
+    # Write the stage report as JSON and Prometheus text, REPORT_DIR defaults to the working directory
+    report_paths = instrumentation.write(os.path.join(os.getenv("REPORT_DIR", "."), "backtest_report"))
+    print(f"Instrumentation report written to {', '.join(report_paths)}")
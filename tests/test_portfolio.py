@@ -0,0 +1,95 @@
+"""
+A portfolio of one ticker must reproduce the strategy run on its own, under every allocation rule, and
+portfolios of several tickers listed over different dates must match cash and equity computed by hand.
+"""
+from app.backtest.Portfolio import run_portfolio, ALLOCATION_RULES
+from app.datafeed.StaticDataFeeder import StaticDataFeeder
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+from app.models.MarketCondition import MarketCondition
+from app.pnl.PnLReporting import calculate_pnl
+from app.strategies.LongOnlyStrategy import LongOnlyStrategy, LongOnlyStrategyParam
+from app.strategies.RouletteStrategy import RouletteStrategy, RouletteStrategyParam, DecisionFactory
+from app.strategies.ShortOnlyStrategy import ShortOnlyStrategy, ShortOnlyStrategyParam
+from benchmarks.SyntheticFeed import START_DATE
+from tests.test_roulette_strategy import random_feed
+
+import numpy as np
+import pytest
+
+FEED_SEEDS = range(20)
+ROULETTE_SIZES = (1, 3, 7, 20)
+
+
+@pytest.mark.parametrize("seed", FEED_SEEDS)
+@pytest.mark.parametrize("rule", ALLOCATION_RULES.values())
+def test_one_ticker_roulette_portfolio_matches_strategy(seed, rule):
+    feed = random_feed(seed)
+    for roulette_size in ROULETTE_SIZES:
+        param = RouletteStrategyParam(10000, roulette_size, DecisionFactory)
+        strategy = RouletteStrategy(StaticDataFeeder([feed]), param)
+        strategy.run(ticker=feed.ticker, model=feed.model, feature_set=feed.feature_set)
+        pnl = calculate_pnl(param.initial_capital, strategy.dump_trade_logs())
+        result = run_portfolio([feed], RouletteStrategy, param, allocation=rule)
+        assert result.pnl == pytest.approx(pnl, rel=1e-9, abs=1e-6)
+
+
+def hand_feed(ticker: str, first_day: int, labels: list[int], close: list[float]) -> ColumnarDataFeed:
+    return ColumnarDataFeed(ticker, "model", "features", {
+        'report_date': START_DATE + np.arange(first_day, first_day + len(labels)),
+        'predicted_label': np.array(labels, dtype=np.int32),
+        'close': np.array(close, dtype=np.float64),
+    })
+
+
+SIDE = MarketCondition.sideway
+SIGNAL_CASES = {
+    # A enters on its last bar and exits on the same bar, B enters a day later and gains 25%
+    'long': (LongOnlyStrategy, LongOnlyStrategyParam, MarketCondition.uptrend, 25.0),
+    'short': (ShortOnlyStrategy, ShortOnlyStrategyParam, MarketCondition.downtrend, 15.0),
+}
+# Cash and equity at the close of each of the 5 dates
+EXPECTED_ROUND_TRIP = {
+    ('long', 'split_cash'): ([20000, 20000, 20000, 0, 25000], [20000, 20000, 20000, 20000, 25000]),
+    ('short', 'split_cash'): ([20000, 20000, 20000, 40000, 25000], [20000, 20000, 20000, 20000, 25000]),
+    ('long', 'equal_weight'): ([20000, 20000, 20000, 10000, 22500], [20000, 20000, 20000, 20000, 22500]),
+    ('short', 'equal_weight'): ([20000, 20000, 20000, 30000, 22500], [20000, 20000, 20000, 20000, 22500]),
+}
+
+
+@pytest.mark.parametrize("case, rule", EXPECTED_ROUND_TRIP)
+def test_same_day_round_trip_frees_its_capital(case, rule):
+    strategy_class, param_class, target, exit_price = SIGNAL_CASES[case]
+    feeds = [
+        hand_feed("A", 0, [SIDE, SIDE, target], [10.0, 10.0, 10.0]),
+        hand_feed("B", 0, [SIDE, SIDE, SIDE, target, SIDE], [20.0, 20.0, 20.0, 20.0, exit_price]),
+    ]
+    result = run_portfolio(feeds, strategy_class, param_class(3, -0.5, 20, 10000), allocation=ALLOCATION_RULES[rule])
+    cash, equity = EXPECTED_ROUND_TRIP[case, rule]
+    np.testing.assert_allclose(result.cash, cash)
+    np.testing.assert_allclose(result.equity, equity)
+    assert calculate_pnl(result.initial_capital, result.toLedger()) == pytest.approx(result.pnl)
+
+
+# Shorts on S, listed from the second date, and on T, listed from the first one. S enters on the third
+# date and locks its proceeds plus an equal margin, so T entering on the fourth date only gets the capital
+# left free. Both exit on the last date
+EXPECTED_LOCKED_MARGIN = {
+    # S takes 10000 of the 20000 and T gets the 10000 left, less than its 11000 share of the equity
+    'equal_weight': ([-200, -1000], [20000, 20000, 30000, 40000, 24000], [20000, 20000, 20000, 22000, 24000]),
+    # S takes all the capital, T gets none
+    'split_cash': ([-400, 0], [20000, 20000, 40000, 40000, 24000], [20000, 20000, 20000, 24000, 24000]),
+}
+
+
+@pytest.mark.parametrize("rule", EXPECTED_LOCKED_MARGIN)
+def test_short_margin_is_locked_until_exit(rule):
+    down = MarketCondition.downtrend
+    feeds = [
+        hand_feed("S", 1, [SIDE, down, SIDE, SIDE], [50.0, 50.0, 40.0, 40.0]),
+        hand_feed("T", 0, [SIDE, SIDE, SIDE, down, SIDE], [10.0, 10.0, 10.0, 10.0, 8.0]),
+    ]
+    result = run_portfolio(feeds, ShortOnlyStrategy, ShortOnlyStrategyParam(3, -0.5, 20, 10000), allocation=ALLOCATION_RULES[rule])
+    shares, cash, equity = EXPECTED_LOCKED_MARGIN[rule]
+    np.testing.assert_allclose(result.shares, shares)
+    np.testing.assert_allclose(result.cash, cash)
+    np.testing.assert_allclose(result.equity, equity)
@@ -0,0 +1,49 @@
+"""
+The batched roulette engine must give, for every row, the capital and trade count of RouletteStrategy
+run on the same bars and scored with calculate_pnl.
+"""
+from app.datafeed.StaticDataFeeder import StaticDataFeeder
+from app.pnl.PnLReporting import calculate_pnl
+from app.strategies.RouletteBacktest import roulette_signals, run_roulette_backtest
+from app.strategies.RouletteStrategy import RouletteStrategy, RouletteStrategyParam, DecisionFactory
+from tests.test_roulette_strategy import random_feed
+
+import numpy as np
+import pytest
+
+FEED_SEEDS = range(20)
+RUNS = 8
+
+
+@pytest.mark.parametrize("seed", FEED_SEEDS)
+def test_rows_match_strategy_runs(seed):
+    feed = random_feed(seed)
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, len(feed), RUNS)
+    ends = np.minimum(starts + rng.integers(0, len(feed) + 1, RUNS), len(feed))
+    sizes = rng.integers(1, 25, RUNS)
+    signals = roulette_signals(feed, DecisionFactory)
+    result = run_roulette_backtest(feed['close'], signals.cell_strategy, signals.mean_reversion, sizes, 10000, starts, ends)
+
+    for run in range(RUNS):
+        param = RouletteStrategyParam(10000, int(sizes[run]), DecisionFactory)
+        strategy = RouletteStrategy(StaticDataFeeder([feed[starts[run]:ends[run]]]), param)
+        strategy.run(ticker=feed.ticker, model=feed.model, feature_set=feed.feature_set)
+        trades = strategy.dump_trade_logs()
+        assert result.final_capital[run] - param.initial_capital == calculate_pnl(param.initial_capital, trades)
+        assert result.trade_count[run] == len(trades)
+
+
+def test_per_run_signals_match_shared_signals():
+    feed = random_feed(0)
+    signals = roulette_signals(feed, DecisionFactory)
+    sizes = np.array([1, 7, 20])
+    shared = run_roulette_backtest(feed['close'], signals.cell_strategy, signals.mean_reversion, sizes, 10000)
+    stacked = run_roulette_backtest(
+        np.stack([feed['close']] * len(sizes)),
+        np.stack([signals.cell_strategy] * len(sizes)),
+        np.stack([signals.mean_reversion] * len(sizes)),
+        sizes,
+        10000
+    )
+    assert np.array_equal(shared.final_capital, stacked.final_capital)
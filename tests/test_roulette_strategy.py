@@ -0,0 +1,120 @@
+"""
+Regression test of the struct-of-arrays RouletteStrategy against the per-cell loop it replaced.
+
+The reference below is the original strategy, walking a list of cell objects and re-evaluating the
+decision functions on every bar. Both are run on random seeded feeds and must produce the same trade
+logs, compared exactly.
+"""
+from app.datafeed.StaticDataFeeder import StaticDataFeeder
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+from app.models.TradeDecision import TradeDecision
+from app.strategies.RouletteStrategy import RouletteStrategy, RouletteStrategyParam, DecisionFactory
+from benchmarks.SyntheticFeed import generate_feed
+
+import numpy as np
+import pytest
+
+FEED_SEEDS = range(40)
+ROULETTE_SIZES = (1, 3, 7, 20)
+
+
+def random_feed(seed: int) -> ColumnarDataFeed:
+    """
+    Synthetic feed of random length, with RSI values skewed per feed so that mean reversion votes
+    reach a majority on a fair share of the bars.
+    """
+    rng = np.random.default_rng(seed)
+    length = int(rng.integers(1, 300))
+    feed = generate_feed("SYN", "model", "features", length, seed=seed)
+    level = rng.uniform(0, 100, length)
+    for day in range(1, 21):
+        feed.columns[f"rsi_{day}"] = np.clip(level + rng.normal(0, 15, length), 0, 100).astype(np.float32)
+    return feed
+
+
+class ReferenceCell:
+    def __init__(self, id: int, allocation: float):
+        self.id = id
+        self.capital = allocation
+        self.active = False
+        self.shares = 0
+        self.decision_function = None
+
+
+def reference_trades(feed: ColumnarDataFeed, initial_capital: float, roulette_size: int) -> list[tuple]:
+    trades = []
+    cells = [ReferenceCell(index, initial_capital / roulette_size) for index in range(roulette_size)]
+
+    def buy(data, cell: ReferenceCell, shares: float, note: str):
+        cell.active = True
+        cell.shares = shares
+        trades.append((data.report_date, 'BUY', data.close, cell.shares, f"Cell {cell.id} | {note}"))
+        cell.capital -= data.close * cell.shares
+
+    def sell(data, cell: ReferenceCell, note: str):
+        cell.active = False
+        trades.append((data.report_date, 'SELL', data.close, cell.shares, f"Cell {cell.id} | {note}"))
+        cell.capital += data.close * cell.shares
+        cell.shares = 0
+
+    def refresh(data):
+        for cell in cells:
+            match cell.decision_function:
+                case DecisionFactory.BuyAndHold:
+                    if cell.active:
+                        return
+                    buy(data, cell, cell.capital / data.close, "BAH Refresh")
+                case DecisionFactory.SellAndHold:
+                    if cell.active:
+                        return
+                    buy(data, cell, -1 * cell.capital / data.close, "SAH Refresh")
+                case DecisionFactory.MeanReversion:
+                    decision = cell.decision_function(data)
+                    if cell.active:
+                        if decision == TradeDecision.sell:
+                            sell(data, cell, "MR Refresh Sell")
+                        return
+                    if decision == TradeDecision.buy:
+                        buy(data, cell, cell.capital / data.close, "MR Refresh Buy")
+                case _:
+                    pass
+
+    def clean_up(data, cell: ReferenceCell):
+        if cell.active:
+            sell(data, cell, "Lockup expired / End of Strategy")
+
+    def set_strategy(data, cell: ReferenceCell):
+        predicted_label = np.argmax([data.uptrend_prob, max(data.side_prob, 0.5), data.downtrend_prob])
+        cell.decision_function = DecisionFactory.getDecision(predicted_label)
+        match cell.decision_function:
+            case DecisionFactory.BuyAndHold:
+                buy(data, cell, cell.capital / data.close, "BAH Set Strategy")
+            case DecisionFactory.SellAndHold:
+                buy(data, cell, -1 * cell.capital / data.close, "SAH Set Strategy")
+            case DecisionFactory.MeanReversion:
+                if cell.decision_function(data) == TradeDecision.buy:
+                    buy(data, cell, cell.capital / data.close, "MR Set Strategy")
+            case _:
+                pass
+
+    current_index = 0
+    for daily_data in feed:
+        refresh(daily_data)
+        clean_up(daily_data, cells[current_index])
+        set_strategy(daily_data, cells[current_index])
+        current_index = (current_index + 1) % roulette_size
+
+    for cell in cells:
+        clean_up(daily_data, cell)
+    return trades
+
+
+@pytest.mark.parametrize("seed", FEED_SEEDS)
+def test_roulette_matches_per_cell_loop(seed):
+    feed = random_feed(seed)
+    for roulette_size in ROULETTE_SIZES:
+        param = RouletteStrategyParam(10000, roulette_size, DecisionFactory)
+        strategy = RouletteStrategy(StaticDataFeeder([feed]), param)
+        strategy.run(ticker=feed.ticker, model=feed.model, feature_set=feed.feature_set)
+        trades = list(strategy.dump_trade_logs().rows(('report_date', 'action', 'price', 'shares', 'note')))
+        assert trades == reference_trades(feed, param.initial_capital, roulette_size)
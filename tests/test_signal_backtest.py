@@ -0,0 +1,109 @@
+"""
+Regression test of the signal-array engine against the per-row LongOnly/ShortOnly loop it replaced.
+
+The reference below is the original bar-by-bar state machine of the strategies. Both are run on random
+seeded feeds and must produce the same trade logs, compared exactly.
+"""
+from app.datafeed.StaticDataFeeder import StaticDataFeeder
+from app.models.ColumnarDataFeed import ColumnarDataFeed
+from app.models.MarketCondition import MarketCondition
+from app.strategies.LongOnlyStrategy import LongOnlyStrategy, LongOnlyStrategyParam
+from app.strategies.ShortOnlyStrategy import ShortOnlyStrategy, ShortOnlyStrategyParam
+from benchmarks.SyntheticFeed import generate_feed
+
+import numpy as np
+import pytest
+
+FEED_SEEDS = range(60)
+PARAMS = [
+    (3, -0.05, 20),
+    (1, -0.02, 3),
+    (2, -0.03, 1),
+    (5, -0.1, 0),
+]
+
+
+def random_feed(seed: int) -> ColumnarDataFeed:
+    """
+    Synthetic feed of random length and volatility, with sticky predicted labels so positions last
+    long enough to reach the holding period and the stop loss.
+    """
+    rng = np.random.default_rng(seed)
+    length = int(rng.integers(1, 400))
+    feed = generate_feed("SYN", "model", "features", length, seed=seed, volatility=float(rng.uniform(0.005, 0.05)))
+    labels = np.empty(length, dtype=np.int32)
+    label = int(rng.integers(0, 3))
+    for bar in range(length):
+        if rng.random() < 0.3:
+            label = int(rng.integers(0, 3))
+        labels[bar] = label
+    feed.columns['predicted_label'] = labels
+    return feed
+
+
+def reference_trades(feed: ColumnarDataFeed, target_label: int, direction: int, sell_counter_threshold: int, stop_loss_percentage: float, holding_period: int, initial_capital: float) -> list[tuple]:
+    trades = []
+    current_capital = initial_capital
+    shares = buy_spot = 0
+    bought = False
+    day_counter = non_buy_counter = 0
+
+    for daily_data in feed:
+        if not bought and daily_data.predicted_label == target_label:
+            shares = direction * current_capital / daily_data.close
+            trades.append((daily_data.report_date, 'BUY', daily_data.close, shares, ""))
+            buy_spot = daily_data.close
+            bought = True
+            day_counter = non_buy_counter = 0
+            current_capital -= daily_data.close * shares
+            continue
+
+        if daily_data.predicted_label == target_label:
+            non_buy_counter = 0
+            day_counter += 1
+            if day_counter == holding_period:
+                non_buy_counter = sell_counter_threshold - 1
+        else:
+            non_buy_counter += 1
+
+        reason = None
+        if bought:
+            current_loss_percentage = direction * (daily_data.close - buy_spot) / buy_spot
+            if current_loss_percentage <= stop_loss_percentage:
+                reason = f"Stop loss triggered at {current_loss_percentage:.2%}"
+        if reason is None and bought and non_buy_counter >= sell_counter_threshold:
+            reason = "Sell counter threshold reached"
+        if reason is not None:
+            trades.append((daily_data.report_date, 'SELL', daily_data.close, shares, reason))
+            bought = False
+            day_counter = non_buy_counter = 0
+            current_capital += daily_data.close * shares
+            shares = 0
+
+    if bought:
+        trades.append((daily_data.report_date, 'SELL', daily_data.close, shares, "End of trading period"))
+    return trades
+
+
+def engine_trades(strategy_class, param, feed: ColumnarDataFeed) -> list[tuple]:
+    strategy = strategy_class(StaticDataFeeder([feed]), param)
+    strategy.run(ticker=feed.ticker, model=feed.model, feature_set=feed.feature_set)
+    return list(strategy.dump_trade_logs().rows(('report_date', 'action', 'price', 'shares', 'note')))
+
+
+@pytest.mark.parametrize("seed", FEED_SEEDS)
+def test_long_only_matches_per_row_loop(seed):
+    feed = random_feed(seed)
+    for sell_counter_threshold, stop_loss_percentage, holding_period in PARAMS:
+        param = LongOnlyStrategyParam(sell_counter_threshold, stop_loss_percentage, holding_period)
+        expected = reference_trades(feed, MarketCondition.uptrend, 1, sell_counter_threshold, stop_loss_percentage, holding_period, param.initial_capital)
+        assert engine_trades(LongOnlyStrategy, param, feed) == expected
+
+
+@pytest.mark.parametrize("seed", FEED_SEEDS)
+def test_short_only_matches_per_row_loop(seed):
+    feed = random_feed(seed)
+    for sell_counter_threshold, stop_loss_percentage, holding_period in PARAMS:
+        param = ShortOnlyStrategyParam(sell_counter_threshold, stop_loss_percentage, holding_period)
+        expected = reference_trades(feed, MarketCondition.downtrend, -1, sell_counter_threshold, stop_loss_percentage, holding_period, param.initial_capital)
+        assert engine_trades(ShortOnlyStrategy, param, feed) == expected
@@ -0,0 +1,21 @@
+"""
+Window bounds of the walk-forward evaluation.
+"""
+from app.backtest.WalkForward import rolling_windows
+
+import pytest
+
+
+def test_rolling_windows():
+    starts, ends = rolling_windows(10, 4, 3)
+    assert starts.tolist() == [0, 3, 6]
+    assert ends.tolist() == [4, 7, 10]
+    starts, ends = rolling_windows(10, 4, 3, anchored=True)
+    assert starts.tolist() == [0, 0, 0]
+    assert ends.tolist() == [4, 7, 10]
+
+
+@pytest.mark.parametrize("window, step", [(0, 1), (4, 0), (-1, 2), (3, -1)])
+def test_rolling_windows_rejects_empty_windows_and_steps(window, step):
+    with pytest.raises(ValueError):
+        rolling_windows(10, window, step)